@@ -0,0 +1,88 @@
+import argparse
+import io
+import os
+import tarfile
+import tempfile
+import time
+
+from emulator import Emulator
+from headless import StreamWidget
+
+
+def make_image(path, depth, fanout, files_per_dir, file_size=16):
+    """Создаёт синтетический tar-образ: дерево каталогов заданной глубины и ширины."""
+    payload = io.BytesIO(b"x" * file_size)
+    entries = 0
+    deepest = ""
+    with tarfile.open(path, "w", format=tarfile.PAX_FORMAT) as tar:
+        level = [""]
+        for _ in range(depth):
+            next_level = []
+            for parent in level:
+                for i in range(fanout):
+                    dir_path = f"{parent}d{i}" if not parent else f"{parent}/d{i}"
+                    info = tarfile.TarInfo(dir_path)
+                    info.type = tarfile.DIRTYPE
+                    tar.addfile(info)
+                    entries += 1
+                    for j in range(files_per_dir):
+                        info = tarfile.TarInfo(f"{dir_path}/f{j}.txt")
+                        info.size = file_size
+                        payload.seek(0)
+                        tar.addfile(info, payload)
+                        entries += 1
+                    next_level.append(dir_path)
+            level = next_level
+            deepest = level[0]
+    return entries, deepest
+
+
+def measure(emulator, commands, iterations):
+    # Выполняет команды по кругу и возвращает число команд в секунду
+    start = time.perf_counter()
+    for i in range(iterations):
+        emulator.execute_command(commands[i % len(commands)])
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float("inf")
+
+
+def run_benchmark(image, deepest, iterations, max_output_lines=None):
+    config = {"username": "bench", "fs_image": image, "max_output_lines": max_output_lines}
+    with open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        Emulator(config, StreamWidget(devnull))
+        results = {"startup": time.perf_counter() - start}
+        # Повторный запуск загружает дерево из файла-спутника, записанного первым
+        start = time.perf_counter()
+        emulator = Emulator(config, StreamWidget(devnull))
+        results["startup_indexed"] = time.perf_counter() - start
+        results["ls"] = measure(emulator, ["ls"], iterations)
+        results["cd"] = measure(emulator, [f"cd /{deepest}", "cd /"], iterations)
+        results["du"] = measure(emulator, ["du"], iterations)
+        results["tree"] = measure(emulator, ["tree"], max(1, iterations // 100))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк эмулятора оболочки на синтетическом образе.")
+    parser.add_argument("--depth", type=int, default=4, help="Глубина дерева каталогов.")
+    parser.add_argument("--fanout", type=int, default=8, help="Число подкаталогов в каждом каталоге.")
+    parser.add_argument("--files-per-dir", type=int, default=10, help="Число файлов в каждом каталоге.")
+    parser.add_argument("--iterations", type=int, default=1000, help="Число запусков каждой команды.")
+    parser.add_argument("--max-output-lines", type=int, default=None, help="Ограничение вывода tree.")
+    parser.add_argument("--image", help="Сохранить образ по этому пути вместо временного файла.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image = args.image or os.path.join(tmp, "bench_fs.tar")
+        entries, deepest = make_image(image, args.depth, args.fanout, args.files_per_dir)
+        print(f"Образ: {image}, записей: {entries}, размер: {os.path.getsize(image)} байт")
+        results = run_benchmark(image, deepest, args.iterations, args.max_output_lines)
+
+    print(f"startup: {results['startup']:.3f} s (с индексом: {results['startup_indexed']:.3f} s)")
+    for command in ("ls", "cd", "du", "tree"):
+        print(f"{command:>6}: {results[command]:.1f} cmd/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,28 @@
-import os
-import tarfile
+import threading
+
+import instrument
+from output import BufferedSink, CommandCancelled
+from vfs import VirtualFS
 
 class Emulator:
-    def __init__(self, config, output_widget):
+    def __init__(self, config, output_widget, virtual_fs=None):
         self.config = config
         self.output_widget = output_widget
-        self.virtual_fs = self.load_virtual_fs(config['fs_image'])
-        self.current_dir = self.virtual_fs  # Начальный путь — это путь к распакованной системе
-
-    def load_virtual_fs(self, fs_image_path):
-        # Распаковываем архив виртуальной файловой системы в каталог virtual_fs
-        fs_dir = "virtual_fs"
-        with tarfile.open(fs_image_path, "r") as tar:
-            tar.extractall(path=fs_dir)
-        return fs_dir  # Возвращаем путь к виртуальной файловой системе
+        # Уже загруженный образ можно передать готовым: его разделяют несколько сессий
+        if virtual_fs is None:
+            virtual_fs = self.load_virtual_fs(config['fs_image'], config.get('fs_index', True))
+        self.virtual_fs = virtual_fs
+        self.current_dir = self.virtual_fs.root  # Начальный каталог — корень образа
+        self.cancel_event = threading.Event()  # Устанавливается, чтобы прервать долгую команду
+
+    def load_virtual_fs(self, fs_image_path, use_index=True):
+        # Строим индекс по заголовкам архива, ничего не распаковывая на диск.
+        # Готовый индекс берётся из файла-спутника <образ>.idx, если образ не менялся.
+        with instrument.span("vfs.load"):
+            return VirtualFS(fs_image_path, use_index)
+
+    def get_current_path(self):
+        return self.virtual_fs.path_of(self.current_dir)
 
     def execute_command(self, command):
         # Убираем пробелы в начале и конце строки
@@ -21,7 +30,7 @@ class Emulator:
 
         # Если строка пуста (введены только пробелы), выводим новое приглашение
         if not command:
-            self.output_widget.insert("end", f"{self.config['username']}@shell:{self.current_dir} ")
+            self.output_widget.insert("end", f"{self.config['username']}@shell:{self.get_current_path()} ")
             self.output_widget.mark_set("insert", "end")
             return
 
@@ -30,6 +39,19 @@ class Emulator:
         if not args:
             return
 
+        # Шаблоны в аргументах раскрываются по индексу образа;
+        # у find шаблон после -name передаётся как есть
+        if args[0] != "find":
+            args = self.expand_globs(args)
+
+        instrument.count("commands")
+        try:
+            with instrument.span(f"command.{args[0]}"):
+                self.dispatch(args)
+        except CommandCancelled:
+            self.output_widget.insert("end", "^C\n")
+
+    def dispatch(self, args):
         cmd = args[0]
         if cmd == "ls":
             self.ls()
@@ -38,21 +60,39 @@ class Emulator:
         elif cmd == "exit":
             self.exit_shell()
         elif cmd == "du":
-            self.du()
+            self.du(args)
         elif cmd == "tree":
             self.tree()
         elif cmd == "clear":
             self.clear()
+        elif cmd == "cat":
+            self.cat(args)
+        elif cmd == "find":
+            self.find(args)
         else:
             self.output_widget.insert("end", f"Command not found: {cmd}\n")
 
 
+    def expand_globs(self, args):
+        expanded = [args[0]]
+        for arg in args[1:]:
+            matches = self.virtual_fs.glob(self.current_dir, arg) if any(char in arg for char in "*?[") else None
+            # Как в sh: шаблон без совпадений остаётся как есть
+            expanded.extend(matches or [arg])
+        return expanded
+
+    def open_sink(self):
+        # Буферизованный вывод для команд, которые могут печатать очень много строк
+        return BufferedSink(self.output_widget,
+                            self.config.get("output_chunk_lines", 2000),
+                            self.config.get("max_output_lines", 100000),
+                            self.cancel_event)
+
     def ls(self):
-        try:
-            files = os.listdir(self.current_dir)
-            self.output_widget.insert("end", "\n".join(files) + "\n")
-        except FileNotFoundError:
+        if not self.current_dir.is_dir():
             self.output_widget.insert("end", "No such file or directory\n")
+            return
+        self.open_sink().write_all(f"{name}\n" for name in self.current_dir.children)
 
     def cd(self, args):
         if len(args) < 2:
@@ -61,46 +101,90 @@ class Emulator:
 
         new_dir = args[1]
 
-        if new_dir == "..":
-            # Если нужно перейти в родительскую директорию
-            parent_dir = os.path.dirname(self.current_dir.rstrip("/"))
-            if not parent_dir.startswith(self.virtual_fs):
-                # Не разрешаем выйти за пределы виртуальной файловой системы
-                self.current_dir = self.virtual_fs
-            else:
-                self.current_dir = parent_dir
+        # Путь разбирается по дереву образа, поэтому выйти за его корень нельзя
+        node = self.virtual_fs.resolve(self.current_dir, new_dir)
+        if node is not None and node.is_dir():
+            self.current_dir = node
         else:
-            # Переход в указанную директорию
-            new_path = os.path.normpath(os.path.join(self.current_dir, new_dir))
-            if os.path.isdir(new_path) and new_path.startswith(self.virtual_fs):
-                self.current_dir = new_path
+            self.output_widget.insert("end", f"cd: {new_dir}: No such file or directory\n")
+
+    def cat(self, args):
+        if len(args) < 2:
+            self.output_widget.insert("end", "cat: missing operand\n")
+            return
+
+        for path in args[1:]:
+            node = self.virtual_fs.resolve(self.current_dir, path)
+            if node is None:
+                self.output_widget.insert("end", f"cat: {path}: No such file or directory\n")
+            elif node.is_dir():
+                self.output_widget.insert("end", f"cat: {path}: Is a directory\n")
             else:
-                self.output_widget.insert("end", f"cd: {new_dir}: No such file or directory\n")
+                # Декодируем прямо из отображения образа в память
+                text = str(self.virtual_fs.read(node), "utf-8", errors="replace")
+                self.output_widget.insert("end", text if text.endswith("\n") else text + "\n")
+
+    def find(self, args):
+        # find [каталог] -name шаблон
+        operands = args[1:]
+        start_path = "."
+        if operands and not operands[0].startswith("-"):
+            start_path = operands.pop(0)
+        if len(operands) != 2 or operands[0] != "-name":
+            self.output_widget.insert("end", "find: usage: find [dir] -name pattern\n")
+            return
+
+        start = self.virtual_fs.resolve(self.current_dir, start_path)
+        if start is None:
+            self.output_widget.insert("end", f"find: {start_path}: No such file or directory\n")
+            return
+
+        # Пути выводятся относительно указанного каталога, как в find
+        prefix = start_path.rstrip("/")
+        start_len = len(self.virtual_fs.path_of(start).rstrip("/"))
+        self.open_sink().write_all(
+            f"{prefix + self.virtual_fs.path_of(node)[start_len:] or '/'}\n"
+            for node in self.virtual_fs.find(start, operands[1])
+        )
 
     def exit_shell(self):
         self.output_widget.insert("end", "Exiting shell...\n")
         self.output_widget.quit()
 
-    def du(self):
-        total_size = 0
-        for dirpath, dirnames, filenames in os.walk(self.current_dir):
-            for filename in filenames:
-                total_size += os.path.getsize(os.path.join(dirpath, filename))
-        self.output_widget.insert("end", f"Total disk usage: {total_size} bytes\n")
+    def du(self, args=None):
+        args = args or ["du"]
+        depth = None
+        if len(args) > 1:
+            if len(args) != 3 or args[1] != "-d" or not args[2].isdigit():
+                self.output_widget.insert("end", "du: usage: du [-d N]\n")
+                return
+            depth = int(args[2])
+
+        if depth:
+            # Разбивка по подкаталогам до глубины N по уже посчитанным размерам
+            lines = []
+            stack = [(child, child.name, 1) for child in reversed(list(self.current_dir.children.values()))]
+            while stack:
+                if self.cancel_event.is_set():
+                    raise CommandCancelled()
+                node, path, level = stack.pop()
+                if not node.is_dir():
+                    continue
+                lines.append(f"{node.size}\t{path}\n")
+                if level < depth:
+                    stack.extend((child, f"{path}/{child.name}", level + 1)
+                                 for child in reversed(list(node.children.values())))
+            self.output_widget.insert("end", "".join(lines))
+
+        # Размер поддерева посчитан при загрузке образа
+        self.output_widget.insert("end", f"Total disk usage: {self.current_dir.size} bytes\n")
 
     def tree(self):
-        def print_tree(path, indent=""):
-            # Печатаем текущий каталог или файл
-            self.output_widget.insert("end", f"{indent}{os.path.basename(path)}\n")
-            # Рекурсивно обрабатываем подкаталоги и файлы
-            if os.path.isdir(path):
-                for child in sorted(os.listdir(path)):  # Сортируем для предсказуемого вывода
-                    print_tree(os.path.join(path, child), indent + "  ")
-
-        # Вывод дерева начинается с текущего каталога
-        self.output_widget.insert("end", f"{os.path.basename(self.current_dir)}\n")
-        print_tree(self.current_dir)
-
+        # Строки дерева формируются генератором и выводятся блоками
+        self.open_sink().write_all(
+            f"{'  ' * depth}{node.name or '/'}\n"
+            for depth, node in self.virtual_fs.iter_tree(self.current_dir)
+        )
 
     def clear(self):
         self.output_widget.delete(1.0, "end")
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+
+import instrument
+from emulator import Emulator
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "other", "config.json")
+
+
+class StreamWidget:
+    # Заменитель виджета для работы без GUI: вывод пишется в обычный текстовый поток
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.closed = False
+
+    def insert(self, index, text):
+        self.stream.write(text)
+
+    def delete(self, start, end):
+        # Очищать в потоке нечего
+        pass
+
+    def mark_set(self, mark, index):
+        pass
+
+    def quit(self):
+        self.closed = True
+
+
+def run_script(emulator, lines, echo=True):
+    """Выполняет команды из итерируемого источника строк, возвращает число выполненных команд."""
+    widget = emulator.output_widget
+    executed = 0
+    for line in lines:
+        command = line.strip()
+        # Пустые строки и комментарии пропускаем
+        if not command or command.startswith("#"):
+            continue
+        if echo:
+            widget.insert("end", f"{emulator.config['username']}@shell:{emulator.get_current_path()} {command}\n")
+        emulator.execute_command(command)
+        executed += 1
+        if widget.closed:
+            break
+    return executed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запуск эмулятора оболочки без GUI.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Путь к config.json.")
+    parser.add_argument("--script", help="Файл со сценарием команд, '-' — стандартный ввод. "
+                                         "По умолчанию startup_script из конфигурации.")
+    parser.add_argument("--no-echo", action="store_true", help="Не печатать приглашение и команду перед выводом.")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+
+    script = args.script or config.get("startup_script")
+    if not script:
+        parser.error("не задан сценарий: укажите --script или startup_script в конфигурации")
+
+    instrument.enable("headless", args.profile, args.cprofile)
+    try:
+        # Буферизованный вывод напрямую в дескриптор stdout
+        with open(sys.stdout.fileno(), "w", buffering=1 << 16, encoding="utf-8", closefd=False) as out:
+            emulator = Emulator(config, StreamWidget(out))
+            if script == "-":
+                run_script(emulator, sys.stdin, echo=not args.no_echo)
+            else:
+                with open(script, encoding="utf-8") as lines:
+                    run_script(emulator, lines, echo=not args.no_echo)
+    finally:
+        instrument.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
 import json
+from collections import deque
 from emulator import Emulator
+from runner import CommandRunner
 import tkinter as tk
 from tkinter import scrolledtext
 
@@ -17,12 +19,13 @@ def run_gui(config):
     terminal_output.grid(row=0, column=0, padx=10, pady=10)
     terminal_output.configure(state=tk.NORMAL)
 
-    # Эмулятор
+    # Эмулятор; команды выполняются в рабочем потоке, вывод приходит через очередь
     emulator = Emulator(config, terminal_output)
+    runner = CommandRunner(emulator)
 
     # Формируем начальное приглашение
     def get_prompt():
-        return f"{config['username']}@shell:{emulator.current_dir}"
+        return f"{config['username']}@shell:{emulator.get_current_path()}"
 
     # Печать начального приглашения
     def print_prompt():
@@ -32,7 +35,45 @@ def run_gui(config):
 
     print_prompt()
 
+    # Команды, введённые во время выполнения предыдущей: выполняются по очереди после неё
+    pending = deque()
+    # Команда считается выполняющейся, пока её вывод не перенесён в поле и не напечатано приглашение
+    running = False
+
+    def run_command(command):
+        nonlocal running
+        running = True
+        # Запускаем команду в рабочем потоке, чтобы окно не зависало
+        terminal_output.insert(tk.END, "\n")  # Переход на новую строку для вывода результата
+        runner.submit(command)
+        root.after(20, poll_output)
+
+    def poll_output():
+        nonlocal running
+        # Переносим вывод рабочего потока в текстовое поле
+        if runner.drain(terminal_output):
+            # Команда завершилась — печатаем новое приглашение
+            running = False
+            print_prompt()
+            if pending:
+                # Отложенная команда печатается после приглашения, как если бы её ввели сейчас
+                command = pending.popleft()
+                terminal_output.insert(tk.END, command)
+                run_command(command)
+        else:
+            terminal_output.see(tk.END)
+            root.after(20, poll_output)
+
     def on_enter_pressed(event):
+        # Пока выполняется предыдущая команда, набранная строка убирается из поля
+        # и ставится в очередь, чтобы не смешиваться с выводом
+        if running:
+            command = terminal_output.get("insert linestart", "insert lineend").strip()
+            terminal_output.delete("insert linestart", "insert lineend")
+            if command:
+                pending.append(command)
+            return "break"
+
         # Получаем текущую строку (приглашение и команда)
         current_line = terminal_output.get("insert linestart", "insert lineend").strip()
 
@@ -49,23 +90,26 @@ def run_gui(config):
             print_prompt()
             return "break"
 
-        # Выполняем команду через эмулятор
-        terminal_output.insert(tk.END, "\n")  # Переход на новую строку для вывода результата
-        emulator.execute_command(command)
-
-        # Печатаем новое приглашение
-        print_prompt()
+        run_command(command)
 
         # Останавливаем перенос на новую строку
         return "break"
 
+    def on_ctrl_c(event):
+        # Прерываем выполняющуюся команду; отложенные команды тоже отменяются
+        pending.clear()
+        runner.cancel()
+        return "break"
+
     # Привязка клавиши Enter для выполнения команд
     terminal_output.bind("<Return>", on_enter_pressed)
+    terminal_output.bind("<Control-c>", on_ctrl_c)
 
     # Устанавливаем фокус на текстовое поле
     terminal_output.focus()
 
     root.mainloop()
+    runner.shutdown()
 
 if __name__ == "__main__":
     config = load_config()
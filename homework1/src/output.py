@@ -0,0 +1,47 @@
+class CommandCancelled(Exception):
+    # Выполнение команды прервано пользователем (Ctrl+C)
+    pass
+
+
+class BufferedSink:
+    # Накапливает строки вывода и передаёт их в виджет крупными блоками:
+    # одна вставка в Tk на chunk_lines строк вместо вставки на каждую строку.
+    # После max_lines строк вывод обрезается.
+
+    def __init__(self, widget, chunk_lines=2000, max_lines=None, cancel_event=None):
+        self.widget = widget
+        self.cancel_event = cancel_event
+        self.chunk_lines = chunk_lines
+        self.max_lines = max_lines
+        self.lines_written = 0
+        self.truncated = False
+        self._buffer = []
+
+    def write(self, line):
+        # Возвращает False, когда лимит исчерпан и дальше писать бессмысленно
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise CommandCancelled()
+        if self.max_lines is not None and self.lines_written >= self.max_lines:
+            self.truncated = True
+            return False
+        self._buffer.append(line)
+        self.lines_written += 1
+        if len(self._buffer) >= self.chunk_lines:
+            self.flush()
+        return True
+
+    def write_all(self, lines):
+        for line in lines:
+            if not self.write(line):
+                break
+        self.close()
+
+    def flush(self):
+        if self._buffer:
+            self.widget.insert("end", "".join(self._buffer))
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self.truncated:
+            self.widget.insert("end", f"... output truncated after {self.lines_written} lines\n")
@@ -0,0 +1,75 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueWidget:
+    # Заменитель виджета вывода для рабочего потока: вместо обращения к Tk
+    # каждая операция кладётся в очередь, а применяет её поток интерфейса.
+
+    def __init__(self, output_queue):
+        self.output_queue = output_queue
+
+    def insert(self, index, text):
+        self.output_queue.put(("insert", index, text))
+
+    def delete(self, start, end):
+        self.output_queue.put(("delete", start, end))
+
+    def mark_set(self, mark, index):
+        self.output_queue.put(("mark_set", mark, index))
+
+    def quit(self):
+        self.output_queue.put(("quit",))
+
+
+class CommandRunner:
+    # Выполняет команды эмулятора в отдельном потоке. Не зависит от Tk:
+    # вывод забирается из очереди методом drain в любой виджет.
+
+    DONE = ("done",)
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.output_queue = queue.Queue()
+        self.emulator.output_widget = QueueWidget(self.output_queue)
+        # Один рабочий поток: команды выполняются строго по очереди
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = None
+
+    def submit(self, command):
+        self.emulator.cancel_event.clear()
+        self._future = self._executor.submit(self._run, command)
+        return self._future
+
+    def _run(self, command):
+        try:
+            self.emulator.execute_command(command)
+        finally:
+            self.output_queue.put(self.DONE)
+
+    def busy(self):
+        return self._future is not None and not self._future.done()
+
+    def cancel(self):
+        # Команда прервётся в ближайшей точке проверки (при выводе очередного блока строк)
+        self.emulator.cancel_event.set()
+
+    def drain(self, widget, limit=500):
+        # Применяет накопленные операции к виджету. Возвращает True,
+        # если за этот вызов закончилась очередная команда.
+        finished = False
+        for _ in range(limit):
+            try:
+                item = self.output_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item == self.DONE:
+                finished = True
+                break
+            method, *args = item
+            getattr(widget, method)(*args)
+        return finished
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+from emulator import Emulator
+from headless import DEFAULT_CONFIG, StreamWidget
+from vfs import VirtualFS
+
+
+class LatencyStats:
+    # Статистика времени выполнения команд одной сессии
+
+    def __init__(self, window=10000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)  # Для перцентиля храним только последние замеры
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def summary(self):
+        if not self.count:
+            return {"commands": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        recent = sorted(self._recent)
+        p95 = recent[max(0, math.ceil(len(recent) * 0.95) - 1)]
+        return {
+            "commands": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Session:
+    # Сессия одного подключения: свой текущий каталог, общий образ
+
+    def __init__(self, session_id, config, virtual_fs):
+        self.session_id = session_id
+        self.emulator = Emulator(config, StreamWidget(io.StringIO()), virtual_fs)
+        self.latency = LatencyStats()
+
+    def prompt(self):
+        return f"{self.emulator.config['username']}@shell:{self.emulator.get_current_path()} "
+
+    def execute(self, command):
+        # Выполняется в пуле потоков; вывод команды собирается в строку
+        buffer = io.StringIO()
+        widget = StreamWidget(buffer)
+        self.emulator.output_widget = widget
+        self.emulator.execute_command(command)
+        return buffer.getvalue(), widget.closed
+
+
+class ShellServer:
+    # Локальный сервер оболочки: образ загружается один раз и только читается,
+    # каждое подключение получает свою сессию, команды сессий выполняются параллельно.
+
+    def __init__(self, config, workers=8):
+        self.config = config
+        self.virtual_fs = VirtualFS(config['fs_image'], config.get('fs_index', True))
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.sessions = {}
+        self.finished = {}  # Статистика закрытых сессий
+        self._next_id = 1
+
+    def stats(self):
+        sessions = dict(self.finished)
+        sessions.update((session_id, session.latency.summary()) for session_id, session in self.sessions.items())
+        return sessions
+
+    async def handle(self, reader, writer):
+        session = Session(self._next_id, self.config, self.virtual_fs)
+        self._next_id += 1
+        self.sessions[session.session_id] = session
+        loop = asyncio.get_running_loop()
+        try:
+            writer.write(session.prompt().encode())
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", errors="replace").strip()
+                if not command:
+                    # Пустая строка: только новое приглашение, как пропуск пустых строк в run_script
+                    output, closed = "", False
+                elif command == "stats":
+                    # Служебная команда сервера: статистика задержек своей сессии
+                    output, closed = json.dumps(session.latency.summary()) + "\n", False
+                else:
+                    start = time.perf_counter()
+                    output, closed = await loop.run_in_executor(self.executor, session.execute, command)
+                    session.latency.record(time.perf_counter() - start)
+                writer.write(output.encode())
+                if closed:
+                    # Ответ на exit должен уйти клиенту до закрытия соединения
+                    await writer.drain()
+                    break
+                writer.write(session.prompt().encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session.session_id]
+            self.finished[session.session_id] = session.latency.summary()
+            logging.info("session %s closed: %s", session.session_id, json.dumps(self.finished[session.session_id]))
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host="127.0.0.1", port=8023, unix_path=None):
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.virtual_fs.close()
+
+
+async def serve(server, host, port, unix_path):
+    listener = await server.start(host, port, unix_path)
+    addresses = ", ".join(str(sock.getsockname()) for sock in listener.sockets)
+    logging.info("Образ %s загружен, сервер слушает %s", server.config['fs_image'], addresses)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Многопользовательский сервер эмулятора оболочки.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Путь к config.json.")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес для TCP-подключений.")
+    parser.add_argument("--port", type=int, default=8023, help="TCP-порт.")
+    parser.add_argument("--unix", help="Путь к Unix-сокету вместо TCP.")
+    parser.add_argument("--workers", type=int, default=8, help="Число потоков для выполнения команд.")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+
+    # Замеры команд из потоков пула складываются в один отчёт; cProfile видит только главный поток
+    instrument.enable("server", args.profile, args.cprofile)
+    server = ShellServer(config, args.workers)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info("Статистика сессий: %s", json.dumps(server.stats(), indent=2))
+        server.close()
+        instrument.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import bisect
+import bz2
+import functools
+import gzip
+import json
+import lzma
+import mmap
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from fnmatch import fnmatchcase
+
+import instrument
+
+DIR = "dir"
+FILE = "file"
+
+# Сигнатуры сжатых образов и функции для их чтения
+COMPRESSED_IMAGES = (
+    (b"\x1f\x8b", gzip.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+    (b"BZh", bz2.open),
+)
+
+GLOB_CHARS = "*?["
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+
+class Node:
+    # Узел дерева виртуальной файловой системы (файл или каталог)
+    __slots__ = ("name", "size", "type", "children", "offset", "parent")
+
+    def __init__(self, name, type, size=0, offset=-1, parent=None):
+        self.name = name
+        self.type = type
+        self.size = size  # У каталога — суммарный размер всех файлов поддерева
+        self.offset = offset  # Смещение данных файла внутри tar-архива
+        self.parent = parent
+        # У файлов словаря детей нет, чтобы не тратить память на пустые dict
+        self.children = {} if type == DIR else None
+
+    def is_dir(self):
+        return self.type == DIR
+
+
+class VirtualFS:
+    # Индекс виртуальной файловой системы, построенный по заголовкам tar-архива.
+    # Архив не распаковывается: все команды работают только с этим деревом.
+
+    def __init__(self, image_path, use_index=True):
+        self.image_path = image_path
+        self.root = Node("", DIR)
+        # Индекс имён: имя файла или каталога -> список узлов с этим именем,
+        # и отсортированный список имён для шаблонов вида "префикс*"
+        self.names = {}
+        self._sorted_names = None
+        self._data_file = None
+        self._mmap = None
+        self._data = None  # Отображение несжатого образа в память, создаётся при первом чтении
+        self._data_lock = threading.Lock()
+        # Кэш разрешённых путей по ключу (cwd, path): образ только читается,
+        # поэтому результат поиска не устаревает до изменения дерева
+        self.resolve = functools.lru_cache(maxsize=4096)(self._resolve)
+        with instrument.span("vfs.load_index"):
+            loaded = use_index and self.load_index()
+        if not loaded:
+            with instrument.span("vfs.scan"):
+                self.scan()
+            if use_index:
+                with instrument.span("vfs.save_index"):
+                    self.save_index()
+        self.aggregate_sizes()
+
+    def scan(self):
+        # Один проход по заголовкам архива, содержимое файлов не читается
+        with tarfile.open(self.image_path, "r") as tar:
+            for member in tar:
+                self.add(member.name, DIR if member.isdir() else FILE, member.size, member.offset_data)
+
+    def index_path(self):
+        return self.image_path + INDEX_SUFFIX
+
+    def image_stamp(self):
+        # Индекс привязан к времени изменения и размеру образа
+        stat = os.stat(self.image_path)
+        return {"version": INDEX_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def save_index(self):
+        # Файл-спутник в формате JSON Lines: заголовок с отметкой образа,
+        # затем по строке на узел в прямом порядке: [номер родителя, имя, тип, размер, смещение].
+        # Корень имеет номер 0, остальные узлы нумеруются по порядку строк.
+        # Имена не в UTF-8 tarfile декодирует с surrogateescape: так же они пишутся и читаются.
+        ids = {id(self.root): 0}
+        tmp_path = None
+        try:
+            # Свой временный файл у каждого процесса: одновременные запуски не портят индекс друг другу
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.index_path()) + ".", suffix=".tmp",
+                                            dir=os.path.dirname(os.path.abspath(self.image_path)))
+            with open(fd, "w", encoding="utf-8", errors="surrogateescape") as f:
+                f.write(json.dumps(self.image_stamp()) + "\n")
+                stack = list(reversed(self.root.children.values()))
+                while stack:
+                    node = stack.pop()
+                    ids[id(node)] = len(ids)
+                    f.write(json.dumps([ids[id(node.parent)], node.name, node.type, node.size, node.offset],
+                                       ensure_ascii=False) + "\n")
+                    if node.children:
+                        stack.extend(reversed(node.children.values()))
+            os.replace(tmp_path, self.index_path())
+        except (OSError, ValueError):
+            # Каталог образа может быть недоступен для записи, а имя — не записываться
+            # в файл: тогда просто работаем без индекса
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def load_index(self):
+        # Возвращает True, если дерево загружено из актуального файла-спутника
+        try:
+            with open(self.index_path(), encoding="utf-8", errors="surrogateescape") as f:
+                if json.loads(f.readline()) != self.image_stamp():
+                    return False  # Образ изменился, индекс нужно перестроить
+                nodes = [self.root]
+                for line in f:
+                    parent_id, name, type, size, offset = json.loads(line)
+                    parent = nodes[parent_id]
+                    node = Node(name, type, size, offset, parent)
+                    parent.children[name] = node
+                    self._index_name(node)
+                    nodes.append(node)
+        except (OSError, ValueError, TypeError, IndexError):
+            # Повреждённый индекс: начинаем заново со сканирования архива
+            self.root = Node("", DIR)
+            self.names = {}
+            self._sorted_names = None
+            return False
+        return True
+
+    def add(self, path, type, size=0, offset=-1):
+        parts = [part for part in path.split("/") if part and part != "."]
+        if not parts:
+            return self.root
+        self.resolve.cache_clear()
+        parent = self.root
+        # Промежуточные каталоги создаём сами: в архиве их заголовков может не быть
+        for part in parts[:-1]:
+            child = parent.children.get(part)
+            if child is None:
+                child = Node(part, DIR, parent=parent)
+                parent.children[part] = child
+                self._index_name(child)
+            parent = child
+        name = parts[-1]
+        node = parent.children.get(name)
+        if node is not None:
+            if node.type == DIR and type == DIR:
+                return node  # Каталог уже был создан как промежуточный
+            # Повторная запись в архиве заменяет предыдущую
+            self.names[name].remove(node)
+        node = Node(name, type, size, offset, parent)
+        parent.children[name] = node
+        self._index_name(node)
+        return node
+
+    def _index_name(self, node):
+        nodes = self.names.get(node.name)
+        if nodes is None:
+            self.names[node.name] = [node]
+            self._sorted_names = None
+        else:
+            nodes.append(node)
+
+    def aggregate_sizes(self):
+        # Размеры поддеревьев считаются один раз при загрузке образа.
+        # Обходим каталоги в прямом порядке, а суммируем в обратном,
+        # чтобы дети всегда были посчитаны раньше родителя.
+        order = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for child in node.children.values() if child.children is not None)
+        for node in reversed(order):
+            node.size = sum(child.size for child in node.children.values())
+
+    def iter_tree(self, node):
+        # Итеративный обход поддерева в прямом порядке: пары (глубина, узел).
+        # Стек вместо рекурсии, поэтому глубина образа ничем не ограничена.
+        stack = [(0, node)]
+        while stack:
+            depth, node = stack.pop()
+            yield depth, node
+            if node.children:
+                stack.extend((depth + 1, node.children[name]) for name in sorted(node.children, reverse=True))
+
+    def _resolve(self, cwd, path):
+        # Возвращает узел по пути относительно cwd или None, если пути нет.
+        # Абсолютные пути и ~ (домашний каталог — корень образа) отсчитываются от корня.
+        if path == "~" or path.startswith("~/"):
+            node = self.root
+            path = path[1:]
+        else:
+            node = self.root if path.startswith("/") else cwd
+        for part in path.split("/"):
+            if not part or part == ".":
+                continue
+            if part == "..":
+                # Выше корня подняться нельзя
+                if node.parent is not None:
+                    node = node.parent
+                continue
+            if node.children is None:
+                return None
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def read(self, node):
+        # Содержимое файла как срез отображения образа в память, без копирования
+        data = self._data if self._data is not None else self._map_data()
+        return data[node.offset:node.offset + node.size]
+
+    def _map_data(self):
+        # Образ может читаться из нескольких потоков: отображение создаётся один раз
+        with self._data_lock:
+            if self._data is None:
+                self._open_data()
+        return self._data
+
+    def _open_data(self):
+        opener = self._decompressor()
+        if opener is None:
+            self._data_file = open(self.image_path, "rb")
+        else:
+            # Сжатый образ один раз распаковываем во временный файл целиком,
+            # смещения из заголовков tar указывают как раз в несжатый поток
+            self._data_file = tempfile.TemporaryFile()
+            with opener(self.image_path, "rb") as src:
+                shutil.copyfileobj(src, self._data_file, 1024 * 1024)
+            self._data_file.flush()
+        self._mmap = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._mmap)
+
+    def _decompressor(self):
+        with open(self.image_path, "rb") as f:
+            magic = f.read(6)
+        for signature, opener in COMPRESSED_IMAGES:
+            if magic.startswith(signature):
+                return opener
+        return None
+
+    def close(self):
+        if self._data is not None:
+            self._data.release()
+            self._mmap.close()
+            self._data_file.close()
+            self._data = None
+
+    def find(self, start, pattern):
+        # Узлы поддерева start, имя которых подходит под шаблон, в порядке путей.
+        # Кандидаты берутся из индекса имён, а не обходом дерева.
+        if not any(char in pattern for char in GLOB_CHARS):
+            names = [pattern] if pattern in self.names else []
+        elif pattern.endswith("*") and not any(char in pattern[:-1] for char in GLOB_CHARS):
+            # Шаблон "префикс*" — двоичный поиск диапазона в отсортированном списке имён
+            prefix = pattern[:-1]
+            sorted_names = self.sorted_names()
+            names = []
+            for i in range(bisect.bisect_left(sorted_names, prefix), len(sorted_names)):
+                if not sorted_names[i].startswith(prefix):
+                    break
+                names.append(sorted_names[i])
+        else:
+            names = [name for name in self.names if fnmatchcase(name, pattern)]
+
+        found = [node for name in names for node in self.names[name] if self.is_inside(node, start)]
+        return sorted(found, key=self.path_of)
+
+    def sorted_names(self):
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.names)
+        return self._sorted_names
+
+    def is_inside(self, node, directory):
+        while node is not None:
+            if node is directory:
+                return True
+            node = node.parent
+        return False
+
+    def glob(self, cwd, pattern):
+        # Раскрытие шаблона по сегментам пути; возвращает отсортированные пути
+        # в той же форме, что и шаблон (относительные остаются относительными)
+        if pattern == "~" or pattern.startswith("~/"):
+            matches = [("~", self.root)]
+            pattern = pattern[2:]
+        elif pattern.startswith("/"):
+            matches = [("", self.root)]
+        else:
+            matches = [(None, cwd)]
+        for part in pattern.split("/"):
+            if not part:
+                continue
+            next_matches = []
+            for prefix, node in matches:
+                if node.children is None:
+                    continue
+                if any(char in part for char in GLOB_CHARS):
+                    # Скрытые имена подходят только под шаблон, начинающийся с точки
+                    names = [name for name in node.children
+                             if fnmatchcase(name, part) and (part.startswith(".") or not name.startswith("."))]
+                    children = [(name, node.children[name]) for name in sorted(names)]
+                else:
+                    child = self._resolve(node, part)
+                    children = [(part, child)] if child is not None else []
+                for name, child in children:
+                    next_matches.append((name if prefix is None else f"{prefix}/{name}", child))
+            matches = next_matches
+        return [path for path, _ in matches if path is not None]
+
+    def path_of(self, node):
+        parts = []
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return "/" + "/".join(reversed(parts))
@@ -1,24 +1,46 @@
+import asyncio
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+import gzip
+import io
+import json
 import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import instrument
 from emulator import Emulator
+from runner import CommandRunner
+from headless import StreamWidget, run_script
+from bench import make_image, run_benchmark
+from server import ShellServer
 
 class TestEmulatorCommands(unittest.TestCase):
 
     def setUp(self):
-        # Путь к виртуальной файловой системе (путь к директории virtual_fs на вашем ПК)
+        # Образ виртуальной файловой системы из каталога other
         self.config = {
             "username": "abyssoftime",
-            "fs_image": "C:/Users/Ultre/Documents/hw_1/other/virtual_fs.tar",
-            "startup_script": "C:/Users/Ultre/Documents/hw_1/other/startup.sh"
+            "fs_image": os.path.join(BASE_DIR, "other", "virtual_fs.tar"),
+            "startup_script": os.path.join(BASE_DIR, "other", "startup.sh"),
+            "fs_index": False
         }
         self.output_mock = MagicMock()
         self.emulator = Emulator(self.config, self.output_mock)
+
+    def node(self, path):
+        return self.emulator.virtual_fs.resolve(self.emulator.virtual_fs.root, path)
     
     # 1. Тесты для команды 'ls'
     def test_ls_directory_contents(self):
         # Проверяем вывод команды ls в директории dir1
-        self.emulator.current_dir = os.path.join(self.emulator.virtual_fs, "dir1")
+        self.emulator.current_dir = self.node("dir1")
         self.emulator.ls()
         # Ожидаемый вывод: список файлов в каталоге dir1
         expected_output = "file1.txt\nfile2.txt\n"
@@ -26,7 +48,7 @@ class TestEmulatorCommands(unittest.TestCase):
 
     def test_ls_empty_directory(self):
         # Проверяем вывод команды ls в пустой директории dir3
-        self.emulator.current_dir = os.path.join(self.emulator.virtual_fs, "dir3")
+        self.emulator.current_dir = self.node("dir3")
         self.emulator.ls()
         # Ожидаемый вывод: пустая строка
         self.output_mock.insert.assert_called_with("end", "file5.txt\n")
@@ -36,17 +58,52 @@ class TestEmulatorCommands(unittest.TestCase):
     
     def test_cd_to_existing_directory(self):
         # Переход в существующую директорию dir2
-        self.emulator.current_dir = self.emulator.virtual_fs
+        self.emulator.current_dir = self.emulator.virtual_fs.root
         self.emulator.cd(['cd', 'dir2'])
-        self.assertEqual(self.emulator.current_dir, os.path.join(self.emulator.virtual_fs, 'dir2'))
+        self.assertEqual(self.emulator.current_dir, self.node("dir2"))
 
     def test_cd_to_non_existent_directory(self):
         # Переход в несуществующую директорию dir4
-        self.emulator.current_dir = self.emulator.virtual_fs
+        self.emulator.current_dir = self.emulator.virtual_fs.root
         self.emulator.cd(['cd', 'dir4'])
         # Проверка, что выводит ошибку
         self.output_mock.insert.assert_any_call('end', 'cd: dir4: No such file or directory\n')
 
+    def test_cd_multi_segment_path(self):
+        # Переход по составному пути и возврат к корню через ..
+        self.emulator.cd(['cd', 'dir1/../dir3'])
+        self.assertEqual(self.emulator.get_current_path(), '/dir3')
+        self.emulator.cd(['cd', '../..'])
+        self.assertEqual(self.emulator.get_current_path(), '/')
+
+    def test_cd_absolute_and_home(self):
+        # Абсолютные пути, . и ~ разрешаются от корня образа
+        self.emulator.cd(['cd', '/dir1/./../dir2'])
+        self.assertEqual(self.emulator.get_current_path(), '/dir2')
+        self.emulator.cd(['cd', '~/dir3'])
+        self.assertEqual(self.emulator.get_current_path(), '/dir3')
+        self.emulator.cd(['cd', '~'])
+        self.assertEqual(self.emulator.get_current_path(), '/')
+
+    def test_cd_resolution_cached(self):
+        # Повторный переход по тому же пути из того же каталога берётся из кэша
+        fs = self.emulator.virtual_fs
+        for _ in range(3):
+            self.emulator.cd(['cd', 'dir1'])
+            self.emulator.cd(['cd', '..'])
+        self.assertEqual(fs.resolve.cache_info().hits, 4)
+
+    def test_cd_to_file(self):
+        # Файл не может быть текущим каталогом
+        self.emulator.cd(['cd', 'dir1/file1.txt'])
+        self.output_mock.insert.assert_any_call('end', 'cd: dir1/file1.txt: No such file or directory\n')
+        self.assertEqual(self.emulator.get_current_path(), '/')
+
+    def test_image_not_extracted(self):
+        # Образ индексируется в памяти и не распаковывается на диск
+        self.assertFalse(os.path.exists("virtual_fs"))
+        self.assertEqual(self.node("dir1/file1.txt").size, 127)
+
     # 3. Тесты для команды 'exit'
     
     def test_exit_shell(self):
@@ -63,35 +120,161 @@ class TestEmulatorCommands(unittest.TestCase):
     
     def test_du_disk_usage(self):
         # Проверка подсчета дискового пространства для dir1
-        self.emulator.current_dir = os.path.join(self.emulator.virtual_fs, 'dir1')
+        self.emulator.current_dir = self.node("dir1")
         self.emulator.du()
         # Проверка, что выводит общий размер
         self.output_mock.insert.assert_any_call('end', 'Total disk usage: 127 bytes\n')
 
     def test_du_disk_usage_in_subdirectories(self):
         # Проверка подсчета дискового пространства для dir2 (с файлами)
-        self.emulator.current_dir = os.path.join(self.emulator.virtual_fs, 'dir2')
+        self.emulator.current_dir = self.node("dir2")
         self.emulator.du()
         # Проверка, что выводится общий размер для всех файлов
         self.output_mock.insert.assert_any_call('end', 'Total disk usage: 0 bytes\n')
 
+    def test_du_root_aggregate(self):
+        # Размер корня посчитан заранее из размеров всех файлов
+        self.assertEqual(self.emulator.virtual_fs.root.size, 127)
+        self.emulator.du(['du'])
+        self.output_mock.insert.assert_any_call('end', 'Total disk usage: 127 bytes\n')
+
+    def test_du_depth_breakdown(self):
+        # Разбивка по подкаталогам первого уровня
+        self.emulator.du(['du', '-d', '1'])
+        self.output_mock.insert.assert_any_call('end', '127\tdir1\n0\tdir2\n0\tdir3\n')
+
+    def test_du_invalid_arguments(self):
+        self.emulator.du(['du', '-x'])
+        self.output_mock.insert.assert_called_with('end', 'du: usage: du [-d N]\n')
+
     # 5. Тесты для команды 'tree'
     
     def test_tree_output(self):
-        # Проверка вывода структуры дерева для текущего каталога (virtual_fs)
-        self.emulator.current_dir = self.emulator.virtual_fs
+        # Проверка вывода структуры дерева для текущего каталога (корень образа)
+        self.emulator.current_dir = self.emulator.virtual_fs.root
         self.emulator.tree()
-        # Проверка, что структура дерева начинается с виртуальной системы
-        self.output_mock.insert.assert_any_call('end', 'virtual_fs\n')
+        # Всё дерево выводится одной вставкой и начинается с корня образа
+        self.output_mock.insert.assert_called_once()
+        text = self.output_mock.insert.call_args[0][1]
+        self.assertTrue(text.startswith('/\n  dir1\n    file1.txt\n'))
+        self.assertEqual(text.count('\n'), 9)
     
     def test_tree_subdirectory_output(self):
         # Проверка вывода дерева для каталога dir2
-        self.emulator.current_dir = os.path.join(self.emulator.virtual_fs, 'dir2')
+        self.emulator.current_dir = self.node("dir2")
+        self.emulator.tree()
+        # Проверка, что вывод дерева содержит файлы dir2
+        self.output_mock.insert.assert_called_once_with('end', 'dir2\n  file3.txt\n  file4.txt\n')
+
+    def test_tree_deep_nesting(self):
+        # Глубина вложенности больше предела рекурсии Python
+        self.emulator.virtual_fs.add("/".join(["d"] * 3000), "dir")
+        self.emulator.current_dir = self.node("d")
+        self.emulator.tree()
+        text = self.output_mock.insert.call_args_list[-1][0][1]
+        self.assertTrue(text.endswith('  ' * 2999 + 'd\n'))
+
+    def test_tree_output_truncated(self):
+        # Слишком длинный вывод обрезается
+        self.emulator.config['max_output_lines'] = 3
         self.emulator.tree()
-        # Проверка, что вывод дерева содержит файлы dir3
-        self.output_mock.insert.assert_any_call('end', '  file4.txt\n')
+        self.output_mock.insert.assert_any_call('end', '/\n  dir1\n    file1.txt\n')
+        self.output_mock.insert.assert_called_with('end', '... output truncated after 3 lines\n')
     
-    # 6. Тесты для команды 'clear'
+    # 6. Тесты для команды 'cat'
+
+    def test_cat_file(self):
+        # Содержимое файла читается из образа без распаковки
+        self.emulator.cat(['cat', 'dir1/file1.txt'])
+        self.output_mock.insert.assert_called_with('end', 'Hellow World!!! ' * 7 + 'Hellow World!!!\n')
+
+    def test_cat_directory(self):
+        self.emulator.cat(['cat', 'dir1'])
+        self.output_mock.insert.assert_called_with('end', 'cat: dir1: Is a directory\n')
+
+    def test_cat_compressed_image(self):
+        # Сжатый образ распаковывается один раз во временный файл
+        with tempfile.TemporaryDirectory() as tmp:
+            image = os.path.join(tmp, "virtual_fs.tar.gz")
+            with open(self.config["fs_image"], "rb") as src, gzip.open(image, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            emulator = Emulator(dict(self.config, fs_image=image), self.output_mock)
+            emulator.cat(['cat', '/dir1/file1.txt'])
+            emulator.virtual_fs.close()
+        self.output_mock.insert.assert_called_with('end', 'Hellow World!!! ' * 7 + 'Hellow World!!!\n')
+
+    def test_index_sidecar_reused(self):
+        # Первый запуск пишет файл-спутник, второй загружает дерево из него без чтения архива
+        with tempfile.TemporaryDirectory() as tmp:
+            image = os.path.join(tmp, "virtual_fs.tar")
+            shutil.copy(self.config["fs_image"], image)
+            config = dict(self.config, fs_image=image, fs_index=True)
+            Emulator(config, self.output_mock)
+            self.assertTrue(os.path.exists(image + ".idx"))
+            with patch("vfs.tarfile.open", side_effect=AssertionError("archive rescanned")):
+                emulator = Emulator(config, self.output_mock)
+            self.assertEqual(emulator.virtual_fs.root.size, 127)
+            emulator.cat(['cat', 'dir1/file1.txt'])
+            self.output_mock.insert.assert_called_with('end', 'Hellow World!!! ' * 7 + 'Hellow World!!!\n')
+            emulator.virtual_fs.close()
+
+    def test_index_rebuilt_when_image_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            image = os.path.join(tmp, "virtual_fs.tar")
+            shutil.copy(self.config["fs_image"], image)
+            config = dict(self.config, fs_image=image, fs_index=True)
+            Emulator(config, self.output_mock)
+            # Новый образ с другим содержимым и временем изменения
+            with tarfile.open(image, "w") as tar:
+                info = tarfile.TarInfo("only/new.txt")
+                tar.addfile(info)
+            os.utime(image, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+            emulator = Emulator(config, self.output_mock)
+            self.assertEqual(list(emulator.virtual_fs.root.children), ["only"])
+
+    def test_index_with_non_utf8_names(self):
+        # Имя в latin-1: tarfile декодирует его с surrogateescape, индекс сохраняет и загружает его без потерь
+        with tempfile.TemporaryDirectory() as tmp:
+            image = os.path.join(tmp, "latin1.tar")
+            with tarfile.open(image, "w", format=tarfile.GNU_FORMAT, encoding="latin-1") as tar:
+                info = tarfile.TarInfo("caf\u00e9.txt")
+                info.size = 3
+                tar.addfile(info, io.BytesIO(b"abc"))
+            config = dict(self.config, fs_image=image, fs_index=True)
+            names = list(Emulator(config, self.output_mock).virtual_fs.root.children)
+            self.assertTrue(os.path.exists(image + ".idx"))
+            self.assertEqual([name for name in os.listdir(tmp) if name.endswith(".tmp")], [])
+            with patch("vfs.tarfile.open", side_effect=AssertionError("archive rescanned")):
+                emulator = Emulator(config, self.output_mock)
+            self.assertEqual(list(emulator.virtual_fs.root.children), names)
+            emulator.cat(['cat', names[0]])
+            self.output_mock.insert.assert_called_with('end', 'abc\n')
+            emulator.virtual_fs.close()
+
+    # 7. Тесты для команды 'find' и раскрытия шаблонов
+
+    def test_find_literal_name(self):
+        # Точное имя ищется по индексу имён
+        self.emulator.execute_command('find / -name file4.txt')
+        self.output_mock.insert.assert_called_once_with('end', '/dir2/file4.txt\n')
+
+    def test_find_prefix_pattern_in_subdirectory(self):
+        # Шаблон "префикс*" и ограничение поиска каталогом
+        self.emulator.execute_command('find dir2 -name file*')
+        self.output_mock.insert.assert_called_once_with('end', 'dir2/file3.txt\ndir2/file4.txt\n')
+
+    def test_find_wildcard_pattern(self):
+        self.emulator.execute_command('find -name *[15].txt')
+        self.output_mock.insert.assert_called_once_with('end', './dir1/file1.txt\n./dir3/file5.txt\n')
+
+    def test_glob_expansion(self):
+        # Шаблоны в аргументах раскрываются по дереву образа
+        self.assertEqual(self.emulator.expand_globs(['cat', 'dir?/file[34].txt', '/dir3/*']),
+                         ['cat', 'dir2/file3.txt', 'dir2/file4.txt', '/dir3/file5.txt'])
+        # Шаблон без совпадений остаётся как есть
+        self.assertEqual(self.emulator.expand_globs(['cd', 'nothing*']), ['cd', 'nothing*'])
+
+    # 8. Тесты для команды 'clear'
     
     def test_clear_output(self):
         # Проверка очистки вывода после выполнения команды clear
@@ -104,5 +287,159 @@ class TestEmulatorCommands(unittest.TestCase):
         self.emulator.clear()
         self.output_mock.delete.assert_any_call(1.0, 'end')
 
+class TestCommandRunner(unittest.TestCase):
+
+    def setUp(self):
+        config = {
+            "username": "abyssoftime",
+            "fs_image": os.path.join(BASE_DIR, "other", "virtual_fs.tar"),
+            "fs_index": False,
+        }
+        self.emulator = Emulator(config, MagicMock())
+        self.runner = CommandRunner(self.emulator)
+        self.widget = MagicMock()
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_command_output_goes_through_queue(self):
+        # Команда выполняется в рабочем потоке, вывод применяется при drain
+        self.runner.submit("cd dir1").result(timeout=5)
+        self.assertTrue(self.runner.drain(self.widget))
+        self.runner.submit("ls").result(timeout=5)
+        self.assertTrue(self.runner.drain(self.widget))
+        self.widget.insert.assert_called_once_with("end", "file1.txt\nfile2.txt\n")
+        self.assertFalse(self.runner.busy())
+
+    def test_cancelled_command(self):
+        # Установленный флаг отмены прерывает команду при первом выводе
+        self.emulator.cancel_event.set()
+        self.emulator.execute_command("tree")
+        self.assertFalse(self.runner.drain(self.widget))
+        self.widget.insert.assert_called_once_with("end", "^C\n")
+
+    def test_exit_command_quits_widget(self):
+        self.runner.submit("exit").result(timeout=5)
+        self.runner.drain(self.widget)
+        self.widget.quit.assert_called_once()
+
+
+class TestHeadless(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "username": "abyssoftime",
+            "fs_image": os.path.join(BASE_DIR, "other", "virtual_fs.tar"),
+            "fs_index": False,
+        }
+
+    def test_run_script(self):
+        # Сценарий выполняется без GUI, вывод пишется в поток, exit останавливает сценарий
+        out = io.StringIO()
+        emulator = Emulator(self.config, StreamWidget(out))
+        executed = run_script(emulator, ["# comment\n", "cd dir2\n", "\n", "ls\n", "exit\n", "ls\n"], echo=False)
+        self.assertEqual(executed, 3)
+        self.assertEqual(out.getvalue(), "file3.txt\nfile4.txt\nExiting shell...\n")
+
+    def test_profile_report(self):
+        # Загрузка образа и каждая команда замеряются отдельными участками
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = os.path.join(tmp, "profile.json")
+            instrument.enable("headless", report_path)
+            try:
+                emulator = Emulator(self.config, StreamWidget(io.StringIO()))
+                run_script(emulator, ["ls\n", "cd dir2\n", "ls\n"], echo=False)
+            finally:
+                instrument.finish()
+            with open(report_path) as f:
+                report = json.load(f)
+        self.assertEqual(report["spans"]["command.ls"]["count"], 2)
+        self.assertIn("vfs.scan", report["spans"])
+        self.assertEqual(report["counters"], {"commands": 3})
+
+    def test_benchmark_on_synthetic_image(self):
+        # Синтетический образ: 2 уровня по 3 каталога, в каждом по 2 файла
+        with tempfile.TemporaryDirectory() as tmp:
+            image = os.path.join(tmp, "bench.tar")
+            entries, deepest = make_image(image, depth=2, fanout=3, files_per_dir=2)
+            self.assertEqual(entries, 36)
+            self.assertEqual(deepest, "d0/d0")
+            results = run_benchmark(image, deepest, iterations=10)
+        self.assertEqual(set(results), {"startup", "startup_indexed", "ls", "cd", "du", "tree"})
+
+
+class TestShellServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        config = {
+            "username": "abyssoftime",
+            "fs_image": os.path.join(BASE_DIR, "other", "virtual_fs.tar"),
+            "fs_index": False,
+        }
+        self.server = ShellServer(config, workers=4)
+        self.listener = await self.server.start(port=0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.server.close()
+
+    async def command(self, reader, writer, command):
+        writer.write(f"{command}\n".encode())
+        await writer.drain()
+        return await self.read_until_prompt(reader)
+
+    async def read_until_prompt(self, reader):
+        # Читаем вывод команды вместе со следующим приглашением
+        data = b""
+        while not data.endswith(b" ") or b"@shell:" not in data:
+            chunk = await reader.read(1024)
+            if not chunk:
+                break
+            data += chunk
+        return data.decode()
+
+    async def test_sessions_have_separate_directories(self):
+        # Две сессии разделяют образ, но у каждой свой текущий каталог
+        first = await asyncio.open_connection("127.0.0.1", self.port)
+        second = await asyncio.open_connection("127.0.0.1", self.port)
+        for reader, _ in (first, second):
+            self.assertEqual(await self.read_until_prompt(reader), "abyssoftime@shell:/ ")
+
+        outputs = await asyncio.gather(
+            self.command(*first, "cd dir1"),
+            self.command(*second, "cd dir2"),
+        )
+        self.assertEqual(outputs, ["abyssoftime@shell:/dir1 ", "abyssoftime@shell:/dir2 "])
+        self.assertEqual(await self.command(*second, "ls"), "file3.txt\nfile4.txt\nabyssoftime@shell:/dir2 ")
+
+        sessions = list(self.server.sessions.values())
+        self.assertIs(sessions[0].emulator.virtual_fs, sessions[1].emulator.virtual_fs)
+        self.assertEqual(self.server.stats()[2]["commands"], 2)
+
+        # Пустая строка даёт одно приглашение и не попадает в статистику
+        self.assertEqual(await self.command(*second, "  "), "abyssoftime@shell:/dir2 ")
+        self.assertEqual(await self.command(*second, "ls"), "file3.txt\nfile4.txt\nabyssoftime@shell:/dir2 ")
+        self.assertEqual(self.server.stats()[2]["commands"], 3)
+
+        for _, writer in (first, second):
+            writer.close()
+            await writer.wait_closed()
+
+    async def test_exit_reply_is_delivered(self):
+        # Ответ на exit приходит целиком, затем сервер закрывает соединение
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        await self.read_until_prompt(reader)
+        writer.write(b"ls\nexit\n")
+        await writer.drain()
+        data = (await reader.read()).decode()
+        self.assertEqual(data, "dir1\ndir2\ndir3\nabyssoftime@shell:/ Exiting shell...\n")
+        self.assertEqual(self.server.sessions, {})
+        self.assertEqual(self.server.stats()[1]["commands"], 2)
+        writer.close()
+        await writer.wait_closed()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+from pom_resolver import Dependency
+from query import GraphIndex
+
+
+def make_tree(nodes, fanout=4):
+    """Рёбра синтетического дерева зависимостей: у каждого артефакта fanout детей."""
+    dependencies = [Dependency(None, "g:root:jar:1.0", 0, None)]
+    for i in range(1, nodes):
+        parent = f"g:a{(i - 1) // fanout}:jar:1.0" if i > fanout else "g:root:jar:1.0"
+        dependencies.append(Dependency(parent, f"g:a{i}:jar:1.0", 1, None, "compile"))
+    return dependencies
+
+
+def run_benchmark(nodes, repeat=3):
+    """Время построения индекса и запросов к самому глубокому артефакту, лучшее из repeat замеров."""
+    dependencies = make_tree(nodes)
+    target = f"g:a{nodes - 1}"
+    results = {"index": measure(lambda: GraphIndex.from_dependencies(dependencies), repeat)}
+    index = GraphIndex.from_dependencies(dependencies)
+    for name, function in (
+        ("shortest_path", lambda: index.shortest_path(target)),
+        ("reverse_dependencies", lambda: index.reverse_dependencies(target)),
+        ("all_paths", lambda: index.all_paths(target)),
+        ("conflicts", index.conflicts),
+    ):
+        results[name] = measure(function, repeat)
+    return results
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер запросов к графу зависимостей на синтетическом дереве.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10000, 50000, 200000], help="Число узлов графа.")
+    parser.add_argument("--repeat", type=int, default=3, help="Число повторов каждого замера.")
+    args = parser.parse_args(argv)
+
+    for nodes in args.nodes:
+        results = run_benchmark(nodes, args.repeat)
+        print(f"{nodes:>8} узлов: " + ", ".join(f"{name} {seconds * 1000:.2f} мс" for name, seconds in results.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+from collections import deque
+
+
+def group_of(coord):
+    """groupId координаты groupId:artifactId:type[:classifier]:version."""
+    return coord.split(":", 1)[0]
+
+
+def coord_version(coord):
+    """Версия координаты узла groupId:artifactId:type[:classifier]:version — последнее поле.
+
+    Область видимости в координату узла не входит: она хранится в ребре.
+    """
+    parts = coord.split(":")
+    return parts[-1] if len(parts) > 3 else None
+
+
+def _quote(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class DependencyGraph:
+    """Граф зависимостей с интернированными узлами.
+
+    Каждая координата хранится один раз и получает целый номер, рёбра задаются
+    парами номеров и не повторяются. Порядок добавления узлов и рёбер сохраняется,
+    поэтому DOT-файл одного и того же графа не меняется от запуска к запуску.
+    """
+
+    def __init__(self):
+        self.ids = {}  # Координата -> номер узла
+        self.labels = []  # Номер узла -> координата
+        self.edges = {}  # (откуда, куда) -> пометка omitted или None
+        self.scopes = {}  # (откуда, куда) -> область видимости ребра, если она известна
+
+    @classmethod
+    def from_dependencies(cls, dependencies, root=None):
+        """Строит граф из рёбер Dependency; рёбра без родителя идут от узла root."""
+        graph = cls()
+        for dependency in dependencies:
+            parent = dependency[0] or root
+            if parent is None:
+                graph.node(dependency[1])
+                continue
+            graph.add_edge(parent, dependency[1], dependency[3] if len(dependency) > 3 else None,
+                           dependency[4] if len(dependency) > 4 else None)
+        return graph
+
+    def node(self, label):
+        node_id = self.ids.get(label)
+        if node_id is None:
+            node_id = self.ids[label] = len(self.labels)
+            self.labels.append(label)
+        return node_id
+
+    def add_edge(self, parent, child, omitted=None, scope=None):
+        key = (self.node(parent), self.node(child))
+        if key not in self.edges or self.edges[key] is not None and omitted is None:
+            # Настоящее ребро важнее исключённого Maven дубликата с той же парой узлов
+            self.edges[key] = omitted
+            if scope is not None:
+                self.scopes[key] = scope
+            else:
+                self.scopes.pop(key, None)
+
+    def successors(self):
+        adjacency = [[] for _ in self.labels]
+        for source, target in self.edges:
+            adjacency[source].append(target)
+        return adjacency
+
+    def predecessors(self):
+        adjacency = [[] for _ in self.labels]
+        for source, target in self.edges:
+            adjacency[target].append(source)
+        return adjacency
+
+    def roots(self):
+        has_parent = [False] * len(self.labels)
+        for _, target in self.edges:
+            has_parent[target] = True
+        return [node_id for node_id, flag in enumerate(has_parent) if not flag]
+
+    def find(self, artifact):
+        """Номера узлов по координате или её началу (groupId:artifactId)."""
+        prefix = artifact + ":"
+        found = [node_id for node_id, label in enumerate(self.labels) if label == artifact or label.startswith(prefix)]
+        if not found:
+            raise Exception(f"Артефакт {artifact} не найден в графе.")
+        return found
+
+    def _reachable(self, start, adjacency):
+        seen = set(start)
+        queue = deque(start)
+        while queue:
+            for next_id in adjacency[queue.popleft()]:
+                if next_id not in seen:
+                    seen.add(next_id)
+                    queue.append(next_id)
+        return seen
+
+    def subgraph(self, nodes):
+        """Новый граф из заданных узлов и рёбер между ними, номера узлов назначаются заново."""
+        graph = DependencyGraph()
+        for node_id in sorted(nodes):
+            graph.node(self.labels[node_id])
+        for (source, target), omitted in self.edges.items():
+            if source in nodes and target in nodes:
+                graph.add_edge(self.labels[source], self.labels[target], omitted, self.scopes.get((source, target)))
+        return graph
+
+    def reachable_from(self, artifact):
+        """Подграф зависимостей артефакта: всё, что он подтягивает."""
+        return self.subgraph(self._reachable(self.find(artifact), self.successors()))
+
+    def reachable_to(self, artifact):
+        """Подграф зависящих от артефакта: все пути, которыми он попадает в проект."""
+        return self.subgraph(self._reachable(self.find(artifact), self.predecessors()))
+
+    def limit_depth(self, max_depth, start=()):
+        """Отсекает узлы дальше max_depth рёбер от корней графа.
+
+        Если корней нет (все узлы лежат на циклах), глубина отсчитывается от узлов
+        start (координаты или groupId:artifactId), а без них — от первого узла графа:
+        в графе from_dependencies это узел проекта.
+        """
+        roots = self.roots()
+        if not roots:
+            roots = [node_id for artifact in start for node_id in self.find(artifact)]
+        if not roots and self.labels:
+            roots = [0]
+        depth = dict.fromkeys(roots, 0)
+        adjacency = self.successors()
+        queue = deque(depth)
+        while queue:
+            node_id = queue.popleft()
+            if depth[node_id] == max_depth:
+                continue
+            for next_id in adjacency[node_id]:
+                if next_id not in depth:
+                    depth[next_id] = depth[node_id] + 1
+                    queue.append(next_id)
+        return self.subgraph(depth)
+
+    def collapse_by_group(self):
+        """Объединяет артефакты одного groupId в один узел; рёбра внутри группы пропадают."""
+        graph = DependencyGraph()
+        for label in self.labels:
+            graph.node(group_of(label))
+        for (source, target), omitted in self.edges.items():
+            parent, child = group_of(self.labels[source]), group_of(self.labels[target])
+            if parent != child:
+                graph.add_edge(parent, child, omitted)
+        return graph
+
+    def iter_dot(self):
+        """Строки DOT-файла: узлы объявляются один раз с меткой, рёбра ссылаются на короткие номера."""
+        yield "digraph dependencies {\n"
+        yield '    node [shape=box, style=filled, fillcolor=lightyellow, fontname="Arial"];\n'
+        yield '    edge [fontname="Arial", color=black];\n'
+        for node_id, label in enumerate(self.labels):
+            yield f'    n{node_id} [label="{_quote(label)}"];\n'
+        for (source, target), omitted in self.edges.items():
+            scope = self.scopes.get((source, target))
+            if omitted:
+                # Исключённые Maven зависимости рисуются пунктиром с причиной
+                yield f'    n{source} -> n{target} [style=dashed, label="{_quote(omitted)}"];\n'
+            elif scope and scope != "compile":
+                # Область compile подразумевается, остальные подписываются на ребре
+                yield f'    n{source} -> n{target} [label="{_quote(scope)}"];\n'
+            else:
+                yield f"    n{source} -> n{target};\n"
+        yield "}\n"
+
+    def write_dot(self, f):
+        for line in self.iter_dot():
+            f.write(line)
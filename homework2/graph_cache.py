@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from pom_resolver import Dependency, default_local_repo, read_pom
+
+# Версия формата записей: меняется вместе со структурой сохраняемых рёбер
+FORMAT_VERSION = 3
+
+
+def file_digest(path):
+    """SHA-256 содержимого файла или None, если файла нет."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class GraphCache:
+    """Дисковый кэш графов зависимостей и разобранных POM.
+
+    Граф проекта хранится по ключу из хэша его pom.xml, способа разрешения и пути
+    к локальному репозиторию. Вместе с графом записываются хэши всех POM, от которых
+    он зависит (родители, артефакты локального репозитория); запись действительна,
+    только пока все они не изменились. Разобранные POM кэшируются по хэшу содержимого,
+    поэтому при изменении одного POM заново разбирается только он.
+    Размер каталога ограничен: при превышении удаляются давно не использованные записи.
+    Каталог обходится только при первой проверке и когда накопленный размер превысил
+    предел: записи этого процесса учитываются в нём без обхода, чужие — при следующем обходе.
+    """
+
+    def __init__(self, cache_dir=".depgraph_cache", max_bytes=50 * 1024 * 1024, memory_entries=4096):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total = None  # Размер каталога по последнему обходу и записям после него
+        self._poms = OrderedDict()  # LRU разобранных POM в памяти: хэш -> модель
+        os.makedirs(os.path.join(cache_dir, "graphs"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "poms"), exist_ok=True)
+
+    def graph_key(self, project_path, resolver, local_repo=None, modules=None):
+        # Набор модулей реактора меняет разрешение соседей, поэтому входит в ключ
+        key = [FORMAT_VERSION, resolver, os.path.abspath(local_repo or default_local_repo()),
+               file_digest(os.path.join(project_path, "pom.xml")),
+               sorted([*coord, os.path.abspath(path)] for coord, path in (modules or {}).items())]
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    def _entry_path(self, kind, key):
+        return os.path.join(self.cache_dir, kind, f"{key}.json")
+
+    def _load(self, kind, key):
+        path = self._entry_path(kind, key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # Отмечаем использование для вытеснения давно не нужных записей
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def _store(self, kind, key, entry):
+        path = self._entry_path(kind, key)
+        # Свой временный файл у каждого процесса и потока: модули реактора пишут в кэш параллельно
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp_path)
+        try:
+            size -= os.path.getsize(path)  # Запись заменяется: учитывается только разница
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+        if self._total is not None:
+            self._total += size
+
+    def get_graph(self, key):
+        """Возвращает сохранённый список рёбер или None, если записи нет или она устарела."""
+        entry = self._load("graphs", key)
+        if entry is not None and all(file_digest(path) == digest for path, digest in entry["inputs"]):
+            self.hits += 1
+            return [Dependency(*edge) for edge in entry["edges"]]
+        self.misses += 1
+        return None
+
+    def put_graph(self, key, edges, inputs):
+        inputs = sorted(os.path.abspath(path) for path in inputs)
+        self._store("graphs", key, {
+            "inputs": [[path, file_digest(path)] for path in inputs],
+            "edges": [list(edge) for edge in edges],
+        })
+        self.evict()
+
+    def read_pom(self, pom_path):
+        """Разобранный POM из кэша по хэшу содержимого; при промахе файл разбирается и сохраняется."""
+        with open(pom_path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        raw = self._poms.get(digest)
+        if raw is not None:
+            self._poms.move_to_end(digest)
+            return raw
+        raw = self._load("poms", digest)
+        if raw is None:
+            raw = read_pom(pom_path, data)
+            self._store("poms", digest, raw)
+        self._poms[digest] = raw
+        if len(self._poms) > self.memory_entries:
+            self._poms.popitem(last=False)
+        return raw
+
+    def evict(self):
+        if self._total is not None and self._total <= self.max_bytes:
+            return
+        entries = []
+        total = 0
+        for kind in ("graphs", "poms"):
+            directory = os.path.join(self.cache_dir, kind)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Запись уже удалена другим процессом
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,165 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+
+# Путь к JSON-отчёту: включает сбор без флага --profile
+ENV_VAR = "PROFILE_REPORT"
+# "1" — дополнительно снять профиль cProfile
+CPROFILE_ENV_VAR = "PROFILE_CPROFILE"
+# Сколько самых дорогих функций cProfile попадает в отчёт
+CPROFILE_TOP = 30
+
+# Пустой контекст без состояния: один экземпляр на все выключенные замеры
+NULL_SPAN = contextlib.nullcontext()
+
+_profiler = None
+
+
+class Span:
+    """Замер одного участка кода; время добавляется к участку с тем же именем."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    """Сборщик замеров: суммарное и максимальное время участков, счётчики, профиль cProfile.
+
+    Замеры из разных потоков складываются под блокировкой. cProfile снимает
+    профиль только потока, в котором сбор был включён.
+    """
+
+    def __init__(self, tool, report_path, cprofile=False):
+        self.tool = tool
+        self.report_path = report_path
+        self.spans = {}  # Имя участка -> [число замеров, суммарное время, максимум]
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.cprofile = cProfile.Profile() if cprofile else None
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def span(self, name):
+        return Span(self, name)
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        report = {
+            "tool": self.tool,
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "spans": {
+                name: {"count": count, "total_seconds": round(total, 6), "max_seconds": round(longest, 6)}
+                for name, (count, total, longest) in sorted(self.spans.items(), key=lambda item: -item[1][1])
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            stats = pstats.Stats(self.cprofile).stats
+            top = sorted(stats.items(), key=lambda item: -item[1][3])[:CPROFILE_TOP]
+            report["cprofile"] = [
+                {"function": f"{path}:{line}({function})", "calls": calls,
+                 "self_seconds": round(own, 6), "cumulative_seconds": round(cumulative, 6)}
+                for (path, line, function), (_, calls, own, cumulative, _) in top
+            ]
+        return report
+
+    def write(self):
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+def enable(tool, report_path=None, cprofile=False):
+    """Включает сбор, если задан report_path (флаг --profile) или переменная PROFILE_REPORT.
+
+    Возвращает Profiler или None, если сбор выключен.
+    """
+    global _profiler
+    report_path = report_path or os.environ.get(ENV_VAR)
+    if not report_path:
+        return None
+    _profiler = Profiler(tool, report_path, cprofile or os.environ.get(CPROFILE_ENV_VAR) == "1")
+    return _profiler
+
+
+def finish():
+    """Записывает отчёт и выключает сбор."""
+    global _profiler
+    if _profiler is not None:
+        profiler, _profiler = _profiler, None
+        profiler.write()
+
+
+def enabled():
+    return _profiler is not None
+
+
+def span(name):
+    """Контекст замера участка; при выключенном сборе — общий пустой контекст."""
+    if _profiler is None:
+        return NULL_SPAN
+    return _profiler.span(name)
+
+
+def count(name, value=1):
+    if _profiler is not None:
+        _profiler.count(name, value)
+
+
+def record(name, seconds):
+    """Добавляет готовый замер, если сбор включён: для участков, которые неудобно обернуть в span."""
+    if _profiler is not None:
+        _profiler.record(name, seconds)
+
+
+def timed_iter(iterable, name_of):
+    """Итератор, замеряющий получение каждого элемента; имя участка — name_of(элемент).
+
+    Оборачивать стоит только при включённом сборе: проверка enabled() делается один раз снаружи.
+    """
+    iterator = iter(iterable)
+    record = _profiler.record
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        record(name_of(item), time.perf_counter() - start)
+        yield item
+
+
+def add_arguments(parser):
+    """Флаги --profile и --cprofile для argparse."""
+    parser.add_argument("--profile", metavar="REPORT.json", default=None,
+                        help=f"Записать JSON-отчёт о времени участков и счётчиках (или переменная {ENV_VAR}).")
+    parser.add_argument("--cprofile", action="store_true",
+                        help=f"Добавить в отчёт профиль cProfile (или {CPROFILE_ENV_VAR}=1).")
@@ -1,72 +1,144 @@
 import argparse
+import re
 import subprocess
 import os
+import time
+
+import instrument
+from graph import DependencyGraph
+from graph_cache import GraphCache
+from pom_resolver import Dependency, PomResolver
+from reactor import analyze_modules, find_reactor_modules
+from render import output_format, render, render_batch
+
+# Строка дерева: необязательный префикс [INFO], отступ из блоков по 3 символа ("|  ", "   ", "+- ", "\- ")
+# и содержимое, начинающееся с координаты groupId:artifactId:type[:classifier]:version[:scope]
+TREE_LINE_PATTERN = re.compile(r"^(?:\[INFO\] ?)?((?:\|  |   |\+- |\\- )*)(\(?[^\s:()]+(?::[^\s:()]+){3,5})(.*)$")
 
 def run_maven_dependency_tree(project_path):
     """Запускает команду mvn dependency:tree для указанного проекта."""
     try:
-        result = subprocess.run(
-            ["mvn.cmd", "dependency:tree", "-Dverbose"],  # Используем флаг -Dverbose для вывода всех зависимостей
-            cwd=project_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        with instrument.span("maven.dependency_tree"):
+            result = subprocess.run(
+                ["mvn.cmd", "dependency:tree", "-Dverbose"],  # Используем флаг -Dverbose для вывода всех зависимостей
+                cwd=project_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
         if result.returncode != 0:
             raise Exception(f"Ошибка Maven: {result.stderr}")
         return result.stdout
     except FileNotFoundError:
         raise Exception("Maven не найден. Убедитесь, что он установлен и добавлен в PATH.")
 
+def iter_dependency_tree(lines):
+    """Потоково разбирает строки вывода mvn dependency:tree и выдаёт рёбра Dependency.
+
+    Родитель каждой зависимости восстанавливается по глубине отступа, поэтому
+    разбор выполняется за один проход. Зависимости, исключённые Maven при -Dverbose
+    ("(... - omitted for conflict with 2.0)"), выдаются с пометкой omitted.
+    Область видимости отделяется от координаты и записывается в ребро, поэтому
+    узел зависимости совпадает с узлом корня модуля с той же координатой.
+    """
+    parents = []  # parents[i] — последний узел на глубине i
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.lstrip().startswith("["):
+            line = line.lstrip()
+        match = TREE_LINE_PATTERN.match(line)
+        if not match:
+            continue
+        prefix, coord, rest = match.groups()
+        depth = len(prefix) // 3
+
+        omitted = None
+        if coord.startswith("("):
+            # (g:a:jar:1.0:compile - omitted for conflict with 2.0)
+            coord = coord[1:]
+            omitted = rest.strip().lstrip("-").strip().rstrip(")") or "omitted"
+
+        scope = None
+        if depth:
+            # У зависимостей последнее поле — область: g:a:jar:1.0:compile, g:a:jar:linux:1.0:test
+            coord, scope = coord.rsplit(":", 1) if coord.count(":") >= 4 else (coord, None)
+
+        del parents[depth:]
+        if depth == 0:
+            parents.append(coord)  # Корень модуля; в реакторе их несколько
+            continue
+        while len(parents) < depth:
+            parents.append(None)  # Вывод без строки корня: родитель неизвестен
+        parent = parents[depth - 1]
+        parents.append(coord)
+        yield Dependency(parent, coord, depth, omitted, scope)
+
 def parse_dependency_tree(output):
-    """Парсит вывод mvn dependency:tree и возвращает список зависимостей."""
-    dependencies = []
-    current_dep = None
-
-    for line in output.splitlines():
-        line = line.strip()
-        
-        # Ищем прямые зависимости
-        if line.startswith("[INFO]") and ":" in line:
-            parts = line.split()
-            if len(parts) > 1 and (parts[1].startswith("+-") or parts[1].startswith("\\-") or parts[1].startswith("|-")):
-                # Извлекаем название зависимости и её версию
-                from_dep = parts[1][2:]  # Убираем "+-" или "\-" или "|-"
-                to_dep = parts[-1].split(":")[1]  # Берем версию (например, 3.12.0)
-                dependencies.append((from_dep, to_dep))
-    
+    """Парсит вывод mvn dependency:tree и возвращает список рёбер Dependency."""
+    lines = output.splitlines() if isinstance(output, str) else output
+    with instrument.span("parse_dependency_tree"):
+        dependencies = list(iter_dependency_tree(lines))
+    instrument.count("dependency_tree.edges", len(dependencies))
     return dependencies
 
-def generate_dot_file(dependencies, output_file, project_name):
+def build_graph(dependencies, project_name, collapse_groups=False, max_depth=None,
+                reachable_from=None, reachable_to=None):
+    """Строит граф без повторов узлов и рёбер и применяет фильтры."""
+    graph = DependencyGraph.from_dependencies(dependencies, project_name)
+    if reachable_from:
+        graph = graph.reachable_from(reachable_from)
+    if reachable_to:
+        graph = graph.reachable_to(reachable_to)
+    if max_depth is not None:
+        # Граф из одних циклов не имеет корней: глубина считается от выбранного артефакта
+        graph = graph.limit_depth(max_depth, [reachable_from] if reachable_from else [])
+    if collapse_groups:
+        graph = graph.collapse_by_group()
+    return graph
+
+def generate_dot_file(dependencies, output_file, project_name, **filters):
     """Создаёт файл DOT для визуализации зависимостей с улучшенным оформлением."""
-    with open(output_file, "w") as f:
-        f.write("digraph dependencies {\n")
-        
-        # Настройка общего стиля графа
-        f.write('    node [shape=box, style=filled, fillcolor=lightyellow, fontname="Arial"];\n')
-        f.write('    edge [fontname="Arial", color=black];\n')
-
-        # Добавление зависимостей с направлением от главного прямоугольника
-        for from_dep, to_dep in dependencies:
-            f.write(f'    "{project_name}" -> "{to_dep}";\n')  # Зависимость от текущей зависимости
-
-        f.write("}\n")
-    print(f"Файл DOT создан: {output_file}")
-
-def generate_graph(dot_file, output_image, dot_path):
-    """Генерирует изображение из файла DOT с помощью Graphviz."""
-    try:
-        result = subprocess.run(
-            [dot_path, "-Tpng", dot_file, "-o", output_image],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if result.returncode != 0:
-            raise Exception(f"Ошибка Graphviz: {result.stderr}")
-        print(f"Графическое изображение создано: {output_image}")
-    except FileNotFoundError:
-        raise Exception("Graphviz не найден. Убедитесь, что утилита dot доступна в PATH.")
+    with instrument.span("build_graph"):
+        graph = dependencies if isinstance(dependencies, DependencyGraph) else \
+            build_graph(dependencies, project_name, **filters)
+    # Строки пишутся по мере формирования, весь текст графа в памяти не собирается
+    with instrument.span("write_dot"), open(output_file, "w") as f:
+        graph.write_dot(f)
+    instrument.count("graph.nodes", len(graph.labels))
+    instrument.count("graph.edges", len(graph.edges))
+    print(f"Файл DOT создан: {output_file} (узлов: {len(graph.labels)}, рёбер: {len(graph.edges)})")
+
+def generate_graph(dot_file, output_image, dot_path, formats=(), force=False):
+    """Генерирует изображение из файла DOT с помощью Graphviz.
+
+    Дополнительные форматы (svg, pdf...) рисуются тем же запуском dot рядом с output_image.
+    Если DOT не изменился с прошлой отрисовки, dot не запускается.
+    """
+    base = os.path.splitext(output_image)[0]
+    outputs = list(dict.fromkeys([output_image] + [f"{base}.{fmt}" for fmt in formats]))
+    with instrument.span("generate_graph"):
+        rendered = render(dot_file, outputs, dot_path, force)
+    instrument.count("graphviz.rendered", len(rendered))
+    if rendered:
+        print(f"Графическое изображение создано: {', '.join(rendered)}")
+    else:
+        print(f"Граф не изменился, изображение актуально: {', '.join(outputs)}")
+
+def generate_module_graphs(results, output_dir, dot_path, formats=("png",), force=False):
+    """Рисует граф каждого модуля реактора; все изображения строит один процесс dot."""
+    os.makedirs(output_dir, exist_ok=True)
+    common = os.path.commonpath([result["path"] for result in results])
+    dot_files = []
+    for result in results:
+        name = os.path.relpath(result["path"], common).replace(os.sep, "_")
+        dot_file = os.path.join(output_dir, ("root" if name == "." else name) + ".dot")
+        graph = build_graph(result["dependencies"], get_project_name(result["path"]))
+        with open(dot_file, "w") as f:
+            graph.write_dot(f)
+        dot_files.append(dot_file)
+    with instrument.span("generate_module_graphs"):
+        rendered = render_batch(dot_files, formats, dot_path, force)
+    print(f"Графы модулей: {len(dot_files)}, перерисовано: {len(rendered)} ({output_dir})")
 
 def get_project_name(project_path):
     """Извлекает имя XML-файла из пути проекта (например, pom.xml)."""
@@ -76,31 +148,125 @@ def get_project_name(project_path):
     else:
         raise Exception("Файл pom.xml не найден в указанной директории.")
 
+def load_dependencies(project_path, resolver="native", local_repo=None, cache=None, modules=None):
+    """Возвращает зависимости проекта, при наличии кэша — без повторного разрешения.
+
+    modules — модули реактора ((groupId, artifactId, version) -> pom.xml), которые
+    разрешаются из рабочего дерева, а не из локального репозитория.
+    """
+    key = None
+    if cache is not None:
+        with instrument.span("cache.get_graph"):
+            key = cache.graph_key(project_path, resolver, local_repo, modules)
+            dependencies = cache.get_graph(key)
+        if dependencies is not None:
+            return dependencies
+
+    pom_resolver = PomResolver(local_repo, cache, modules)
+    if resolver == "maven":
+        dependencies = parse_dependency_tree(run_maven_dependency_tree(project_path))
+        # Для проверки актуальности записи нужны POM проекта, его родителей и всех
+        # артефактов дерева: изменение любого из них может изменить вывод Maven
+        pom_resolver.effective_model(os.path.join(project_path, "pom.xml"))
+        for coord in {dependency.child for dependency in dependencies}:
+            pom_resolver.track_artifact(coord)
+    else:
+        # Граф строится по pom.xml и локальному репозиторию, без запуска JVM
+        with instrument.span("resolve.native"):
+            _, dependencies = pom_resolver.resolve(project_path)
+
+    if cache is not None:
+        with instrument.span("cache.put_graph"):
+            cache.put_graph(key, dependencies, pom_resolver.inputs)
+    return dependencies
+
 def main():
     parser = argparse.ArgumentParser(description="Визуализация зависимостей Maven.")
-    parser.add_argument("--project-path", required=True, help="Путь к Maven-проекту.")
+    projects = parser.add_mutually_exclusive_group(required=True)
+    projects.add_argument("--project-path", help="Путь к Maven-проекту.")
+    projects.add_argument("--project-paths", nargs="+", help="Несколько Maven-проектов, анализируемых параллельно.")
+    parser.add_argument("--reactor", action="store_true",
+                        help="Анализировать все модули реактора из <modules> корневого pom.xml.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Число параллельных обработчиков модулей.")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="Пул для анализа модулей: процессы (native) или потоки (достаточно для maven).")
     parser.add_argument("--dot-path", default="dot", help="Путь к утилите dot (Graphviz).")
     parser.add_argument("--output-image", default="dependencies.png", help="Имя выходного файла изображения.")
     parser.add_argument("--dot-file", default="dependencies.dot", help="Имя выходного файла DOT.")
+    parser.add_argument("--resolver", choices=["native", "maven"], default="native",
+                        help="Способ построения графа: разбор pom.xml без Maven (native) или mvn dependency:tree (maven).")
+    parser.add_argument("--local-repo", default=None,
+                        help="Путь к локальному репозиторию Maven (по умолчанию ~/.m2/repository).")
+    parser.add_argument("--cache-dir", default=".depgraph_cache", help="Каталог кэша графов зависимостей.")
+    parser.add_argument("--cache-max-mb", type=float, default=50, help="Максимальный размер кэша в мегабайтах.")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш графов.")
+    parser.add_argument("--formats", nargs="+", default=[], metavar="FORMAT",
+                        help="Дополнительные форматы изображения (svg, pdf...) из той же раскладки.")
+    parser.add_argument("--force-render", action="store_true", help="Перерисовать изображение, даже если граф не изменился.")
+    parser.add_argument("--module-graphs", metavar="DIR",
+                        help="В режиме нескольких проектов нарисовать граф каждого модуля в этот каталог.")
+    parser.add_argument("--collapse-groups", action="store_true", help="Объединить артефакты одного groupId в один узел.")
+    parser.add_argument("--max-depth", type=int, default=None, help="Не показывать зависимости глубже заданной.")
+    parser.add_argument("--reachable-from", metavar="ARTIFACT",
+                        help="Оставить только зависимости артефакта (groupId:artifactId[:...]).")
+    parser.add_argument("--reachable-to", metavar="ARTIFACT",
+                        help="Оставить только пути, которыми артефакт попадает в проект.")
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
+    instrument.enable("depgraph", args.profile, args.cprofile)
     try:
         # Автоматическое получение имени XML файла
-        project_name = get_project_name(args.project_path)
+        project_name = get_project_name(args.project_path or args.project_paths[0])
 
         print("Запуск анализа зависимостей...")
-        maven_output = run_maven_dependency_tree(args.project_path)
-        dependencies = parse_dependency_tree(maven_output)
+        cache_max_bytes = int(args.cache_max_mb * 1024 * 1024)
+        if args.reactor or args.project_paths:
+            roots = args.project_paths or [args.project_path]
+            paths = list(dict.fromkeys(
+                module for root in roots
+                for module in (find_reactor_modules(root) if args.reactor else [os.path.abspath(root)])
+            ))
+            start = time.perf_counter()
+            with instrument.span("reactor.analyze_modules"):
+                dependencies, results = analyze_modules(
+                    paths, args.workers, args.executor, args.resolver, args.local_repo,
+                    None if args.no_cache else args.cache_dir, cache_max_bytes)
+            for result in results:
+                # Рабочие процессы не пишут в отчёт: время модулей берётся из их результатов
+                instrument.record("reactor.module", result["seconds"])
+            failed = [result for result in results if result["error"]]
+            print(f"Модулей: {len(results)}, с ошибками: {len(failed)}, рёбер: {len(dependencies)}, "
+                  f"время: {time.perf_counter() - start:.2f} с")
+            if not args.no_cache:
+                stats = {key: sum(result["cache"][key] for result in results) for key in ("hits", "misses", "evictions")}
+                print(f"Кэш графов: попаданий {stats['hits']}, промахов {stats['misses']}, вытеснено {stats['evictions']}")
+            if len(failed) == len(results):
+                raise Exception("Не удалось проанализировать ни одного модуля.")
+            if args.module_graphs:
+                generate_module_graphs([result for result in results if not result["error"]], args.module_graphs,
+                                       args.dot_path, list(dict.fromkeys([output_format(args.output_image)] + args.formats)),
+                                       args.force_render)
+        else:
+            cache = None if args.no_cache else GraphCache(args.cache_dir, cache_max_bytes)
+            dependencies = load_dependencies(args.project_path, args.resolver, args.local_repo, cache)
+            if cache is not None:
+                stats = cache.stats()
+                print(f"Кэш графов: попаданий {stats['hits']}, промахов {stats['misses']}, вытеснено {stats['evictions']}")
 
         print("Генерация файла DOT...")
-        generate_dot_file(dependencies, args.dot_file, project_name)
+        generate_dot_file(dependencies, args.dot_file, project_name, collapse_groups=args.collapse_groups,
+                          max_depth=args.max_depth, reachable_from=args.reachable_from,
+                          reachable_to=args.reachable_to)
 
         print("Создание графического изображения...")
-        generate_graph(args.dot_file, args.output_image, args.dot_path)
+        generate_graph(args.dot_file, args.output_image, args.dot_path, args.formats, args.force_render)
 
         print("Задача выполнена. Откройте изображение:", args.output_image)
     except Exception as e:
         print(f"Ошибка: {e}")
+    finally:
+        instrument.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,329 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import deque, namedtuple
+
+from graph import coord_version
+
+PROPERTY_PATTERN = re.compile(r"\$\{([^}]+)\}")
+
+# Ребро графа зависимостей: родитель, зависимость (groupId:artifactId:type[:classifier]:version),
+# глубина зависимости от корня, пометка исключённой зависимости (например "omitted for conflict with 2.0")
+# и область видимости. Область — свойство ребра, а не узла: артефакт, подключённый в разных
+# областях, и модуль реактора, от которого зависят соседние модули, остаются одним узлом
+Dependency = namedtuple("Dependency", "parent child depth omitted scope", defaults=(1, None, None))
+
+# Какие области видимости переходят транзитивно: (область родителя, область ребёнка) -> итоговая область
+SCOPE_MEDIATION = {
+    ("compile", "compile"): "compile",
+    ("compile", "runtime"): "runtime",
+    ("provided", "compile"): "provided",
+    ("provided", "runtime"): "provided",
+    ("runtime", "compile"): "runtime",
+    ("runtime", "runtime"): "runtime",
+    ("test", "compile"): "test",
+    ("test", "runtime"): "test",
+}
+
+
+def default_local_repo():
+    """Возвращает путь к локальному репозиторию Maven (~/.m2/repository)."""
+    return os.path.join(os.path.expanduser("~"), ".m2", "repository")
+
+
+def _local_name(tag):
+    # Убираем пространство имён из тега: {http://maven.apache.org/POM/4.0.0}groupId -> groupId
+    return tag.rsplit("}", 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name] if element is not None else []
+
+
+def _elements(element, name):
+    # Все дочерние элементы вложенного блока, например <properties>
+    block = _child(element, name)
+    return list(block) if block is not None else []
+
+
+def _child(element, name):
+    children = _children(element, name)
+    return children[0] if children else None
+
+
+def _text(element, name, default=None):
+    child = _child(element, name)
+    if child is None or child.text is None:
+        return default
+    return child.text.strip()
+
+
+def _read_dependency(element):
+    return {
+        "groupId": _text(element, "groupId"),
+        "artifactId": _text(element, "artifactId"),
+        "version": _text(element, "version"),
+        "type": _text(element, "type"),
+        "classifier": _text(element, "classifier"),
+        "scope": _text(element, "scope"),
+        "optional": _text(element, "optional", "false"),
+        "exclusions": [(_text(exclusion, "groupId"), _text(exclusion, "artifactId"))
+                       for exclusion in _children(_child(element, "exclusions"), "exclusion")],
+    }
+
+
+def read_pom(pom_path, data=None):
+    """Читает pom.xml и возвращает его содержимое без наследования и подстановки свойств."""
+    try:
+        root = ET.fromstring(data) if data is not None else ET.parse(pom_path).getroot()
+    except ET.ParseError as e:
+        raise Exception(f"Ошибка разбора {pom_path}: {e}")
+
+    parent = _child(root, "parent")
+    management = _child(_child(root, "dependencyManagement"), "dependencies")
+    return {
+        "groupId": _text(root, "groupId"),
+        "artifactId": _text(root, "artifactId"),
+        "version": _text(root, "version"),
+        "packaging": _text(root, "packaging", "jar"),
+        "parent": None if parent is None else {
+            "groupId": _text(parent, "groupId"),
+            "artifactId": _text(parent, "artifactId"),
+            "version": _text(parent, "version"),
+            "relativePath": _text(parent, "relativePath", "../pom.xml"),
+        },
+        "properties": {_local_name(prop.tag): (prop.text or "").strip() for prop in _elements(root, "properties")},
+        "dependencies": [_read_dependency(dep) for dep in _children(_child(root, "dependencies"), "dependency")],
+        "dependencyManagement": [_read_dependency(dep) for dep in _children(management, "dependency")],
+        "modules": [module.text.strip() for module in _children(_child(root, "modules"), "module") if module.text],
+    }
+
+
+def interpolate(value, properties):
+    """Подставляет значения свойств ${...}; неизвестные свойства остаются как есть."""
+    if value is None or "${" not in value:
+        return value
+    for _ in range(10):  # Свойства могут ссылаться друг на друга, но не бесконечно
+        new_value = PROPERTY_PATTERN.sub(lambda m: properties.get(m.group(1), m.group(0)), value)
+        if new_value == value:
+            break
+        value = new_value
+    return value
+
+
+def artifact_coord(group_id, artifact_id, type_, version, classifier=None):
+    """Координата узла графа: groupId:artifactId:type[:classifier]:version."""
+    if classifier:
+        return f"{group_id}:{artifact_id}:{type_}:{classifier}:{version}"
+    return f"{group_id}:{artifact_id}:{type_}:{version}"
+
+
+def management_key(dep):
+    return (dep["groupId"], dep["artifactId"], dep["type"] or "jar", dep["classifier"])
+
+
+class PomResolver:
+    """Строит граф транзитивных зависимостей по pom.xml и локальному репозиторию без запуска Maven."""
+
+    def __init__(self, local_repo=None, pom_cache=None, modules=None):
+        self.local_repo = local_repo or default_local_repo()
+        self.pom_cache = pom_cache  # Кэш разобранных POM по хэшу содержимого (graph_cache.GraphCache)
+        # Модули реактора: (groupId, artifactId, version) -> pom.xml. Соседние модули
+        # берутся из рабочего дерева, а не из локального репозитория, где их может не быть
+        self.modules = modules or {}
+        self.missing = set()  # Артефакты, POM которых нет в локальном репозитории
+        self.inputs = set()  # Все прочитанные и не найденные файлы POM: от них зависит результат
+        self._models = {}  # Кэш эффективных моделей по пути к POM
+
+    def _read_pom(self, pom_path):
+        self.inputs.add(pom_path)
+        if self.pom_cache is not None:
+            return self.pom_cache.read_pom(pom_path)
+        return read_pom(pom_path)
+
+    def _exists(self, pom_path):
+        # Отсутствие файла тоже входное условие: появится POM — изменится граф
+        if os.path.isfile(pom_path):
+            return True
+        self.inputs.add(pom_path)
+        return False
+
+    def track_artifact(self, coord):
+        """Отмечает POM артефакта из локального репозитория и его родителей как входные данные.
+
+        Нужно, когда граф построен не этим классом (mvn dependency:tree), но должен
+        устаревать при изменении POM зависимостей.
+        """
+        version = coord_version(coord)
+        if version is None:
+            return
+        group_id, artifact_id = coord.split(":", 2)[:2]
+        pom_path = self.repo_pom_path(group_id, artifact_id, version)
+        if self._exists(pom_path):
+            self.effective_model(pom_path)
+
+    def repo_pom_path(self, group_id, artifact_id, version):
+        return os.path.join(self.local_repo, *group_id.split("."), artifact_id, version,
+                            f"{artifact_id}-{version}.pom")
+
+    def _parent_path(self, pom_path, parent):
+        # Сначала родитель ищется по relativePath, затем в локальном репозитории
+        if parent["relativePath"]:
+            candidate = os.path.normpath(os.path.join(os.path.dirname(pom_path), parent["relativePath"]))
+            if os.path.isdir(candidate):
+                candidate = os.path.join(candidate, "pom.xml")
+            if self._exists(candidate):
+                raw = self._read_pom(candidate)
+                if (raw["groupId"] or (raw["parent"] or {}).get("groupId"), raw["artifactId"]) == \
+                        (parent["groupId"], parent["artifactId"]):
+                    return candidate
+        candidate = self.repo_pom_path(parent["groupId"], parent["artifactId"], parent["version"])
+        if self._exists(candidate):
+            return candidate
+        return None
+
+    def effective_model(self, pom_path):
+        """Модель POM с учётом родителей, свойств и dependencyManagement."""
+        pom_path = os.path.abspath(pom_path)
+        if pom_path in self._models:
+            return self._models[pom_path]
+
+        raw = self._read_pom(pom_path)
+        parent_model = None
+        if raw["parent"]:
+            parent_path = self._parent_path(pom_path, raw["parent"])
+            if parent_path is None:
+                self.missing.add(f'{raw["parent"]["groupId"]}:{raw["parent"]["artifactId"]}:{raw["parent"]["version"]}')
+            else:
+                parent_model = self.effective_model(parent_path)
+
+        group_id = raw["groupId"] or (raw["parent"] or {}).get("groupId")
+        version = raw["version"] or (raw["parent"] or {}).get("version")
+        properties = dict(parent_model["properties"]) if parent_model else {}
+        properties.update(raw["properties"])
+        properties.update({
+            "project.groupId": group_id,
+            "project.artifactId": raw["artifactId"],
+            "project.version": version,
+            "pom.groupId": group_id,
+            "pom.version": version,
+        })
+        if raw["parent"]:
+            properties["project.parent.groupId"] = raw["parent"]["groupId"]
+            properties["project.parent.version"] = raw["parent"]["version"]
+
+        def expand(dep):
+            dep = dict(dep)
+            for key in ("groupId", "artifactId", "version", "type", "classifier", "scope", "optional"):
+                dep[key] = interpolate(dep[key], properties)
+            return dep
+
+        # Унаследованные объявления хранятся без подстановки: свойства в них
+        # (например ${project.version}) раскрываются значениями дочернего POM
+        raw_managed = (parent_model["raw_managed"] if parent_model else []) + raw["dependencyManagement"]
+        raw_dependencies = (parent_model["raw_dependencies"] if parent_model else []) + raw["dependencies"]
+
+        # Управляемые версии: объявления родителя и собственные, импортированные BOM — с низшим приоритетом
+        managed = {}
+        imported = []
+        for dep in map(expand, raw_managed):
+            if dep["scope"] == "import" and dep["type"] == "pom":
+                imported.append(dep)
+            else:
+                managed[management_key(dep)] = dep
+        for dep in imported:
+            bom_path = self.repo_pom_path(dep["groupId"], dep["artifactId"], dep["version"])
+            if self._exists(bom_path):
+                for key, bom_dep in self.effective_model(bom_path)["managed"].items():
+                    managed.setdefault(key, bom_dep)
+            else:
+                self.missing.add(f'{dep["groupId"]}:{dep["artifactId"]}:{dep["version"]}')
+
+        model = {
+            "groupId": group_id,
+            "artifactId": raw["artifactId"],
+            "version": version,
+            "packaging": raw["packaging"],
+            "properties": properties,
+            "managed": managed,
+            "dependencies": [expand(dep) for dep in raw_dependencies],
+            "modules": raw["modules"],
+            "raw_managed": raw_managed,
+            "raw_dependencies": raw_dependencies,
+        }
+        self._models[pom_path] = model
+        return model
+
+    def artifact_model(self, group_id, artifact_id, version):
+        module_path = self.modules.get((group_id, artifact_id, version))
+        if module_path is not None:
+            return self.effective_model(module_path)
+        pom_path = self.repo_pom_path(group_id, artifact_id, version)
+        if not self._exists(pom_path):
+            self.missing.add(f"{group_id}:{artifact_id}:{version}")
+            return None
+        return self.effective_model(pom_path)
+
+    def resolve(self, project_path):
+        """Возвращает (корень, список рёбер Dependency) графа зависимостей проекта.
+
+        Узлы записываются как groupId:artifactId:type[:classifier]:version, область
+        видимости хранится в ребре. Конфликты версий
+        решаются как в Maven: побеждает ближайшая к корню зависимость, при равной
+        глубине — объявленная раньше. Проигравшие версии попадают в граф с пометкой
+        omitted, как в выводе mvn dependency:tree -Dverbose.
+        """
+        pom_path = os.path.join(project_path, "pom.xml")
+        if not os.path.isfile(pom_path):
+            raise Exception("Файл pom.xml не найден в указанной директории.")
+        root = self.effective_model(pom_path)
+        root_coord = artifact_coord(root["groupId"], root["artifactId"], root["packaging"], root["version"])
+        root_managed = root["managed"]
+
+        edges = []
+        resolved = {(root["groupId"], root["artifactId"]): root["version"]}
+        # Очередь обхода в ширину: (узел-родитель, модель, область родителя, исключения, глубина)
+        queue = deque([(root_coord, root, None, frozenset(), 0)])
+        while queue:
+            parent_coord, model, parent_scope, exclusions, depth = queue.popleft()
+            is_root = depth == 0
+            for dep in model["dependencies"]:
+                key = (dep["groupId"], dep["artifactId"])
+                if key in exclusions or (dep["groupId"], "*") in exclusions or ("*", "*") in exclusions:
+                    continue
+                if not is_root and dep["optional"] == "true":
+                    continue
+
+                # dependencyManagement корня переопределяет транзитивные версии и области,
+                # собственный dependencyManagement артефакта лишь заполняет пропущенные
+                own = model["managed"].get(management_key(dep), {})
+                override = {} if is_root else root_managed.get(management_key(dep), {})
+                version = override.get("version") or dep["version"] or own.get("version")
+                scope = override.get("scope") or dep["scope"] or own.get("scope") or "compile"
+                if parent_scope is not None:
+                    scope = SCOPE_MEDIATION.get((parent_scope, scope))
+                    if scope is None:
+                        continue  # test и provided транзитивно не переходят
+                if version is None:
+                    continue
+                coord = artifact_coord(dep["groupId"], dep["artifactId"], dep["type"] or "jar", version,
+                                       dep["classifier"])
+                if key in resolved:
+                    if resolved[key] != version:
+                        edges.append(Dependency(parent_coord, coord, depth + 1,
+                                                f"omitted for conflict with {resolved[key]}", scope))
+                    continue
+                resolved[key] = version
+                edges.append(Dependency(parent_coord, coord, depth + 1, None, scope))
+
+                child_model = self.artifact_model(dep["groupId"], dep["artifactId"], version)
+                if child_model is not None:
+                    child_exclusions = exclusions.union(map(tuple, dep["exclusions"] + own.get("exclusions", [])))
+                    queue.append((coord, child_model, scope, child_exclusions, depth + 1))
+        return root_coord, edges
+
+
+def resolve_dependencies(project_path, local_repo=None):
+    """Строит список рёбер Dependency без запуска Maven."""
+    _, edges = PomResolver(local_repo).resolve(project_path)
+    return edges
@@ -0,0 +1,198 @@
+import argparse
+from collections import deque
+
+from graph import DependencyGraph, coord_version
+from graph_cache import GraphCache
+from main import load_dependencies, parse_dependency_tree
+
+
+def artifact_key(coord):
+    """groupId:artifactId координаты groupId:artifactId:type[:classifier]:version."""
+    return ":".join(coord.split(":", 2)[:2])
+
+
+class GraphIndex:
+    """Индекс графа зависимостей для запросов: списки смежности в обе стороны и поиск по groupId:artifactId.
+
+    Индекс строится один раз за линейное время, после чего запросы обходят
+    только нужную часть графа.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.labels = graph.labels
+        self.successors = graph.successors()
+        self.predecessors = graph.predecessors()
+        self.artifacts = {}  # groupId:artifactId -> номера узлов всех версий
+        for node_id, label in enumerate(self.labels):
+            self.artifacts.setdefault(artifact_key(label), []).append(node_id)
+        self.roots = [node_id for node_id, parents in enumerate(self.predecessors) if not parents]
+
+    @classmethod
+    def from_dependencies(cls, dependencies, root=None):
+        return cls(DependencyGraph.from_dependencies(dependencies, root))
+
+    def find(self, artifact):
+        """Номера узлов по groupId:artifactId, полной координате или её началу."""
+        if artifact in self.graph.ids:
+            return [self.graph.ids[artifact]]
+        key = artifact_key(artifact)
+        found = [node_id for node_id in self.artifacts.get(key, [])
+                 if self.labels[node_id] == artifact or self.labels[node_id].startswith(artifact + ":")]
+        if not found:
+            raise Exception(f"Артефакт {artifact} не найден в графе.")
+        return found
+
+    def shortest_path(self, target, source=None):
+        """Кратчайший путь от source (по умолчанию от корней) до любой версии target."""
+        targets = set(self.find(target))
+        starts = self.find(source) if source else self.roots
+        previous = dict.fromkeys(starts)
+        queue = deque(starts)
+        while queue:
+            node_id = queue.popleft()
+            if node_id in targets:
+                path = []
+                while node_id is not None:
+                    path.append(self.labels[node_id])
+                    node_id = previous[node_id]
+                return path[::-1]
+            for next_id in self.successors[node_id]:
+                if next_id not in previous:
+                    previous[next_id] = node_id
+                    queue.append(next_id)
+        return None
+
+    def all_paths(self, target, source=None, limit=100):
+        """Все простые пути до target (не больше limit).
+
+        Поиск идёт от target назад по обратным рёбрам, поэтому обходятся только
+        предки target, а не весь граф.
+        """
+        starts = set(self.find(source)) if source else set(self.roots)
+        paths = []
+        for target_id in self.find(target):
+            stack = [(target_id, iter(self.predecessors[target_id]))]
+            on_path = {target_id}
+            while stack and len(paths) < limit:
+                node_id, parents = stack[-1]
+                if node_id in starts:
+                    paths.append([self.labels[n] for n, _ in reversed(stack)])
+                    on_path.discard(node_id)
+                    stack.pop()
+                    continue
+                parent = next(parents, None)
+                if parent is None:
+                    on_path.discard(node_id)
+                    stack.pop()
+                elif parent not in on_path:
+                    on_path.add(parent)
+                    stack.append((parent, iter(self.predecessors[parent])))
+        return paths
+
+    def reverse_dependencies(self, artifact):
+        """Все артефакты, которые прямо или транзитивно зависят от artifact: (координата, расстояние)."""
+        start = self.find(artifact)
+        distance = dict.fromkeys(start, 0)
+        queue = deque(start)
+        while queue:
+            node_id = queue.popleft()
+            for parent in self.predecessors[node_id]:
+                if parent not in distance:
+                    distance[parent] = distance[node_id] + 1
+                    queue.append(parent)
+        return [(self.labels[node_id], depth) for node_id, depth in distance.items() if depth]
+
+    def versions(self, artifact):
+        """Версии артефакта в графе: {версия: [координаты]}."""
+        versions = {}
+        for node_id in self.find(artifact):
+            versions.setdefault(coord_version(self.labels[node_id]), []).append(self.labels[node_id])
+        return versions
+
+    def conflicts(self):
+        """Артефакты, которые попадают в граф в нескольких версиях: {groupId:artifactId: {версия: [родители]}}."""
+        report = {}
+        for key, node_ids in self.artifacts.items():
+            versions = {coord_version(self.labels[node_id]) for node_id in node_ids}
+            if len(versions) < 2:
+                continue
+            report[key] = {}
+            for node_id in node_ids:
+                parents = report[key].setdefault(coord_version(self.labels[node_id]), [])
+                parents.extend(self.labels[parent] for parent in self.predecessors[node_id])
+        return report
+
+
+def load_index(args):
+    if args.tree_file:
+        # Готовый вывод mvn dependency:tree разбирается потоково
+        with open(args.tree_file, encoding="utf-8") as f:
+            dependencies = parse_dependency_tree(f)
+    else:
+        cache = None if args.no_cache else GraphCache(args.cache_dir)
+        dependencies = load_dependencies(args.project_path, args.resolver, args.local_repo, cache)
+    return GraphIndex.from_dependencies(dependencies, "pom.xml")
+
+
+def print_path(path):
+    print(" -> ".join(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запросы к графу зависимостей Maven.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--project-path", help="Путь к Maven-проекту.")
+    source.add_argument("--tree-file", help="Файл с выводом mvn dependency:tree.")
+    parser.add_argument("--resolver", choices=["native", "maven"], default="native", help="Способ построения графа.")
+    parser.add_argument("--local-repo", default=None, help="Путь к локальному репозиторию Maven.")
+    parser.add_argument("--cache-dir", default=".depgraph_cache", help="Каталог кэша графов зависимостей.")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш графов.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    path = commands.add_parser("path", help="Кратчайший путь до артефакта.")
+    path.add_argument("artifact")
+    path.add_argument("--from", dest="source", help="Начальный артефакт (по умолчанию корень).")
+    paths = commands.add_parser("paths", help="Все пути до артефакта.")
+    paths.add_argument("artifact")
+    paths.add_argument("--from", dest="source", help="Начальный артефакт (по умолчанию корень).")
+    paths.add_argument("--limit", type=int, default=100, help="Максимальное число путей.")
+    rdeps = commands.add_parser("rdeps", help="Кто зависит от артефакта (что затронет его обновление).")
+    rdeps.add_argument("artifact")
+    versions = commands.add_parser("versions", help="Версии артефакта и пути, которыми они попадают в проект.")
+    versions.add_argument("artifact")
+    commands.add_parser("conflicts", help="Артефакты, попадающие в граф в нескольких версиях.")
+    args = parser.parse_args(argv)
+
+    try:
+        index = load_index(args)
+        if args.command == "path":
+            result = index.shortest_path(args.artifact, args.source)
+            if result:
+                print_path(result)
+            else:
+                print("Путь не найден.")
+        elif args.command == "paths":
+            result = index.all_paths(args.artifact, args.source, args.limit)
+            for found in result:
+                print_path(found)
+            print(f"Путей: {len(result)}")
+        elif args.command == "rdeps":
+            for coord, depth in index.reverse_dependencies(args.artifact):
+                print(f"{'  ' * (depth - 1)}{coord}")
+        elif args.command == "versions":
+            for version, coords in index.versions(args.artifact).items():
+                print(f"{version}:")
+                for coord in coords:
+                    print_path(index.shortest_path(coord) or [coord])
+        else:
+            for key, versions in index.conflicts().items():
+                print(f"{key}:")
+                for version, parents in versions.items():
+                    print(f"  {version} <- {', '.join(parents) or 'корень'}")
+    except Exception as e:
+        print(f"Ошибка: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from graph_cache import GraphCache
+from pom_resolver import PomResolver, read_pom
+
+
+def find_reactor_modules(root_path):
+    """Возвращает каталоги всех модулей реактора: корень и модули из <modules>, рекурсивно."""
+    modules = []
+    seen = set()
+    stack = [os.path.abspath(root_path)]
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        pom_path = os.path.join(path, "pom.xml")
+        if not os.path.isfile(pom_path):
+            raise Exception(f"Файл pom.xml не найден в модуле {path}.")
+        modules.append(path)
+        # Обратный порядок на стеке сохраняет порядок объявления модулей
+        for module in reversed(read_pom(pom_path)["modules"]):
+            stack.append(os.path.normpath(os.path.join(path, module)))
+    return modules
+
+
+def module_index(paths, local_repo=None):
+    """(groupId, artifactId, version) -> pom.xml для модулей; модули с ошибкой в POM пропускаются."""
+    resolver = PomResolver(local_repo)
+    index = {}
+    for path in paths:
+        pom_path = os.path.join(path, "pom.xml")
+        try:
+            model = resolver.effective_model(pom_path)
+        except Exception:
+            continue  # Ошибку сообщит анализ самого модуля
+        index[(model["groupId"], model["artifactId"], model["version"])] = pom_path
+    return index
+
+
+def analyze_module(project_path, resolver="native", local_repo=None, cache_dir=None, cache_max_bytes=None,
+                   modules=None):
+    """Анализирует один модуль в рабочем процессе или потоке, ошибки возвращает как данные."""
+    # Импорт здесь: main импортирует этот модуль, а рабочим процессам нужен load_dependencies
+    from main import load_dependencies
+
+    start = time.perf_counter()
+    cache = GraphCache(cache_dir, cache_max_bytes) if cache_dir else None
+    result = {"path": project_path, "dependencies": [], "error": None, "cache": None}
+    try:
+        result["dependencies"] = load_dependencies(project_path, resolver, local_repo, cache, modules)
+    except Exception as e:
+        result["error"] = str(e)
+    if cache is not None:
+        result["cache"] = cache.stats()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def merge_dependencies(results):
+    """Объединяет рёбра модулей в один граф без повторов, сохраняя порядок модулей."""
+    merged = []
+    seen = set()
+    for result in results:
+        for dependency in result["dependencies"]:
+            key = (dependency.parent, dependency.child, dependency.omitted)
+            if key not in seen:
+                seen.add(key)
+                merged.append(dependency)
+    return merged
+
+
+def analyze_modules(paths, workers=None, executor="process", resolver="native", local_repo=None,
+                    cache_dir=None, cache_max_bytes=None, report=print):
+    """Параллельно анализирует модули и возвращает (объединённые рёбра, результаты по модулям).
+
+    Зависимость одного модуля от другого разрешается по pom.xml из рабочего дерева,
+    поэтому в объединённом графе это один узел, а не устанавливать модули в локальный
+    репозиторий не нужно.
+    """
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    modules = module_index(paths, local_repo) if resolver == "native" else None
+    results = {}
+    with pool_class(max_workers=workers) as pool:
+        futures = {
+            pool.submit(analyze_module, path, resolver, local_repo, cache_dir, cache_max_bytes, modules): path
+            for path in paths
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[futures[future]] = result
+            if result["error"]:
+                report(f"[{done}/{len(paths)}] {result['path']}: ошибка: {result['error']}")
+            else:
+                report(f"[{done}/{len(paths)}] {result['path']}: {len(result['dependencies'])} рёбер "
+                       f"за {result['seconds']:.3f} с")
+    ordered = [results[path] for path in paths]
+    return merge_dependencies(ordered), ordered
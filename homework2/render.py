@@ -0,0 +1,95 @@
+import hashlib
+import os
+import subprocess
+
+# Сколько DOT-файлов передаётся одному процессу dot: ограничение длины командной строки
+BATCH_SIZE = 500
+
+
+def output_format(path):
+    """Формат Graphviz по расширению файла (png, svg, pdf...), по умолчанию png."""
+    return os.path.splitext(path)[1][1:].lower() or "png"
+
+
+def dot_digest(dot_file):
+    """SHA-256 текста DOT или None, если файла нет."""
+    try:
+        with open(dot_file, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _stamp_path(output):
+    # Рядом с изображением хранится хэш DOT, из которого оно нарисовано
+    return output + ".sha256"
+
+
+def is_fresh(output, digest):
+    """Изображение уже нарисовано из DOT с тем же содержимым."""
+    if digest is None or not os.path.exists(output):
+        return False
+    try:
+        with open(_stamp_path(output)) as f:
+            return f.read().strip() == digest
+    except FileNotFoundError:
+        return False
+
+
+def _mark(output, digest):
+    if digest is not None and os.path.exists(output):
+        with open(_stamp_path(output), "w") as f:
+            f.write(digest)
+
+
+def _run_dot(args):
+    try:
+        result = subprocess.run(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    except FileNotFoundError:
+        raise Exception("Graphviz не найден. Убедитесь, что утилита dot доступна в PATH.")
+    if result.returncode != 0:
+        raise Exception(f"Ошибка Graphviz: {result.stderr}")
+
+
+def render(dot_file, outputs, dot_path="dot", force=False):
+    """Рисует граф во все файлы outputs одним запуском dot и возвращает перерисованные файлы.
+
+    Раскладка графа выполняется один раз, форматы берутся из расширений файлов.
+    Файлы, уже нарисованные из DOT с тем же хэшем, пропускаются.
+    """
+    digest = dot_digest(dot_file)
+    pending = [output for output in outputs if force or not is_fresh(output, digest)]
+    if not pending:
+        return []
+    args = [dot_path]
+    for i, output in enumerate(pending):
+        # Каждый -o относится к предшествующему -T
+        args += [f"-T{output_format(output)}"] + ([dot_file] if i == 0 else []) + ["-o", output]
+    _run_dot(args)
+    for output in pending:
+        _mark(output, digest)
+    return pending
+
+
+def render_batch(dot_files, formats=("png",), dot_path="dot", force=False):
+    """Рисует много графов одним процессом dot (-O): изображения пишутся рядом как <файл>.dot.<формат>.
+
+    Возвращает DOT-файлы, которые пришлось перерисовать.
+    """
+    pending = []
+    for dot_file in dot_files:
+        digest = dot_digest(dot_file)
+        if force or not all(is_fresh(f"{dot_file}.{fmt}", digest) for fmt in formats):
+            pending.append((dot_file, digest))
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start:start + BATCH_SIZE]
+        _run_dot([dot_path] + [f"-T{fmt}" for fmt in formats] + ["-O"] + [dot_file for dot_file, _ in batch])
+        for dot_file, digest in batch:
+            for fmt in formats:
+                _mark(f"{dot_file}.{fmt}", digest)
+    return [dot_file for dot_file, _ in pending]
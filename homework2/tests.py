@@ -1,7 +1,11 @@
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
+import json
 import os
+import shutil
 import subprocess
+import sys
+import tempfile
 from main import (
     run_maven_dependency_tree,
     parse_dependency_tree,
@@ -9,6 +13,20 @@ from main import (
     generate_graph,
     get_project_name,
 )
+from main import build_graph, generate_module_graphs, load_dependencies
+import graph_cache
+import instrument
+from graph import DependencyGraph
+from graph_cache import GraphCache
+from pom_resolver import Dependency, PomResolver, resolve_dependencies
+from reactor import analyze_modules, find_reactor_modules, module_index
+from query import GraphIndex
+from render import render, render_batch
+from bench import make_tree, run_benchmark
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_PROJECT = os.path.join(BASE_DIR, "test_project")
+TEST_REPO = os.path.join(BASE_DIR, "test_repo")
 
 class TestMavenVisualizer(unittest.TestCase):
 
@@ -35,25 +53,87 @@ class TestMavenVisualizer(unittest.TestCase):
     def test_parse_dependency_tree(self):
         output = """
         [INFO] +- group:artifact:jar:1.0
-        [INFO] \- group:artifact:jar:2.0
+        [INFO] \\- group:artifact:jar:2.0
         """
         dependencies = parse_dependency_tree(output)
         self.assertEqual(len(dependencies), 2)
-        self.assertEqual(dependencies[0], ("", "artifact"))
-        self.assertEqual(dependencies[1], ("", "artifact"))
+        self.assertEqual(dependencies[0], Dependency(None, "group:artifact:jar:1.0", 1, None))
+        self.assertEqual(dependencies[1], Dependency(None, "group:artifact:jar:2.0", 1, None))
+
+    def test_parse_dependency_tree_nesting(self):
+        # Родитель восстанавливается по отступу, исключённые зависимости помечаются
+        output = "\n".join([
+            "[INFO] --- maven-dependency-plugin:3.6.0:tree (default-cli) @ demo-project ---",
+            "[INFO] com.example:demo-project:jar:1.0",
+            "[INFO] +- org.apache.commons:commons-lang3:jar:3.12.0:compile",
+            "[INFO] \\- com.google.guava:guava:jar:31.1-jre:compile",
+            "[INFO]    +- com.google.guava:failureaccess:jar:1.0.1:compile",
+            "[INFO]    |  \\- (org.checkerframework:checker-qual:jar:3.5.0:compile - omitted for conflict with 3.12.0)",
+            "[INFO]    \\- org.checkerframework:checker-qual:jar:3.12.0:compile (version managed from 3.10.0)",
+            "[INFO] ------------------------------------------------------------------------",
+            "[INFO] BUILD SUCCESS",
+        ])
+        root = "com.example:demo-project:jar:1.0"
+        guava = "com.google.guava:guava:jar:31.1-jre"
+        failureaccess = "com.google.guava:failureaccess:jar:1.0.1"
+        # Область видимости отделяется от координаты и хранится в ребре
+        self.assertEqual(parse_dependency_tree(output), [
+            Dependency(root, "org.apache.commons:commons-lang3:jar:3.12.0", 1, None, "compile"),
+            Dependency(root, guava, 1, None, "compile"),
+            Dependency(guava, failureaccess, 2, None, "compile"),
+            Dependency(failureaccess, "org.checkerframework:checker-qual:jar:3.5.0", 3,
+                       "omitted for conflict with 3.12.0", "compile"),
+            Dependency(guava, "org.checkerframework:checker-qual:jar:3.12.0", 2, None, "compile"),
+        ])
+
+    def test_parse_dependency_tree_streaming(self):
+        # Разбор принимает итератор строк и работает за один проход по большому выводу
+        def lines():
+            yield "[INFO] com.example:big:jar:1.0"
+            for i in range(20000):
+                yield f"[INFO] +- g{i}:a:jar:1.0:compile"
+                yield f"[INFO] |  \\- g{i}:b:jar:1.0:runtime"
+        dependencies = parse_dependency_tree(lines())
+        self.assertEqual(len(dependencies), 40000)
+        self.assertEqual(dependencies[-1], Dependency("g19999:a:jar:1.0", "g19999:b:jar:1.0", 2, None, "runtime"))
 
     @patch("builtins.open", new_callable=mock_open)
     def test_generate_dot_file(self, mock_file):
-        dependencies = [("artifact1", "1.0"), ("artifact2", "2.0")]
+        dependencies = [
+            Dependency(None, "artifact1", 1, None),
+            Dependency("artifact1", "artifact2", 2, None),
+            Dependency("artifact1", "artifact3", 2, "omitted for duplicate"),
+        ]
         generate_dot_file(dependencies, "test.dot", "project")
 
         mock_file.assert_called_once_with("test.dot", "w")
         handle = mock_file()
         handle.write.assert_any_call("digraph dependencies {\n")
-        handle.write.assert_any_call("    \"project\" -> \"1.0\";\n")
-        handle.write.assert_any_call("    \"project\" -> \"2.0\";\n")
+        # Узлы объявляются один раз, рёбра ссылаются на их номера
+        handle.write.assert_any_call("    n0 [label=\"project\"];\n")
+        handle.write.assert_any_call("    n1 [label=\"artifact1\"];\n")
+        handle.write.assert_any_call("    n0 -> n1;\n")
+        handle.write.assert_any_call("    n1 -> n2;\n")
+        handle.write.assert_any_call("    n1 -> n3 [style=dashed, label=\"omitted for duplicate\"];\n")
         handle.write.assert_any_call("}\n")
 
+    def test_profile_report(self):
+        # При включённом сборе этапы попадают в JSON-отчёт вместе со счётчиками
+        dependencies = [Dependency(None, "artifact1", 1, None), Dependency("artifact1", "artifact2", 2, None)]
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = os.path.join(tmp, "profile.json")
+            instrument.enable("depgraph", report_path)
+            try:
+                generate_dot_file(dependencies, os.path.join(tmp, "test.dot"), "project")
+            finally:
+                instrument.finish()
+            with open(report_path) as f:
+                report = json.load(f)
+        self.assertEqual(report["tool"], "depgraph")
+        self.assertEqual(report["spans"]["write_dot"]["count"], 1)
+        self.assertEqual(report["counters"], {"graph.edges": 2, "graph.nodes": 3})
+        self.assertFalse(instrument.enabled())
+
     @patch("subprocess.run")
     def test_generate_graph_success(self, mock_subprocess_run):
         mock_subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
@@ -85,5 +165,450 @@ class TestMavenVisualizer(unittest.TestCase):
             get_project_name("/path/to/project")
         self.assertIn("Файл pom.xml не найден", str(context.exception))
 
+class TestPomResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_pom(self, path, body):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f'<project xmlns="http://maven.apache.org/POM/4.0.0"><modelVersion>4.0.0</modelVersion>{body}</project>')
+
+    def test_resolve_test_project(self):
+        # Транзитивные зависимости guava берутся из локального репозитория,
+        # версии — из dependencyManagement родительского POM
+        root, edges = PomResolver(TEST_REPO).resolve(TEST_PROJECT)
+        self.assertEqual(root, "com.example:demo-project:jar:1.0")
+        self.assertEqual(edges[:2], [
+            Dependency(root, "org.apache.commons:commons-lang3:jar:3.12.0", 1, None, "compile"),
+            Dependency(root, "com.google.guava:guava:jar:31.1-jre", 1, None, "compile"),
+        ])
+        guava = "com.google.guava:guava:jar:31.1-jre"
+        self.assertIn(Dependency(guava, "org.checkerframework:checker-qual:jar:3.12.0", 2, None, "compile"), edges)
+        # Ближайшая версия побеждает: checker-qual 3.5.0 из failureaccess помечается как исключённая
+        self.assertIn(Dependency("com.google.guava:failureaccess:jar:1.0.1",
+                                 "org.checkerframework:checker-qual:jar:3.5.0", 3,
+                                 "omitted for conflict with 3.12.0", "compile"), edges)
+        # Зависимости с областью test транзитивно не переходят
+        self.assertFalse(any("junit" in edge.child for edge in edges))
+        self.assertEqual(len(edges), 9)
+
+    def test_exclusions_and_managed_versions(self):
+        self.write_pom(os.path.join(self.tmp, "pom.xml"), """
+            <groupId>com.example</groupId><artifactId>app</artifactId><version>2.0</version>
+            <properties><guava.version>31.1-jre</guava.version></properties>
+            <dependencyManagement><dependencies>
+                <dependency><groupId>org.checkerframework</groupId><artifactId>checker-qual</artifactId><version>3.5.0</version></dependency>
+            </dependencies></dependencyManagement>
+            <dependencies>
+                <dependency><groupId>com.google.guava</groupId><artifactId>guava</artifactId><version>${guava.version}</version>
+                    <exclusions><exclusion><groupId>com.google.j2objc</groupId><artifactId>*</artifactId></exclusion></exclusions>
+                </dependency>
+                <dependency><groupId>junit</groupId><artifactId>junit</artifactId><version>4.13.2</version><scope>test</scope></dependency>
+            </dependencies>""")
+        edges = resolve_dependencies(self.tmp, TEST_REPO)
+        children = {edge.child: edge.scope for edge in edges if not edge.omitted}
+        self.assertEqual(children["com.google.guava:guava:jar:31.1-jre"], "compile")
+        # dependencyManagement корня переопределяет транзитивную версию
+        self.assertIn("org.checkerframework:checker-qual:jar:3.5.0", children)
+        self.assertFalse(any("j2objc" in child for child in children))
+        # Прямые test-зависимости остаются в графе
+        self.assertEqual(children["junit:junit:jar:4.13.2"], "test")
+
+    def test_parent_by_relative_path(self):
+        # Модуль наследует groupId, версию и свойства от родителя из соседнего каталога
+        self.write_pom(os.path.join(self.tmp, "pom.xml"), """
+            <groupId>com.example</groupId><artifactId>parent</artifactId><version>3.1</version><packaging>pom</packaging>
+            <properties><lang.version>3.12.0</lang.version></properties>
+            <modules><module>child</module></modules>""")
+        self.write_pom(os.path.join(self.tmp, "child", "pom.xml"), """
+            <parent><groupId>com.example</groupId><artifactId>parent</artifactId><version>3.1</version></parent>
+            <artifactId>child</artifactId>
+            <dependencies>
+                <dependency><groupId>org.apache.commons</groupId><artifactId>commons-lang3</artifactId><version>${lang.version}</version></dependency>
+            </dependencies>""")
+        root, edges = PomResolver(TEST_REPO).resolve(os.path.join(self.tmp, "child"))
+        self.assertEqual(root, "com.example:child:jar:3.1")
+        self.assertEqual(edges, [Dependency(root, "org.apache.commons:commons-lang3:jar:3.12.0", 1, None, "compile")])
+
+    def test_missing_pom(self):
+        with self.assertRaises(Exception) as context:
+            resolve_dependencies(self.tmp, TEST_REPO)
+        self.assertIn("Файл pom.xml не найден", str(context.exception))
+
+
+class TestGraphCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.repo = os.path.join(self.tmp, "repo")
+        shutil.copytree(TEST_REPO, self.repo)
+        self.cache = GraphCache(os.path.join(self.tmp, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_second_run_skips_resolution(self):
+        first = load_dependencies(TEST_PROJECT, "native", self.repo, self.cache)
+        with patch.object(PomResolver, "resolve", side_effect=AssertionError("resolved again")):
+            second = load_dependencies(TEST_PROJECT, "native", self.repo, self.cache)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "evictions": 0})
+
+    def test_changed_dependency_pom_invalidates_graph(self):
+        load_dependencies(TEST_PROJECT, "native", self.repo, self.cache)
+        # В POM guava добавляется новая зависимость: граф пересобирается,
+        # а остальные POM берутся из кэша разобранных файлов
+        guava_pom = os.path.join(self.repo, "com", "google", "guava", "guava", "31.1-jre", "guava-31.1-jre.pom")
+        with open(guava_pom) as f:
+            text = f.read()
+        with open(guava_pom, "w") as f:
+            f.write(text.replace("<dependencies>", "<dependencies><dependency><groupId>org.apache.commons</groupId>"
+                                 "<artifactId>commons-lang3</artifactId><version>3.12.0</version></dependency>"
+                                 "<dependency><groupId>com.example</groupId><artifactId>extra</artifactId>"
+                                 "<version>1.0</version></dependency>", 1))
+        with patch("graph_cache.read_pom", wraps=graph_cache.read_pom) as parsed:
+            dependencies = load_dependencies(TEST_PROJECT, "native", self.repo, self.cache)
+        self.assertEqual(parsed.call_count, 1)
+        self.assertIn(Dependency("com.google.guava:guava:jar:31.1-jre", "com.example:extra:jar:1.0", 2, None, "compile"),
+                      dependencies)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_maven_graph_depends_on_artifact_poms(self):
+        # Граф из mvn dependency:tree устаревает при изменении POM артефакта в локальном репозитории
+        tree = ("[INFO] com.example:demo:jar:1.0\n"
+                "[INFO] \\- com.google.guava:guava:jar:31.1-jre:compile\n"
+                "[INFO]    \\- com.google.guava:failureaccess:jar:1.0.1:compile\n")
+        with patch("main.run_maven_dependency_tree", return_value=tree) as maven:
+            first = load_dependencies(TEST_PROJECT, "maven", self.repo, self.cache)
+            load_dependencies(TEST_PROJECT, "maven", self.repo, self.cache)
+            self.assertEqual(maven.call_count, 1)
+            pom = os.path.join(self.repo, "com", "google", "guava", "failureaccess", "1.0.1", "failureaccess-1.0.1.pom")
+            with open(pom, "a") as f:
+                f.write("<!-- changed -->\n")
+            second = load_dependencies(TEST_PROJECT, "maven", self.repo, self.cache)
+        self.assertEqual(maven.call_count, 2)
+        self.assertEqual(first, second)
+
+    def test_eviction_scans_only_over_limit(self):
+        load_dependencies(TEST_PROJECT, "native", self.repo, self.cache)
+        with patch("graph_cache.os.listdir", wraps=os.listdir) as listed:
+            self.cache.put_graph("k", [], [])
+        self.assertEqual(listed.call_count, 0)
+
+    def test_eviction_bounds_cache_size(self):
+        cache = GraphCache(os.path.join(self.tmp, "small"), max_bytes=1024)
+        load_dependencies(TEST_PROJECT, "native", self.repo, cache)
+        self.assertGreater(cache.stats()["evictions"], 0)
+        total = sum(os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(cache.cache_dir) for name in names)
+        self.assertLessEqual(total, 1024)
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.dependencies = PomResolver(TEST_REPO).resolve(TEST_PROJECT)[1]
+
+    def test_nodes_and_edges_are_deduplicated(self):
+        edge = Dependency("g:a:jar:1.0", "g:b:jar:1.0", 1, None, "test")
+        omitted = Dependency("g:a:jar:1.0", "g:b:jar:1.0", 1, "omitted for duplicate", "compile")
+        graph = DependencyGraph.from_dependencies([omitted, edge, edge, Dependency(None, "g:a:jar:1.0", 0, None)],
+                                                  "project")
+        self.assertEqual(graph.labels, ["g:a:jar:1.0", "g:b:jar:1.0", "project"])
+        # Настоящее ребро вытесняет исключённое с той же парой узлов вместе с его областью
+        self.assertEqual(graph.edges, {(0, 1): None, (2, 0): None})
+        self.assertEqual(graph.scopes, {(0, 1): "test"})
+        self.assertIn('    n0 -> n1 [label="test"];\n', list(graph.iter_dot()))
+
+    def test_filters(self):
+        guava = "com.google.guava:guava:jar:31.1-jre"
+        checker = "org.checkerframework:checker-qual:jar:3.5.0"
+        graph = build_graph(self.dependencies, "project", reachable_from="com.google.guava:guava")
+        self.assertEqual(graph.labels[0], guava)
+        self.assertNotIn("org.apache.commons:commons-lang3:jar:3.12.0", graph.ids)
+
+        graph = build_graph(self.dependencies, "project", reachable_to=checker)
+        self.assertEqual(set(graph.labels), {"com.example:demo-project:jar:1.0", guava,
+                                             "com.google.guava:failureaccess:jar:1.0.1", checker})
+
+        graph = build_graph(self.dependencies, "project", max_depth=1)
+        self.assertEqual(len(graph.edges), 2)
+        self.assertEqual(graph.roots(), [graph.ids["com.example:demo-project:jar:1.0"]])
+
+        graph = build_graph(self.dependencies, "project", collapse_groups=True)
+        self.assertIn("org.checkerframework", graph.ids)
+        self.assertEqual(len(graph.labels), len(set(graph.labels)))
+        self.assertTrue(all(source != target for source, target in graph.edges))
+
+        with self.assertRaises(Exception) as context:
+            build_graph(self.dependencies, "project", reachable_from="org.unknown:x")
+        self.assertIn("не найден", str(context.exception))
+
+    def test_limit_depth_on_cyclic_graph(self):
+        # Все узлы на цикле a -> b -> c -> a: корней нет, отсчёт от первого узла или от start
+        graph = DependencyGraph.from_dependencies([
+            Dependency(None, "g:a:jar:1.0", 0, None),
+            Dependency("g:a:jar:1.0", "g:b:jar:1.0", 1, None),
+            Dependency("g:b:jar:1.0", "g:c:jar:1.0", 2, None),
+            Dependency("g:c:jar:1.0", "g:a:jar:1.0", 3, None),
+        ])
+        self.assertEqual(graph.roots(), [])
+        self.assertEqual(graph.limit_depth(1).labels, ["g:a:jar:1.0", "g:b:jar:1.0"])
+        self.assertEqual(set(graph.limit_depth(1, ["g:c"]).labels), {"g:c:jar:1.0", "g:a:jar:1.0"})
+        self.assertEqual(len(graph.limit_depth(5).labels), 3)
+
+    def test_large_graph_dot_size(self):
+        # 20 тысяч рёбер с повторами: каждый узел и ребро выводятся один раз
+        dependencies = [Dependency(f"g{i % 100}:a:jar:1.0", f"g{i % 1000}:b:jar:1.0", 1, None)
+                        for i in range(20000)]
+        graph = DependencyGraph.from_dependencies(dependencies)
+        self.assertEqual(len(graph.edges), 1000)
+        lines = list(graph.iter_dot())
+        self.assertEqual(len(lines), 3 + len(graph.labels) + 1000 + 1)
+
+
+# Заглушка Graphviz: записывает аргументы каждого запуска в журнал и создаёт выходные файлы
+STUB_DOT = """import sys
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+formats, outputs, inputs = [], [], []
+i = 0
+while i < len(args):
+    if args[i].startswith("-T"):
+        formats.append(args[i][2:])
+    elif args[i] == "-o":
+        i += 1
+        outputs.append((formats[-1], args[i]))
+    elif args[i] != "-O":
+        inputs.append(args[i])
+    i += 1
+if "-O" in args:
+    outputs = [(fmt, f"{{path}}.{{fmt}}") for path in inputs for fmt in formats]
+for fmt, path in outputs:
+    with open(path, "w") as f:
+        f.write(fmt)
+"""
+
+
+class TestRender(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmp, "dot.log")
+        self.dot = os.path.join(self.tmp, "dot")
+        with open(self.dot, "w") as f:
+            f.write(f"#!{sys.executable}\n" + STUB_DOT.format(log=self.log))
+        os.chmod(self.dot, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def calls(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return f.read().splitlines()
+
+    def write_dot(self, name, text="digraph dependencies {}\n"):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_several_formats_in_one_pass(self):
+        dot_file = self.write_dot("graph.dot")
+        outputs = [os.path.join(self.tmp, name) for name in ("graph.png", "graph.svg", "graph.pdf")]
+        self.assertEqual(render(dot_file, outputs, self.dot), outputs)
+        self.assertEqual(len(self.calls()), 1)
+        for output in outputs:
+            with open(output) as f:
+                self.assertEqual(f.read(), os.path.splitext(output)[1][1:])
+
+    def test_unchanged_graph_is_not_rendered_again(self):
+        dot_file = self.write_dot("graph.dot")
+        output = os.path.join(self.tmp, "graph.png")
+        render(dot_file, [output], self.dot)
+        self.assertEqual(render(dot_file, [output], self.dot), [])
+        self.assertEqual(len(self.calls()), 1)
+        # Изменённый граф и принудительная отрисовка запускают dot снова
+        self.write_dot("graph.dot", "digraph dependencies { n0; }\n")
+        self.assertEqual(render(dot_file, [output], self.dot), [output])
+        self.assertEqual(render(dot_file, [output], self.dot, force=True), [output])
+        self.assertEqual(len(self.calls()), 3)
+
+    def test_batch_uses_one_process(self):
+        dot_files = [self.write_dot(f"module{i}.dot", f"digraph m{i} {{}}\n") for i in range(20)]
+        self.assertEqual(render_batch(dot_files, ("png", "svg"), self.dot), dot_files)
+        self.assertEqual(len(self.calls()), 1)
+        self.assertTrue(all(os.path.exists(f"{dot_file}.svg") for dot_file in dot_files))
+        # Перерисовывается только изменённый граф
+        self.write_dot("module3.dot", "digraph changed {}\n")
+        self.assertEqual(render_batch(dot_files, ("png", "svg"), self.dot), [dot_files[3]])
+        self.assertEqual(self.calls()[-1].split()[-1], dot_files[3])
+
+    def test_module_graphs(self):
+        results = [{"path": TEST_PROJECT, "dependencies": load_dependencies(TEST_PROJECT, "native", TEST_REPO)}]
+        output_dir = os.path.join(self.tmp, "modules")
+        generate_module_graphs(results, output_dir, self.dot, ["png"])
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "root.dot.png")))
+
+
+class TestGraphIndex(unittest.TestCase):
+
+    ROOT = "com.example:demo-project:jar:1.0"
+    GUAVA = "com.google.guava:guava:jar:31.1-jre"
+    FAILUREACCESS = "com.google.guava:failureaccess:jar:1.0.1"
+
+    def setUp(self):
+        self.index = GraphIndex.from_dependencies(load_dependencies(TEST_PROJECT, "native", TEST_REPO))
+
+    def test_paths(self):
+        self.assertEqual(self.index.shortest_path("com.google.guava:failureaccess"),
+                         [self.ROOT, self.GUAVA, self.FAILUREACCESS])
+        paths = self.index.all_paths("org.checkerframework:checker-qual")
+        self.assertEqual(len(paths), 2)
+        self.assertIn([self.ROOT, self.GUAVA, self.FAILUREACCESS, "org.checkerframework:checker-qual:jar:3.5.0"],
+                      paths)
+        self.assertEqual(self.index.all_paths("org.checkerframework:checker-qual", source=self.FAILUREACCESS),
+                         [[self.FAILUREACCESS, "org.checkerframework:checker-qual:jar:3.5.0"]])
+
+    def test_reverse_dependencies_and_conflicts(self):
+        self.assertEqual(self.index.reverse_dependencies("com.google.guava:failureaccess"),
+                         [(self.GUAVA, 1), (self.ROOT, 2)])
+        self.assertEqual(self.index.conflicts(), {"org.checkerframework:checker-qual": {
+            "3.12.0": [self.GUAVA],
+            "3.5.0": [self.FAILUREACCESS],
+        }})
+        self.assertEqual(list(self.index.versions("org.checkerframework:checker-qual")), ["3.12.0", "3.5.0"])
+        with self.assertRaises(Exception):
+            self.index.versions("org.unknown:x")
+
+    def test_large_graph_queries(self):
+        # 50 тысяч узлов: время запросов замеряет bench.py, здесь проверяются только результаты
+        index = GraphIndex.from_dependencies(make_tree(50000))
+        path = index.shortest_path("g:a49999")
+        rdeps = index.reverse_dependencies("g:a49999")
+        paths = index.all_paths("g:a49999")
+        self.assertEqual(path[0], "g:root:jar:1.0")
+        self.assertEqual(len(rdeps), len(path) - 1)
+        self.assertEqual(paths, [path])
+        self.assertEqual(set(run_benchmark(100, repeat=1)),
+                         {"index", "shortest_path", "reverse_dependencies", "all_paths", "conflicts"})
+
+    def test_versions_of_classifier_coordinates(self):
+        # У координаты с классификатором версия — последнее поле, а не классификатор
+        index = GraphIndex.from_dependencies(parse_dependency_tree(
+            "[INFO] g:root:jar:1.0\n"
+            "[INFO] +- g:lib:jar:linux-x86_64:2.0:compile\n"
+            "[INFO] \\- g:other:jar:1.0:compile\n"
+            "[INFO]    \\- (g:lib:jar:linux-x86_64:2.1:runtime - omitted for conflict with 2.0)\n"))
+        self.assertIn("g:lib:jar:linux-x86_64:2.1", index.graph.ids)
+        self.assertEqual(list(index.versions("g:lib")), ["2.0", "2.1"])
+        self.assertEqual(set(index.conflicts()["g:lib"]), {"2.0", "2.1"})
+
+
+class TestReactor(unittest.TestCase):
+
+    write_pom = TestPomResolver.write_pom
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        # Реактор: агрегатор с модулем core и вложенным агрегатором services с модулем api
+        self.write_pom(os.path.join(self.tmp, "pom.xml"), """
+            <groupId>com.example</groupId><artifactId>reactor</artifactId><version>1.0</version><packaging>pom</packaging>
+            <modules><module>core</module><module>services</module></modules>""")
+        self.write_pom(os.path.join(self.tmp, "core", "pom.xml"), """
+            <parent><groupId>com.example</groupId><artifactId>reactor</artifactId><version>1.0</version></parent>
+            <artifactId>core</artifactId>
+            <dependencies>
+                <dependency><groupId>com.google.guava</groupId><artifactId>guava</artifactId><version>31.1-jre</version></dependency>
+            </dependencies>""")
+        self.write_pom(os.path.join(self.tmp, "services", "pom.xml"), """
+            <parent><groupId>com.example</groupId><artifactId>reactor</artifactId><version>1.0</version></parent>
+            <artifactId>services</artifactId><packaging>pom</packaging>
+            <modules><module>api</module></modules>""")
+        self.write_pom(os.path.join(self.tmp, "services", "api", "pom.xml"), """
+            <parent><groupId>com.example</groupId><artifactId>services</artifactId><version>1.0</version></parent>
+            <artifactId>api</artifactId>
+            <dependencies>
+                <dependency><groupId>com.example</groupId><artifactId>core</artifactId><version>1.0</version></dependency>
+                <dependency><groupId>org.apache.commons</groupId><artifactId>commons-lang3</artifactId><version>3.12.0</version></dependency>
+            </dependencies>""")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_find_reactor_modules(self):
+        self.assertEqual(find_reactor_modules(self.tmp), [
+            self.tmp,
+            os.path.join(self.tmp, "core"),
+            os.path.join(self.tmp, "services"),
+            os.path.join(self.tmp, "services", "api"),
+        ])
+
+    def test_analyze_modules_merges_graphs(self):
+        paths = find_reactor_modules(self.tmp)
+        for executor in ("thread", "process"):
+            progress = []
+            dependencies, results = analyze_modules(paths, 2, executor, local_repo=TEST_REPO, report=progress.append)
+            self.assertEqual([result["path"] for result in results], paths)
+            self.assertEqual(len(progress), 4)
+            self.assertTrue(progress[-1].startswith("[4/4] "))
+            # Граф каждого модуля совпадает с последовательным разрешением
+            self.assertEqual(results[1]["dependencies"], resolve_dependencies(paths[1], TEST_REPO))
+            # Модуль core — один узел: корень своего графа и зависимость api, его поддерево связано с api
+            graph = DependencyGraph.from_dependencies(dependencies)
+            core = "com.example:core:jar:1.0"
+            self.assertEqual([label for label in graph.labels if label.startswith("com.example:core:")], [core])
+            self.assertIn(Dependency("com.example:api:jar:1.0", core, 1, None, "compile"), dependencies)
+            self.assertIn(Dependency(core, "com.google.guava:guava:jar:31.1-jre", 1, None, "compile"), dependencies)
+            self.assertIn(core, graph.reachable_to("com.google.guava:guava").labels)
+            self.assertIn("com.example:api:jar:1.0", graph.reachable_to("com.google.guava:guava").labels)
+            self.assertEqual(len(dependencies), len(set(dependencies)))
+
+    def test_sibling_module_resolved_from_reactor(self):
+        # core нет в локальном репозитории: api берёт его pom.xml из реактора вместе с транзитивными зависимостями
+        api = os.path.join(self.tmp, "services", "api")
+        resolver = PomResolver(TEST_REPO, modules=module_index(find_reactor_modules(self.tmp), TEST_REPO))
+        _, edges = resolver.resolve(api)
+        self.assertIn(Dependency("com.example:core:jar:1.0", "com.google.guava:guava:jar:31.1-jre", 2, None, "compile"),
+                      edges)
+        self.assertNotIn("com.example:core:1.0", resolver.missing)
+        _, alone = PomResolver(TEST_REPO).resolve(api)
+        self.assertFalse(any(edge.parent == "com.example:core:jar:1.0" for edge in alone))
+
+    def test_merge_deduplicates_shared_edges(self):
+        # Один и тот же модуль дважды: рёбра в объединённом графе не повторяются
+        core = os.path.join(self.tmp, "core")
+        dependencies, results = analyze_modules([core, self.tmp + "/core/."], 2, "thread",
+                                                local_repo=TEST_REPO, report=lambda message: None)
+        self.assertEqual(dependencies, results[0]["dependencies"])
+
+    def test_module_error_is_reported(self):
+        progress = []
+        missing = os.path.join(self.tmp, "missing")
+        dependencies, results = analyze_modules([missing, os.path.join(self.tmp, "core")], 2, "thread",
+                                                local_repo=TEST_REPO, report=progress.append)
+        self.assertIn("Файл pom.xml не найден", results[0]["error"])
+        self.assertTrue(dependencies)
+        self.assertTrue(any("ошибка" in message for message in progress))
+
+    def test_shared_cache_between_workers(self):
+        cache_dir = os.path.join(self.tmp, "cache")
+        paths = find_reactor_modules(self.tmp)
+        first, _ = analyze_modules(paths, 2, "process", local_repo=TEST_REPO, cache_dir=cache_dir,
+                                   cache_max_bytes=50 * 1024 * 1024, report=lambda message: None)
+        second, results = analyze_modules(paths, 2, "process", local_repo=TEST_REPO, cache_dir=cache_dir,
+                                          cache_max_bytes=50 * 1024 * 1024, report=lambda message: None)
+        self.assertEqual(first, second)
+        self.assertEqual(sum(result["cache"]["hits"] for result in results), len(paths))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,89 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from translator import ConfigSyntaxError, translate_stream
+
+
+def find_configs(sources, pattern="*.txt"):
+    """Файлы конфигураций: каталоги обходятся рекурсивно по маске pattern, остальное — пути или glob-маски."""
+    paths = []
+    seen = set()
+    for source in sources:
+        if os.path.isdir(source):
+            found = glob.glob(os.path.join(source, "**", pattern), recursive=True)
+        else:
+            found = glob.glob(source, recursive=True) or [source]
+        for path in sorted(found):
+            path = os.path.abspath(path)
+            if path not in seen and not os.path.isdir(path):
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def output_paths(paths, output_dir=None):
+    """Пути .toml для входных файлов: рядом с ними или в output_dir с сохранением структуры каталогов."""
+    if output_dir is None:
+        return [os.path.splitext(path)[0] + ".toml" for path in paths]
+    base = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    return [os.path.join(output_dir, os.path.splitext(os.path.relpath(path, base))[0] + ".toml") for path in paths]
+
+
+def translate_config(input_path, output_path):
+    """Переводит один файл в рабочем процессе; ошибки возвращаются как данные, а не исключения."""
+    start = time.perf_counter()
+    result = {"input": input_path, "output": output_path, "lines": 0, "error": None}
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(input_path, encoding="utf-8") as source, open(tmp_path, "w", encoding="utf-8") as output:
+            result["lines"] = translate_stream(source, output)
+        if not result["lines"]:
+            result["error"] = {"message": "No valid TOML data to write."}
+        else:
+            os.replace(tmp_path, output_path)
+    except ConfigSyntaxError as e:
+        result["error"] = {"message": e.message, "line": e.line, "column": e.column}
+    except (OSError, UnicodeDecodeError) as e:
+        result["error"] = {"message": str(e)}
+    except Exception as e:
+        # Ошибка самого транслятора не должна останавливать пакет: она попадёт в сводку
+        result["error"] = {"message": f"{type(e).__name__}: {e}"}
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def translate_batch(paths, output_dir=None, workers=None):
+    """Переводит файлы пулом процессов и возвращает результаты в порядке paths.
+
+    Файлы раздаются пачками: для тысяч маленьких конфигураций пересылка заданий
+    по одному стоила бы дороже самого перевода.
+    """
+    outputs = output_paths(paths, output_dir)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(translate_config, paths, outputs, chunksize=chunksize))
+
+
+def summarize(results, seconds):
+    """Сводка пакетного перевода: счётчики и ошибки по файлам."""
+    errors = {result["input"]: result["error"] for result in results if result["error"]}
+    return {
+        "files": len(results),
+        "translated": len(results) - len(errors),
+        "failed": len(errors),
+        "seconds": round(seconds, 3),
+        "errors": errors,
+    }
+
+
+def write_summary(summary, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
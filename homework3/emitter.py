@@ -0,0 +1,253 @@
+import math
+import re
+from array import array
+from collections import Counter
+from itertools import chain
+
+from translator import float_text
+
+# Ключи верхнего уровня, которые translator выводит сам: словарь $[...] и числа value<номер строки>
+DICTIONARY_KEY = "dictionary"
+VALUE_KEY_PATTERN = re.compile(r"value([1-9]\d*)")
+# Имя массива или отдельное имя в начале строки, которое TOML примет как ключ без кавычек
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Символы, которые нельзя записать в строке "...": конец строки для лексера или экранирование в TOML
+BAD_STRING_CHARS = re.compile(r'["\\\x00-\x08\n-\x1f\x7f\x85\u2028\u2029]')
+# Префикс имён констант, в которые выносятся повторяющиеся значения
+CONSTANT_PREFIX = "c"
+# Значения такой длины и короче в константы не выносятся: ссылка |c0| занимает 4 символа
+MIN_CONSTANT_LENGTH = 4
+LIST_TYPES = (list, tuple, array)
+
+
+def format_float(value):
+    """Запись вещественного числа лексемой учебного языка; inf и nan записать нельзя."""
+    if not math.isfinite(value):
+        raise ValueError(f"Cannot represent {value!r} in the config language.")
+    return float_text(value)
+
+
+def format_string(value):
+    if BAD_STRING_CHARS.search(value):
+        raise ValueError(f"Cannot represent string {value!r}: quotes, backslashes and control characters are not allowed.")
+    return f'"{value}"'
+
+
+def literal(value):
+    """Текст числа или строки; None для списка."""
+    kind = type(value)
+    if kind is int:
+        return str(value)
+    if kind is float:
+        return format_float(value)
+    if kind is str:
+        return format_string(value)
+    if isinstance(value, LIST_TYPES):
+        return None
+    if isinstance(value, dict):
+        raise ValueError("Nested dictionaries are not allowed.")
+    raise ValueError(f"Unsupported value type '{kind.__name__}'.")
+
+
+def list_literals(items):
+    """Тексты элементов плоского списка или None, если в нём есть вложенные списки."""
+    if type(items) is array:
+        return list(map(str if items.typecode in "bBhHiIlLqQ" else format_float, items))
+    types = set(map(type, items))
+    if types == {int}:
+        # Однородный список целых: текст без вызова literal на каждый элемент
+        return list(map(str, items))
+    if not types.isdisjoint(LIST_TYPES):
+        return None
+    return list(map(literal, items))
+
+
+def iter_literals(value):
+    """Выдаёт списки текстов чисел и строк значения; вложенные списки обходятся без рекурсии.
+
+    Тексты плоского списка выдаются одним списком, чтобы Counter.update считал их без цикла на Python.
+    """
+    text = literal(value)
+    if text is not None:
+        yield [text]
+        return
+    stack = [value]
+    while stack:
+        items = stack.pop()
+        texts = list_literals(items)
+        if texts is not None:
+            yield texts
+            continue
+        texts = []
+        for item in items:
+            text = literal(item)
+            if text is None:
+                stack.append(item)
+            else:
+                texts.append(text)
+        yield texts
+
+
+def format_list(items, references):
+    """Элементы массива через запятую; значения из references (текст -> |имя|) заменяются ссылками."""
+    texts = list_literals(items)
+    if texts is not None:
+        if not references.keys().isdisjoint(texts):
+            texts = [references.get(text, text) for text in texts]
+        return ", ".join(texts)
+    parts = []
+    stack = [iter(items)]
+    separator = False  # Нужна ли запятая перед следующим элементом
+    while stack:
+        item = next(stack[-1], stack)  # Сам стек — метка конца списка: элемент None дойдёт до literal и даст ошибку
+        if item is stack:
+            stack.pop()
+            if stack:
+                parts.append(")")
+            separator = True
+            continue
+        if separator:
+            parts.append(", ")
+        text = literal(item)
+        if text is None:
+            parts.append("array(")
+            stack.append(iter(item))
+            separator = False
+        else:
+            parts.append(references.get(text, text))
+            separator = True
+    return "".join(parts)
+
+
+def format_key(key):
+    if NAME_PATTERN.fullmatch(key):
+        return key
+    return format_string(key)
+
+
+def format_statement(key, value, references):
+    """Строка учебного языка для ключа верхнего уровня (кроме value<номер>)."""
+    if key == DICTIONARY_KEY and isinstance(value, dict):
+        entries = ", ".join(f"{format_key(k)}: {format_value(v, references)}" for k, v in value.items())
+        return f"$[{entries}]"
+    if not NAME_PATTERN.fullmatch(key) or key.isdigit():
+        raise ValueError(f"Key '{key}' is not a valid name.")
+    if isinstance(value, LIST_TYPES):
+        return f"{key}({format_list(value, references)})"
+    if value == "" and type(value) is str:
+        return key
+    if isinstance(value, dict):
+        raise ValueError(f"Table '{key}' is not supported: only '{DICTIONARY_KEY}' may hold a dictionary.")
+    raise ValueError(f"Top-level value '{key}' must be a list, an empty string or a number named value<line>.")
+
+
+def format_value(value, references):
+    text = literal(value)
+    if text is None:
+        return f"array({format_list(value, references)})"
+    return references.get(text, text)
+
+
+def split_values(data):
+    """Делит ключи верхнего уровня на числа value<номер> (по возрастанию номера) и остальные."""
+    values = []
+    statements = []
+    for key, value in data.items():
+        match = VALUE_KEY_PATTERN.fullmatch(key)
+        if match and type(value) in (int, float):
+            values.append((int(match.group(1)), literal(value)))
+        else:
+            statements.append((key, value))
+    values.sort()
+    return values, statements
+
+
+def count_literals(value, counts):
+    """Добавляет в counts тексты значения, вынос которых в константу может сократить текст.
+
+    Тексты не длиннее MIN_CONSTANT_LENGTH не считаются: ссылка |c0| не короче их.
+    Список целых, в котором нет таких длинных чисел, пропускается по min и max.
+    """
+    if isinstance(value, list) and value and set(map(type, value)) == {int} \
+            and -10 ** (MIN_CONSTANT_LENGTH - 1) < min(value) and max(value) < 10 ** MIN_CONSTANT_LENGTH:
+        return
+    for texts in iter_literals(value):
+        counts.update([text for text in texts if len(text) > MIN_CONSTANT_LENGTH])
+
+
+def choose_constants(counts):
+    """Имена констант для повторяющихся значений, вынос которых сокращает текст.
+
+    Объявление (def имя значение) стоит len(значение) + len(имя) + 8 символов,
+    каждое использование экономит len(значение) - len(имя) - 2. Короткие имена
+    достаются значениям с наибольшей экономией.
+    """
+    def saving(text, count, name_length):
+        return count * (len(text) - name_length - 2) - (len(text) + name_length + 8)
+
+    candidates = sorted(((saving(text, count, 2), text, count) for text, count in counts.items() if count > 1),
+                        reverse=True)
+    names = {}
+    for estimate, text, count in candidates:
+        if estimate <= 0:
+            break
+        name = f"{CONSTANT_PREFIX}{len(names)}"
+        if saving(text, count, len(name)) > 0:
+            names[text] = name
+    return names
+
+
+def iter_config(data, constants=True):
+    """Выдаёт строки учебного языка для словаря верхнего уровня (например, из tomllib).
+
+    Ключ dictionary становится словарём $[...], списки — массивами имя(...),
+    пустые строки — отдельными именами, числа value<номер> — числами на строке
+    с этим номером. Остальные строки заполняются объявлениями констант и
+    прочими конструкциями, а при нехватке — пустыми строками. Каждая конструкция
+    занимает одну строку и выдаётся сразу после формирования.
+
+    При constants=True значения, вынос которых сокращает текст, объявляются
+    константами (def c0 ...) перед первой конструкцией и используются как |c0|.
+    """
+    values, statements = split_values(data)
+    names = {}
+    if constants:
+        counts = Counter()
+        for key, value in statements:
+            if key == DICTIONARY_KEY and isinstance(value, dict):
+                for entry in value.values():
+                    count_literals(entry, counts)
+            elif isinstance(value, LIST_TYPES):
+                count_literals(value, counts)
+        names = choose_constants(counts)
+    references = {text: f"|{name}|" for text, name in names.items()}
+    definitions = (f"(def {name} {text})" for text, name in names.items())
+    lines = chain(definitions, (format_statement(key, value, references) for key, value in statements))
+    line_number = 0
+    for number, text in values:
+        # Число value<номер> должно оказаться ровно на строке с этим номером
+        while line_number < number - 1:
+            line = next(lines, None)
+            if line is None:
+                break
+            yield line
+            line_number += 1
+        for _ in range(number - 1 - line_number):
+            yield ""
+        yield text
+        line_number = number
+    yield from lines
+
+
+def emit(data, constants=True):
+    """Список строк учебного языка для словаря верхнего уровня."""
+    return list(iter_config(data, constants))
+
+
+def emit_stream(data, output, constants=True):
+    """Пишет строки учебного языка в output по мере формирования и возвращает их число."""
+    count = 0
+    for line in iter_config(data, constants):
+        output.write(line + "\n")
+        count += 1
+    return count
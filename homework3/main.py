@@ -1,24 +1,17 @@
+import argparse
+import os
 import sys
-import re
 import logging
+import time
 
-# Настройка логгера
-logging.basicConfig(level=logging.DEBUG)
-
-def process_input_to_toml():
-    toml_lines = []  # Список для хранения итоговых строк в формате TOML
-    line_number = 0  # Для отслеживания номера строки
-    dictionary_pattern = r'^\$\[\s*(.*?)\s*\]$'  # Регулярное выражение для словарей
-    name_pattern = r'^[a-zA-Z0-9]+$'  # Регулярное выражение для имен (буквы и цифры)
-    number_pattern = r'^-?\d+(\.\d+)?$'  # Регулярное выражение для чисел (целые и вещественные)
-    constant_declaration_pattern = r'^\(def\s+(\w+)\s+(.+?)\)$'  # Регулярное выражение для объявления константы
-    constant_usage_pattern = r'\|(\w+)\|'  # Регулярное выражение для использования константы
-    array_pattern = r'^([\w]+)\((.*)\)$'  # Регулярное выражение для массивов
-
-    constants = {}  # Словарь для хранения констант
-    in_dictionary = False  # Флаг для отслеживания режима "накопления" словаря
-    dictionary_lines = []  # Для хранения строк словаря
+import instrument
+from batch import find_configs, summarize, translate_batch, write_summary
+from emitter import emit_stream
+from parse_cache import ParseCache
+from translator import ConfigSyntaxError, translate, translate_stream
 
+def read_input_lines():
+    """Читает строки конфигурации из стандартного ввода до строки -1."""
     print("Введите строки конфигурации (введите -1 для завершения ввода):")
     input_lines = []
     for line in sys.stdin:
@@ -26,161 +19,15 @@ def process_input_to_toml():
         if line == "-1":  # Завершение ввода
             break
         input_lines.append(line)
+    return input_lines
 
-    def parse_array(array_content):
-        """Рекурсивный парсер массивов."""
-        result = []
-        nested = []
-        nested_level = 0
-        current_item = ""
-
-        for char in array_content:
-            if char == '(':
-                nested_level += 1
-                if nested_level == 1:
-                    if current_item.strip():
-                        result.append(current_item.strip())
-                    current_item = "array("
-                else:
-                    current_item += char
-            elif char == ')':
-                nested_level -= 1
-                current_item += char
-                if nested_level == 0:
-                    nested_result = parse_array(current_item[6:-1])  # Рекурсивный вызов для вложенного массива
-                    nested.append(f"array = [{', '.join(nested_result)}]")  # Добавляем вложенные массивы
-                    current_item = ""
-            elif char == ',' and nested_level == 0:
-                if current_item.strip():
-                    result.append(current_item.strip())
-                current_item = ""
-            else:
-                current_item += char
-
-        if current_item.strip():
-            result.append(current_item.strip())
-
-        return result + nested
-
-    def remove_unnecessary_array_prefix(array_list):
-        """Удаляет ненужный префикс 'array' из результирующего списка."""
-        return [item for item in array_list if item != 'array']
-
-    for line in input_lines:
-        line_number += 1
-
-        if line.startswith('!'):
-            continue  # Игнорируем строки с однострочными комментариями
-
-        # Обработка объявления констант: (def имя значение)
-        const_decl_match = re.match(constant_declaration_pattern, line)
-        if const_decl_match:
-            const_name = const_decl_match.group(1)
-            const_value = const_decl_match.group(2)
-            if not re.match(number_pattern, const_value) and not (const_value.startswith('"') and const_value.endswith('"')):
-                logging.error(f"Syntax error on line {line_number}: Invalid constant value '{const_value}'.")
-                sys.exit(1)
-            constants[const_name] = const_value  # Сохраняем константу
-            logging.debug(f"Constant declared: {const_name} = {const_value}")
-            continue
-
-        # Замена константных выражений |имя|
-        def replace_constants(match):
-            const_name = match.group(1)
-            if const_name in constants:
-                return constants[const_name]
-            logging.error(f"Undefined constant '{const_name}' used on line {line_number}.")
-            sys.exit(1)
-
-        line = re.sub(constant_usage_pattern, replace_constants, line)
-
-        # Обработка чисел
-        if re.match(number_pattern, line):
-            toml_lines.append(f'value{line_number} = {line}')  # Записываем число в формате TOML
-            continue
-
-        # Обработка строк, которые могут быть именами (буквы и цифры)
-        name_match = re.match(name_pattern, line)
-        if name_match:
-            name = name_match.group(0)  # Получаем имя
-            toml_lines.append(f'{name} = ""')  # Пример записи имени в TOML, если имя встречено
-            continue
-
-        # Обработка массивов: array(1, 2, array(3, 4))
-        array_match = re.match(array_pattern, line)
-        if array_match:
-            array_name = array_match.group(1)  # Имя массива
-            array_content = array_match.group(2)  # Содержимое массива
-            try:
-                parsed_array = parse_array(array_content)
-                # Убираем ненужный префикс 'array'
-                parsed_array = remove_unnecessary_array_prefix(parsed_array)
-                toml_array = f'{array_name} = [{", ".join(parsed_array)}]'
-                toml_lines.append(toml_array)
-            except ValueError as e:
-                logging.error(f"Syntax error on line {line_number}: {e}")
-                sys.exit(1)
-            continue
-
-        # Обработка начала словаря
-        if line.startswith('$['):
-            if in_dictionary:
-                logging.error(f"Syntax error on line {line_number}: Nested dictionaries are not allowed.")
-                sys.exit(1)  # Завершаем выполнение программы с ошибкой
-            in_dictionary = True
-            dictionary_lines.append(line)
-            continue
-
-        # Обработка завершения словаря
-        if in_dictionary:
-            dictionary_lines.append(line)
-            if line.endswith(']'):
-                in_dictionary = False
-                # Объединяем строки словаря в один блок
-                dict_block = " ".join(dictionary_lines).strip()
-                dictionary_lines = []  # Очищаем накопленные строки
-
-                # Применяем регулярное выражение к словарю
-                dict_match = re.match(dictionary_pattern, dict_block, re.DOTALL)
-                if dict_match:
-                    dict_body = dict_match.group(1).strip()  # Содержимое словаря
-                    try:
-                        # Преобразование тела словаря в формат TOML
-                        entries = re.split(r',\s*(?![^(]*\))', dict_body)
-                        toml_dict_entries = []
-                        for entry in entries:
-                            if ":" not in entry:
-                                raise ValueError(f"Missing ':' in dictionary entry on line {line_number}.")
-                            key, value = map(str.strip, entry.split(":", 1))
-                            # Проверяем, является ли значение массивом
-                            array_match = re.match(array_pattern, value)
-                            if array_match:
-                                array_content = array_match.group(2)
-                                parsed_array = parse_array(array_content)
-                                value = f'[{", ".join(parsed_array)}]'
-                            # Проверяем, является ли значение числом
-                            elif re.match(number_pattern, value):
-                                value = value
-                            # Проверяем, является ли значение строкой
-                            elif value.startswith('"') and value.endswith('"'):
-                                value = value
-                            else:
-                                raise ValueError(f"Invalid value '{value}' in dictionary entry.")
-                            toml_dict_entries.append(f'{key} = {value}')
-                        toml_dict = f'{{{", ".join(toml_dict_entries)}}}'
-                        toml_lines.append(f'dictionary = {toml_dict}')
-                    except ValueError as e:
-                        logging.error(f"Syntax error on line {line_number}: {e}")
-                        sys.exit(1)  # Завершаем выполнение программы с ошибкой
-                else:
-                    logging.error(f"Syntax error on line {line_number}: Invalid dictionary format.")
-                    sys.exit(1)  # Завершаем выполнение программы с ошибкой
-            continue
-
-        # Если строка не совпадает ни с одним шаблоном, возможно, это ошибка
-        if line and not in_dictionary:
-            logging.error(f"Syntax error on line {line_number}: Unrecognized syntax.")
-            sys.exit(1)
+def process_input_to_toml():
+    # Разбор выполняет translator: лексер и нисходящий парсер строят AST за один проход
+    try:
+        toml_lines = translate(read_input_lines())
+    except ConfigSyntaxError as e:
+        logging.error(str(e))
+        sys.exit(1)
 
     # Если ошибок не было, записываем результат в файл TOML
     if toml_lines:
@@ -191,5 +38,135 @@ def process_input_to_toml():
         logging.error("No valid TOML data to write.")
         sys.exit(1)  # Завершаем выполнение программы, если нет данных для записи
 
+def close_file(f, standard):
+    """Закрывает открытый программой файл; стандартный поток и неоткрытый файл (None) не трогает."""
+    if f is not None and f is not standard:
+        f.close()
+
+def translate_file(input_path, output_path, cache_dir=None):
+    """Потоково переводит файл или поток ("-") в TOML; строка -1 здесь обычное число."""
+    cache = ParseCache(cache_dir) if cache_dir else None
+    # Результат пишется во временный файл и заменяет прежний только при успешном разборе
+    tmp_path = None if output_path == "-" else f"{output_path}.{os.getpid()}.tmp"
+    source = output = count = None
+    try:
+        source = sys.stdin if input_path == "-" else open(input_path, encoding="utf-8")
+        output = sys.stdout if tmp_path is None else open(tmp_path, "w", encoding="utf-8")
+        with instrument.span("translate"):
+            count = translate_stream(source, output, cache)
+    except (ConfigSyntaxError, OSError, UnicodeDecodeError) as e:
+        logging.error(str(e))
+    finally:
+        close_file(source, sys.stdin)
+        close_file(output, sys.stdout)
+        if not count and tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if not count:
+        if count == 0:
+            logging.error("No valid TOML data to write.")
+        sys.exit(1)
+    if cache is not None:
+        for name, value in cache.stats().items():
+            instrument.count(f"parse_cache.{name}", value)
+        with instrument.span("parse_cache.save"):
+            cache.save()
+    if tmp_path:
+        os.replace(tmp_path, output_path)
+        print(f"TOML file created successfully: {output_path}", file=sys.stderr)
+
+def reverse_file(input_path, output_path, constants=True):
+    """Переводит TOML в учебный язык; повторяющиеся значения выносятся в константы, если constants."""
+    import tomllib  # Только в этом режиме: модуль есть в Python начиная с 3.11
+
+    try:
+        if input_path == "-":
+            data = tomllib.load(sys.stdin.buffer)
+        else:
+            with open(input_path, "rb") as f:
+                data = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        logging.error(str(e))
+        sys.exit(1)
+
+    tmp_path = None if output_path == "-" else f"{output_path}.{os.getpid()}.tmp"
+    output = count = None
+    try:
+        output = sys.stdout if tmp_path is None else open(tmp_path, "w", encoding="utf-8")
+        with instrument.span("emit"):
+            count = emit_stream(data, output, constants)
+    except (ValueError, OSError) as e:
+        logging.error(str(e))
+    finally:
+        close_file(output, sys.stdout)
+        if count is None and tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if count is None:
+        sys.exit(1)
+    if tmp_path:
+        os.replace(tmp_path, output_path)
+        print(f"Config file created successfully: {output_path}", file=sys.stderr)
+
+def run_batch(sources, pattern, output_dir, workers, summary_path):
+    """Пакетный перевод в одном процессе Python вместо запуска main.py на каждый файл."""
+    paths = find_configs(sources, pattern)
+    if not paths:
+        logging.error("No config files found.")
+        sys.exit(1)
+    start = time.perf_counter()
+    with instrument.span("batch"):
+        results = translate_batch(paths, output_dir, workers)
+    instrument.count("batch.files", len(results))
+    summary = summarize(results, time.perf_counter() - start)
+    write_summary(summary, summary_path)
+    for path, error in summary["errors"].items():
+        position = f" (line {error['line']}, column {error['column']})" if "line" in error else ""
+        logging.error(f"{path}{position}: {error['message']}")
+    print(f"Translated {summary['translated']} of {summary['files']} files in {summary['seconds']} s, "
+          f"summary: {summary_path}", file=sys.stderr)
+    if summary["failed"]:
+        sys.exit(1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перевод учебного конфигурационного языка в TOML.")
+    parser.add_argument("--input", help="Входной файл или - для стандартного ввода (без строки -1 в конце).")
+    parser.add_argument("--output", default=None,
+                        help="Выходной файл или - для стандартного вывода (по умолчанию res_output.toml, "
+                             "с --reverse — res_output.txt).")
+    parser.add_argument("--reverse", action="store_true",
+                        help="Обратный перевод: --input в формате TOML записывается на учебном языке.")
+    parser.add_argument("--no-constants", action="store_true",
+                        help="При --reverse не выносить повторяющиеся значения в константы.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Каталог кэша разобранных конструкций: повторный перевод разбирает только изменённые.")
+    parser.add_argument("--batch", nargs="+", metavar="SOURCE",
+                        help="Пакетный режим: каталоги, файлы или glob-маски; каждый файл переводится в свой .toml.")
+    parser.add_argument("--pattern", default="*.txt", help="Маска файлов при обходе каталогов в пакетном режиме.")
+    parser.add_argument("--output-dir", default=None, help="Каталог для .toml в пакетном режиме (по умолчанию рядом с исходными).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Число рабочих процессов в пакетном режиме.")
+    parser.add_argument("--summary", default="batch_summary.json", help="Файл JSON со сводкой ошибок пакетного режима.")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Логирование настраивается при запуске программы, а не при импорте модуля
+    logging.basicConfig(level=logging.INFO)
+    instrument.enable("translator", args.profile, args.cprofile)
+    try:
+        if args.batch:
+            run_batch(args.batch, args.pattern, args.output_dir, args.workers, args.summary)
+        elif args.reverse:
+            if args.input is None:
+                parser.error("--reverse requires --input")
+            reverse_file(args.input, args.output or "res_output.txt", not args.no_constants)
+        elif args.input is None:
+            # Интерактивный режим: ввод строк до -1, результат в res_output.toml
+            process_input_to_toml()
+        else:
+            translate_file(args.input, args.output or "res_output.toml", args.cache_dir)
+    finally:
+        # Отчёт пишется и при выходе с ошибкой через sys.exit
+        instrument.finish()
+
 if __name__ == "__main__":
-    process_input_to_toml()
+    main()
@@ -0,0 +1,301 @@
+import hashlib
+import os
+import pickle
+import re
+import time
+import zlib
+from collections import OrderedDict
+
+import instrument
+from translator import (Array, ConfigSyntaxError, Constant, ConstantTable, Dictionary, List, Negate, Number,
+                        Parser, Placeholder, Reference, BinaryOp, Value, statement_span, token_column, to_toml)
+
+# Версия формата записей: меняется вместе с узлами AST в translator
+FORMAT_VERSION = 1
+# Скобки вне строк и комментариев: по ним текст делится на конструкции верхнего уровня
+BRACKET_PATTERN = re.compile(r'"[^"\n]*"|!.*|[()\]]|\$\[')
+BRACKET_DEPTH = {"(": 1, "$[": 1, ")": -1, "]": -1}
+# Кусок текста из целых конструкций кэшируется одной записью. Граница куска выбирается
+# по содержимому: после конструкции, хэш последней строки которой даёт 0 по маске, но не
+# раньше MIN_CHUNK_SIZE символов; куски длиннее MAX_CHUNK_SIZE режутся принудительно.
+# Поэтому правка, меняющая длину строки, не сдвигает границы дальше по тексту.
+MIN_CHUNK_SIZE = 2048
+MAX_CHUNK_SIZE = 16384
+BOUNDARY_MASK = 63
+# Метка места подстановки в заготовке строки TOML
+MARK = "\0"
+
+
+def block_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def iter_blocks(lines):
+    """Делит текст на конструкции верхнего уровня: выдаёт (номер первой строки, строки конструкции).
+
+    Конструкция заканчивается строкой, на которой закрыты все открытые скобки.
+    Разбор не выполняется, поэтому деление стоит одного поиска скобок на строку.
+    """
+    block = []
+    first = depth = 0
+    for number, line in enumerate(lines, 1):
+        if not block:
+            first = number
+        block.append(line)
+        for token in BRACKET_PATTERN.findall(line):
+            depth += BRACKET_DEPTH.get(token, 0)
+        if depth <= 0:
+            yield first, block
+            block = []
+            depth = 0
+    if block:
+        yield first, block
+
+
+def iter_chunks(lines, min_size=MIN_CHUNK_SIZE, max_size=MAX_CHUNK_SIZE):
+    """Объединяет идущие подряд конструкции в куски: в среднем около 4 КБ текста.
+
+    Мелкие конструкции дешевле разобрать, чем искать в кэше по одной, поэтому
+    запись кэша соответствует куску. Кусок заканчивается конструкцией, чья
+    последняя строка попадает на границу по хэшу (crc32 не зависит от запуска,
+    в отличие от hash), поэтому после правки одной строки границы дальше по
+    тексту остаются на месте: заново разбирается её кусок и изредка соседний.
+    """
+    chunk = []
+    first = length = 0
+    for number, block in iter_blocks(lines):
+        if not chunk:
+            first = number
+        chunk.extend(block)
+        length += sum(map(len, block))
+        if length >= max_size or length >= min_size and \
+                not zlib.crc32(block[-1].encode("utf-8", "surrogatepass")) & BOUNDARY_MASK:
+            yield first, chunk
+            chunk = []
+            length = 0
+    if chunk:
+        yield first, chunk
+
+
+def map_placeholders(value, function):
+    """Копия значения, в котором Placeholder заменены на function(Placeholder); вложенность обходится без рекурсии."""
+    kind = type(value)
+    if kind is Placeholder:
+        return function(value)
+    if kind is not List:
+        return value
+    root = []
+    stack = [(iter(value.items), root)]
+    while stack:
+        items, result = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        kind = type(item)
+        if kind is List:
+            # Узел List ссылается на ещё не заполненный список, он дополнится при обходе
+            nested = []
+            result.append(List(nested))
+            stack.append((iter(item.items), nested))
+        else:
+            result.append(function(item) if kind is Placeholder else item)
+    return List(root)
+
+
+def map_statement(statement, function):
+    """Копия узла верхнего уровня, в значениях которого Placeholder заменены на function(Placeholder)."""
+    kind = type(statement)
+    if kind is Value:
+        return statement._replace(value=map_placeholders(statement.value, function))
+    if kind is Array:
+        return statement._replace(items=map_placeholders(List(statement.items), function).items)
+    if kind is Dictionary:
+        return statement._replace(entries=[(key, map_placeholders(value, function)) for key, value in statement.entries])
+    return statement
+
+
+def make_template(statement):
+    """Заготовка строки TOML: (части текста, места подстановки между ними).
+
+    Место подстановки — номер строки (для value<номер>) или кортеж
+    (имя константы, строка, номер лексемы). Заготовки состоят только из
+    встроенных типов, поэтому pickle сохраняет и загружает их быстро.
+    """
+    placeholders = []
+
+    def mark(placeholder):
+        placeholders.append(tuple(placeholder))
+        return Number(MARK)
+
+    if type(statement) is Value:
+        placeholders.append(statement.line)
+        statement = statement._replace(line=MARK)
+    return to_toml(map_statement(statement, mark)).split(MARK), placeholders
+
+
+def compile_chunk(chunk, first=1):
+    """Разбирает кусок, начинающийся со строки first, отдельно от остального текста.
+
+    Результат не зависит ни от места куска в файле, ни от значений констант:
+    конструкции без ссылок сразу переводятся в строки TOML, массивы, словари со
+    ссылками и числа value<номер> — в заготовки make_template, остальное хранится
+    узлами AST с номерами строк от начала куска.
+    """
+    parser = Parser(chunk, resolve=False)
+    templates = not any(MARK in line for line in chunk)
+    entry = []
+    references = 0
+    try:
+        for statement in parser.statements():
+            kind = type(statement)
+            plain = parser.references == references
+            references = parser.references
+            if kind is Constant or not templates:
+                pass
+            elif plain and kind is not Value:
+                statement = to_toml(statement)
+            elif plain or kind is not Value:
+                # Число value<номер> со ссылкой остаётся узлом: его значение нужно проверить
+                statement = make_template(statement)
+            entry.append(statement)
+    except ConfigSyntaxError as e:
+        raise ConfigSyntaxError(e.message, e.line + first - 1, e.column)
+    return entry
+
+
+def shift_lines(node, offset):
+    """Копия выражения константы с номерами строк, сдвинутыми на offset."""
+    kind = type(node)
+    if kind is Reference:
+        return node._replace(line=node.line + offset)
+    if kind is Negate:
+        return Negate(shift_lines(node.operand, offset))
+    if kind is BinaryOp:
+        return node._replace(left=shift_lines(node.left, offset), right=shift_lines(node.right, offset),
+                             line=node.line + offset)
+    return node
+
+
+def entry_span(item):
+    """Имя участка замера для записи куска: готовая строка, заготовка или узел AST."""
+    kind = type(item)
+    if kind is str:
+        return "parse_cache.text"
+    if kind is tuple:
+        return "parse_cache.template"
+    return statement_span(item)
+
+
+class ParseCache:
+    """Кэш разобранных кусков текста из целых конструкций по хэшу их текста.
+
+    Записи хранятся в памяти в порядке использования; при превышении max_entries
+    вытесняются давно не использованные. Если задан cache_dir, кэш загружается
+    из файла при создании и записывается обратно методом save, поэтому
+    повторный перевод почти не изменившегося файла разбирает только изменённые
+    куски. Константы подставляются при каждом переводе.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=20000):
+        self.path = os.path.join(cache_dir, "blocks.pickle") if cache_dir else None
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Хэш текста куска -> результат compile_chunk
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.changed = False
+        if self.path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return  # Нет кэша или он записан другой версией программы
+        if isinstance(data, dict) and data.get("version") == FORMAT_VERSION:
+            self.entries = data["entries"]
+
+    def lookup(self, chunk, first):
+        """Результат разбора куска; при промахе кусок разбирается и запоминается."""
+        key = block_key("\n".join(chunk))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        with instrument.span("parse_cache.compile"):
+            entry = self.entries[key] = compile_chunk(chunk, first)
+        self.changed = True
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def iter_toml(self, lines):
+        """Выдаёт строки TOML (или None), разбирая заново только куски, которых нет в кэше."""
+        if isinstance(lines, str):
+            lines = lines.splitlines()
+        constants = ConstantTable()
+        # Время подстановки по видам записей; разбор кусков при промахе замеряет lookup
+        profile = instrument.enabled()
+        for first, chunk in iter_chunks(lines):
+            offset = first - 1
+
+            def resolve(placeholder):
+                name, line, index = placeholder
+                value = constants.get(name)
+                if value is None:
+                    raise ConfigSyntaxError(f"Undefined constant '{name}'.", line + offset,
+                                            token_column(chunk[line - 1], index))
+                return value
+
+            try:
+                entry = self.lookup(chunk, first)
+            except ConfigSyntaxError:
+                # Разбор без констант нашёл ошибку. Обычный разбор мог бы раньше споткнуться
+                # о константу, поэтому кусок разбирается так же, как без кэша: ошибка та же
+                yield from map(to_toml, Parser(chunk, first=first, constants=constants).statements())
+                raise
+            for item in entry:
+                if profile:
+                    start = time.perf_counter()
+                kind = type(item)
+                if kind is str:
+                    line = item
+                elif kind is tuple:
+                    segments, placeholders = item
+                    parts = [segments[0]]
+                    for placeholder, segment in zip(placeholders, segments[1:]):
+                        parts.append(str(placeholder + offset) if type(placeholder) is int else resolve(placeholder).text)
+                        parts.append(segment)
+                    line = "".join(parts)
+                elif kind is Constant:
+                    constants.define(item.name, shift_lines(item.value, offset), item.line + offset, item.column)
+                    line = None
+                else:
+                    statement = map_statement(item, resolve)
+                    if kind is Value and type(statement.value) is not Number:
+                        placeholder = item.value
+                        raise ConfigSyntaxError("A standalone value must be a number.", placeholder.line + offset,
+                                                token_column(chunk[placeholder.line - 1], placeholder.index))
+                    line = to_toml(statement._replace(line=statement.line + offset))
+                if profile:
+                    instrument.record(entry_span(item), time.perf_counter() - start)
+                yield line
+
+    def save(self):
+        if not self.path or not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Свой временный файл у каждого процесса: параллельные запуски не портят кэш
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": FORMAT_VERSION, "entries": self.entries}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
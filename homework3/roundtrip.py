@@ -0,0 +1,138 @@
+import argparse
+import io
+import random
+import string
+import sys
+import time
+import tomllib
+
+from emitter import emit, emit_stream
+from parse_cache import ParseCache
+from translator import translate
+
+# Короткий набор повторяющихся значений: на нём проверяется вынос в константы
+SHARED_STRINGS = ["production-cluster", "https://example.com/api/v1", "", "x", "UTF-8 текст"]
+STRING_CHARS = string.ascii_letters + string.digits + " _-.,:;!|$[]()'\tабв"
+
+
+def random_float(rng):
+    kind = rng.random()
+    if kind < 0.2:
+        return rng.choice([0.0, -0.0, 0.5, 1e-7, 1e20, -2.5e-300, 5e-324, 1.7976931348623157e308])
+    if kind < 0.6:
+        return round(rng.uniform(-1000, 1000), rng.randint(0, 6))
+    return rng.uniform(-1e6, 1e6)
+
+
+def random_scalar(rng):
+    kind = rng.random()
+    if kind < 0.35:
+        return rng.randint(-10 ** rng.randint(1, 20), 10 ** rng.randint(1, 20))
+    if kind < 0.55:
+        return random_float(rng)
+    if kind < 0.8:
+        return rng.choice(SHARED_STRINGS)
+    return "".join(rng.choice(STRING_CHARS) for _ in range(rng.randint(0, 20)))
+
+
+def random_list(rng, size, depth):
+    """Список из size элементов со вложенными списками до глубины depth."""
+    if rng.random() < 0.3:
+        # Однородный числовой список: быстрый путь эмиттера
+        return [rng.randint(-1000, 1000) for _ in range(size)]
+    items = []
+    for _ in range(size):
+        if depth and rng.random() < 0.15:
+            items.append(random_list(rng, rng.randint(0, max(1, size // 2)), depth - 1))
+        else:
+            items.append(random_scalar(rng))
+    return items
+
+
+def random_name(rng):
+    return rng.choice(string.ascii_letters + "_") + "".join(
+        rng.choice(string.ascii_letters + string.digits + "_") for _ in range(rng.randint(0, 8)))
+
+
+def random_document(rng, size):
+    """Словарь верхнего уровня, который можно записать на учебном языке."""
+    document = {}
+    line = 0
+    for _ in range(rng.randint(1, size)):
+        kind = rng.random()
+        if kind < 0.5:
+            document[random_name(rng)] = random_list(rng, rng.randint(0, size), 3)
+        elif kind < 0.65:
+            document[random_name(rng)] = ""
+        elif kind < 0.9:
+            line += rng.randint(1, 5)
+            document[f"value{line}"] = rng.choice([rng.randint(-10 ** 6, 10 ** 6), random_float(rng)])
+        elif "dictionary" not in document:
+            entries = {}
+            for _ in range(rng.randint(0, size)):
+                key = random_name(rng) if rng.random() < 0.7 else random_scalar(rng)
+                entries[str(key).replace('"', "").replace("\\", "")] = \
+                    random_list(rng, rng.randint(0, 5), 2) if rng.random() < 0.2 else random_scalar(rng)
+            document["dictionary"] = entries
+    return document
+
+
+def check(document):
+    """Сообщение о первом нарушенном свойстве или None.
+
+    Свойства: перевод текста эмиттера обратно в TOML даёт исходный словарь;
+    потоковая запись совпадает со списком строк; с кэшем разбора перевод тот же;
+    вынос значений в константы не удлиняет текст.
+    """
+    lines = emit(document)
+    toml = translate(lines)
+    if tomllib.loads("\n".join(toml)) != document:
+        return "TOML after the round trip differs from the document"
+    stream = io.StringIO()
+    emit_stream(document, stream)
+    if stream.getvalue() != "".join(line + "\n" for line in lines):
+        return "emit_stream output differs from emit"
+    if translate(lines, ParseCache()) != toml:
+        return "translation with ParseCache differs"
+    if sum(map(len, lines)) > sum(map(len, emit(document, constants=False))):
+        return "constants made the text longer"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка обратного перевода TOML -> учебный язык -> TOML на случайных словарях.")
+    parser.add_argument("--documents", type=int, default=2000, help="Число случайных словарей.")
+    parser.add_argument("--size", type=int, default=30, help="Наибольшее число ключей и элементов массивов.")
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора; словарь i строится с seed + i.")
+    parser.add_argument("--large", type=int, default=0,
+                        help="Дополнительно проверить словарь с массивом из стольких элементов и замерить скорость.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    for i in range(args.documents):
+        document = random_document(random.Random(args.seed + i), args.size)
+        error = check(document)
+        if error:
+            print(f"seed {args.seed + i}: {error}\n{document!r}")
+            sys.exit(1)
+    print(f"{args.documents} словарей проверено за {time.perf_counter() - start:.2f} с")
+
+    if args.large:
+        rng = random.Random(args.seed)
+        document = {"numbers": list(range(args.large)),
+                    "mixed": [random_scalar(rng) for _ in range(args.large // 10)],
+                    "dictionary": {f"key{i}": random_scalar(rng) for i in range(args.large // 100)}}
+        start = time.perf_counter()
+        lines = emit(document)
+        seconds = time.perf_counter() - start
+        megabytes = sum(len(line) + 1 for line in lines) / 1024 / 1024
+        print(f"{args.large} элементов: {megabytes:.1f} МБ текста за {seconds:.3f} с ({megabytes / seconds:.1f} МБ/с), "
+              f"без констант {sum(len(line) + 1 for line in emit(document, constants=False)) / 1024 / 1024:.1f} МБ")
+        error = check(document)
+        if error:
+            print(f"large: {error}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
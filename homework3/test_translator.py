@@ -0,0 +1,382 @@
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import tomllib
+import unittest
+from array import array
+from unittest.mock import patch
+
+import instrument
+from batch import summarize, translate_batch, translate_config
+from bench import make_config, make_deep_array, make_huge_array
+from emitter import emit, emit_stream
+from parse_cache import ParseCache
+from roundtrip import check, random_document
+from translator import (Array, ConfigSyntaxError, Constant, Dictionary, Lexer, List, Name, Number, Numbers, String,
+                        Value, parse, parse_array, python_value, translate, translate_stream)
+
+
+def syntax_error(text, cache=None):
+    """(сообщение, строка, колонка) ошибки перевода или None."""
+    try:
+        translate(text, cache)
+    except ConfigSyntaxError as e:
+        return e.message, e.line, e.column
+    return None
+
+
+class TestParser(unittest.TestCase):
+
+    def test_statements(self):
+        text = '(def a 5)\nx(1, "s", array(2, |a|))\n$[k: 1,\n  m: "v"]\nname\n7\n! комментарий'
+        self.assertEqual(parse(text), [
+            Constant("a", Number("5"), 1, 8),
+            Array("x", [Number("1"), String('"s"'), List([Number("2"), Number("5")])], 2),
+            Dictionary([("k", Number("1")), ("m", String('"v"'))], 3),
+            Name("name", 5),
+            Value(Number("7"), 6),
+        ])
+
+    def test_translate(self):
+        text = '(def a 5)\nx(1, "s", array(2, |a|))\n$[k: 1,\n  m: "v"]\nname\n7\n! комментарий'
+        self.assertEqual(translate(text), ['x = [1, "s", [2, 5]]', 'dictionary = {k = 1, m = "v"}',
+                                           'name = ""', "value6 = 7"])
+
+    def test_error_positions(self):
+        cases = [
+            ("x(1, 2", ("Expected ',' or ')' in array.", 2, 1)),
+            ("$[a 1]", ("Missing ':' in dictionary entry 'a'.", 1, 5)),
+            ("  @", ("Unexpected character '@'.", 1, 3)),
+            ("x(1) y", ("Unexpected 'y' after the end of the construct.", 1, 6)),
+            ("(def a)", ("Invalid constant value ')'.", 1, 7)),
+            ("$[a: $[b: 1]]", ("Nested dictionaries are not allowed.", 1, 6)),
+            ('y(1)\n"s"', ("Unrecognized syntax.", 2, 1)),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(syntax_error(text), expected)
+
+
+    def test_flat_array_lines(self):
+        # Строка из одного массива чисел разбирается без лексем на элементы
+        self.assertEqual(parse("x(1, 2.5,3)"), [Array("x", [Numbers(["1", "2.5", "3"])], 1)])
+        self.assertEqual(parse("x(\n  array(1, 2)\n)"), [Array("x", [List([Numbers(["1", "2"])])], 1)])
+        self.assertEqual(translate(["x(1, 2.5, 3)", "y(1,\t2)"]), ["x = [1, 2.5, 3]", "y = [1, 2]"])
+        self.assertEqual(syntax_error("12(1, 2)"), ("Unexpected '(' after the end of the construct.", 1, 3))
+        self.assertEqual(syntax_error("$[\n  x(1, 2)\n]"), ("Missing ':' in dictionary entry 'x'.", 2, 4))
+        lexer = Lexer(["x(1, 22, 3) "])
+        next(lexer.tokens())
+        self.assertEqual(lexer.position(3), (1, 11))
+        # Строки потока оканчиваются переводом строки, пустые и комментарии лексем не дают
+        tokens = list(Lexer(["x(1, 2)\n", "\n", "  ! note\n"]).tokens())
+        self.assertEqual(tokens, [(["name", "(", "numbers", ")", "newline"], ["x", "(", ["1", "2"], ")", ""]),
+                                  (["eof"], [""])])
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_stream_matches_translate(self):
+        lines = make_config(600)
+        output = io.StringIO()
+        count = translate_stream(iter(lines), output)
+        expected = translate(lines)
+        self.assertEqual(count, len(expected))
+        self.assertEqual(output.getvalue(), "\n".join(expected))
+
+    def test_stream_writes_before_error(self):
+        output = io.StringIO()
+        with self.assertRaises(ConfigSyntaxError):
+            translate_stream(["x(1)", "y(2", "z(3)"], output)
+        self.assertEqual(output.getvalue(), "x = [1]")
+
+    def stream(self, text, cache=None):
+        """Вывод translate_stream для текста, читаемого как файл, или (сообщение, строка, колонка) ошибки."""
+        output = io.StringIO()
+        try:
+            translate_stream(io.StringIO(text), output, cache)
+        except ConfigSyntaxError as e:
+            return e.message, e.line, e.column
+        return output.getvalue()
+
+    def test_file_lines_match_translate(self):
+        # Строки файла сохраняют перевод строки; конструкции занимают несколько строк
+        text = ("\n".join(make_config(3000)) + "\n\n$[\n  k: 1,\n\n  m: list(1,\n    2)\n]\n"
+                "x(\n  1, |base|)\r\ny(1, 2, 3)\r\n! конец\n")
+        expected = "\n".join(translate(text))
+        self.assertEqual(self.stream(text), expected)
+        self.assertEqual(self.stream(text, ParseCache()), expected)
+
+    def test_error_positions_across_blocks(self):
+        # Ошибка после нескольких кусков кэша и внутри многострочной конструкции
+        head = "\n".join(make_config(3000)) + "\n"
+        offset = head.count("\n")
+        cases = [
+            ("x(1,\n  2\n  y(3)\n", ("Expected ',' or ')' in array.", 3, 3)),
+            ("$[\n  k: 1,\n  m 2\n]\n", ("Missing ':' in dictionary entry 'm'.", 3, 5)),
+            ("$[k: 1,\n  m: |zz|]\n", ("Undefined constant 'zz'.", 2, 6)),
+            ("x(1,\n", ("Expected a value, got 'eof'.", 2, 1)),
+            ("x(1, 2, 3) 4\n", ("Unexpected '4' after the end of the construct.", 1, 12)),
+            ("a(1,\r\n 2)) \r\n", ("Unexpected ')' after the end of the construct.", 2, 4)),
+        ]
+        for tail, (message, line, column) in cases:
+            expected = (message, offset + line, column)
+            with self.subTest(tail=tail):
+                self.assertEqual(syntax_error(head + tail), expected)
+                self.assertEqual(self.stream(head + tail), expected)
+                self.assertEqual(self.stream(head + tail, ParseCache()), expected)
+
+
+class TestConstantExpressions(unittest.TestCase):
+
+    def assertSyntaxError(self, text, message, line, column):
+        self.assertEqual(syntax_error(text), (message, line, column))
+
+    def test_expressions(self):
+        # Константа может ссылаться на объявленную ниже: значение вычисляется при первом использовании
+        text = '(def size |base| * (2 + 1) - 1)\n(def base 4)\n(def half 7 / 2)\n(def title "v" + "1")\n' \
+               '(def neg -|base|)\nx(|size|, |half|, |title|, |neg|)'
+        self.assertEqual(translate(text), ['x = [11, 3.5, "v1", -4]'])
+
+    def test_redefinition_updates_dependents(self):
+        text = "(def a |b| + 1)\n(def b 2)\nx(|a|)\n(def b 10)\nx(|a|)"
+        self.assertEqual(translate(text), ["x = [3]", "x = [11]"])
+
+    def test_cycle(self):
+        self.assertSyntaxError("(def a |b|)\n(def b |a|)\nx(|a|)", "Cyclic constant definition: a -> b -> a.", 1, 8)
+
+    def test_undefined(self):
+        self.assertSyntaxError("x(1)\ny(2, |zz|)", "Undefined constant 'zz'.", 2, 6)
+        self.assertSyntaxError("(def a |zz| + 1)\nx(|a|)", "Undefined constant 'zz'.", 1, 8)
+
+    def test_type_errors(self):
+        self.assertSyntaxError('(def a "s" * 2)\nx(|a|)', "Unsupported operand types for '*'.", 1, 12)
+        self.assertSyntaxError('(def a - "s")\nx(|a|)', "Cannot negate a string.", 1, 8)
+
+    def test_large_float_stays_float(self):
+        # Свёрнутое 1e16 записывается без экспоненты и снова читается как вещественное
+        text = "(def a 10000000000.0 * 1000000.0)\n(def b |a| + 2)\nx(|b|, |a|)"
+        self.assertEqual(translate(text), ["x = [10000000000000002.0, 10000000000000000.0]"])
+
+    def test_small_float_without_exponent(self):
+        self.assertEqual(translate("(def a 1 / 10000000)\n(def b |a| * 2)\nx(|b|)"), ["x = [0.0000002]"])
+
+    def test_division_by_zero(self):
+        self.assertSyntaxError("(def a 1.0 / 0)\nx(|a|)", "Division by zero.", 1, 12)
+        self.assertSyntaxError("(def z 0.0)\n(def a 1 / |z|)\nx(|a|)", "Division by zero.", 2, 10)
+
+    def test_float_overflow(self):
+        text = "(def a 1" + "0" * 300 + ".0)\n(def b |a| * |a|)\nx(|b|)"
+        self.assertSyntaxError(text, "Result of '*' is not a finite number.", 2, 12)
+
+    def test_integer_too_large_for_float(self):
+        text = "(def a 1" + "0" * 400 + ")\n(def b |a| / 3)\nx(|b|)"
+        self.assertSyntaxError(text, "Result of '/' is not a finite number.", 2, 12)
+
+
+class TestInstrument(unittest.TestCase):
+
+    def test_profile_with_cache(self):
+        # С кэшем время записывается по видам записей кусков, а не пропадает
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = os.path.join(tmp, "profile.json")
+            instrument.enable("translator", report_path)
+            try:
+                translate(["(def a 5)", "x(1, |a|)", "y(2)"], ParseCache())
+            finally:
+                instrument.finish()
+            with open(report_path) as f:
+                spans = json.load(f)["spans"]
+        self.assertEqual({name: stats["count"] for name, stats in spans.items() if name != "parse_cache.compile"},
+                         {"parse.Constant": 1, "parse_cache.template": 1, "parse_cache.text": 1})
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_errors_are_results(self):
+        good = self.write("good.txt", "x(1, 2)\n")
+        bad = self.write("bad.txt", "x(1, 2\n$[a: |zz|]\n")
+        empty = self.write("empty.txt", "! только комментарий\n")
+        output_dir = os.path.join(self.tmp, "out")
+        results = translate_batch([good, bad, empty], output_dir, workers=2)
+        self.assertIsNone(results[0]["error"])
+        with open(results[0]["output"], encoding="utf-8") as f:
+            self.assertEqual(f.read(), "x = [1, 2]")
+        self.assertEqual(results[1]["error"]["line"], 2)
+        self.assertEqual(results[2]["error"], {"message": "No valid TOML data to write."})
+        summary = summarize(results, 0.5)
+        self.assertEqual((summary["translated"], summary["failed"]), (1, 2))
+        self.assertEqual(sorted(os.listdir(output_dir)), ["good.toml"])
+
+    def test_unexpected_exception_is_reported(self):
+        # Необработанная ошибка транслятора не останавливает пакет и не оставляет временный файл
+        path = self.write("a.txt", "x(1)\n")
+        output = os.path.join(self.tmp, "a.toml")
+        with patch("batch.translate_stream", side_effect=ValueError("boom")):
+            result = translate_config(path, output)
+        self.assertEqual(result["error"], {"message": "ValueError: boom"})
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["a.txt"])
+
+
+class TestArrays(unittest.TestCase):
+
+    def test_deep_nesting(self):
+        depth = 10000
+        (line,) = translate(make_deep_array(depth))
+        self.assertEqual(line, "deep = " + "[" * (depth + 1) + "1" + "]" * (depth + 1))
+        value = parse_array(make_deep_array(depth)[0])
+        for _ in range(depth):
+            (value,) = value
+        self.assertEqual(value, [1])
+
+    def test_large_array(self):
+        elements = 100000
+        self.assertEqual(translate(make_huge_array(elements)), [f"big = [{', '.join(map(str, range(elements)))}]"])
+        values = parse_array(make_huge_array(elements)[0])
+        self.assertEqual((type(values), values.typecode, values[-1]), (array, "q", elements - 1))
+
+    def test_python_value_types(self):
+        self.assertEqual(parse_array('x(1, 2.5, "s", array(3, array()))'), [1, 2.5, "s", [3, []]])
+        self.assertEqual(python_value(Number("-4")), -4)
+        self.assertEqual(python_value(String('"s"')), "s")
+        floats = parse_array(f"x({', '.join(['1.5'] * 3)}, array({', '.join(['2.5'] * 3)}))", compact_size=3)
+        self.assertEqual((type(floats), floats[:3]), (list, [1.5, 1.5, 1.5]))
+        self.assertEqual((floats[3].typecode, floats[3].tolist()), ("d", [2.5, 2.5, 2.5]))
+        # Короткие, смешанные и выходящие за 64 бита списки остаются списками
+        self.assertIs(type(parse_array("x(1, 2)")), list)
+        self.assertEqual(parse_array("x(1, 2.0, 3)", compact_size=3), [1, 2.0, 3])
+        big = parse_array(f"x(1, {2 ** 70})", compact_size=2)
+        self.assertEqual((type(big), big), (list, [1, 2 ** 70]))
+
+    def test_parse_array_expects_one_array(self):
+        for text in ["x(1)\ny(2)", "$[a: 1]", "7"]:
+            with self.subTest(text=text), self.assertRaises(ConfigSyntaxError):
+                parse_array(text)
+
+
+class TestEmitter(unittest.TestCase):
+
+    def test_fixed_document(self):
+        document = {"ports": [80, 443, [8080, 8443]], "hosts": ["production-cluster"] * 3, "flag": "",
+                    "value2": 1.5, "dictionary": {"name": "web", "list": [1, "a"]}}
+        lines = emit(document)
+        self.assertEqual(lines[0], '(def c0 "production-cluster")')
+        self.assertEqual(lines[1], "1.5")
+        self.assertEqual(tomllib.loads("\n".join(translate(lines))), document)
+
+    def test_toml_round_trip(self):
+        # TOML -> учебный язык -> TOML: повторяющиеся длинные значения выносятся в константы
+        text = "\n".join([
+            'value3 = 42', 'ports = [80, 443, [8080, 8443]]',
+            'hosts = ["https://example.com/api/v1", "https://example.com/api/v1", "backup"]',
+            'mirrors = ["https://example.com/api/v1", [123456789, 123456789], 123456789, 123456789]',
+            'flag = ""', 'value7 = -2.5',
+            'dictionary = {name = "https://example.com/api/v1", list = [1, "a"], size = 123456789}'])
+        document = tomllib.loads(text)
+        lines = emit(document)
+        self.assertEqual(lines, [
+            '(def c0 "https://example.com/api/v1")', "(def c1 123456789)", "42",
+            "ports(80, 443, array(8080, 8443))", 'hosts(|c0|, |c0|, "backup")',
+            "mirrors(|c0|, array(|c1|, |c1|), |c1|, |c1|)", "-2.5", "flag",
+            '$[name: |c0|, list: array(1, "a"), size: |c1|]'])
+        toml = translate(lines)
+        self.assertEqual(tomllib.loads("\n".join(toml)), document)
+        # Второй круг даёт тот же текст: константы выбираются по значениям, а не по записи
+        self.assertEqual(emit(tomllib.loads("\n".join(toml))), lines)
+        output = io.StringIO()
+        self.assertEqual(emit_stream(document, output), len(lines))
+        self.assertEqual(output.getvalue(), "".join(line + "\n" for line in lines))
+
+        plain = emit(document, constants=False)
+        self.assertFalse([line for line in plain if line.startswith("(def")])
+        self.assertEqual(tomllib.loads("\n".join(translate(plain))), document)
+        self.assertLess(len("\n".join(lines)), len("\n".join(plain)))
+
+    def test_random_round_trip(self):
+        # Словари строятся так же, как в roundtrip.py: при ошибке seed воспроизводит словарь
+        for seed in range(100):
+            with self.subTest(seed=seed):
+                self.assertIsNone(check(random_document(random.Random(seed), 15)))
+
+    def test_unsupported_values(self):
+        for document in [{"x": [float("inf")]}, {"x": ['"']}, {"x": [True]}, {"table": {"a": 1}}]:
+            with self.subTest(document=document), self.assertRaises(ValueError):
+                emit(document)
+
+
+class TestParseCache(unittest.TestCase):
+
+    LINES = ['(def a 5)', '(def s "text")', 'x(1, |a|, "q", array(2, |s|))', '$[k: |a|,', '  m: list(1, 2)]',
+             'name', '7', '-|a|', '(def b |a| * 2)', 'y(|b|, 3.5)']
+    MUTATIONS = ['|zz|', ')', '(', ',', '$[', ']', '"', '1abc', '-', '(def', 'array(', '/ 0', ':']
+
+    def outcome(self, lines, cache=None):
+        return syntax_error(lines, cache) or translate(lines, cache)
+
+    def test_matches_plain_translation(self):
+        lines = make_config(3000)
+        cache = ParseCache()
+        expected = translate(lines)
+        self.assertEqual(translate(lines, cache), expected)
+        # Повторный перевод со сдвигом строк и новым значением константы берёт куски из кэша
+        changed = ["(def base 99)", "7"] + lines
+        misses = cache.misses
+        self.assertEqual(translate(changed, cache), translate(changed))
+        self.assertGreater(cache.hits, 0)
+        self.assertLess(cache.misses - misses, 3)
+
+    def test_edit_in_place_reparses_one_chunk(self):
+        # Правка, меняющая длину строки, не сдвигает границы следующих кусков
+        lines = [f"arr{i}(1, 2, 3, {i})" for i in range(3000)]
+        cache = ParseCache()
+        translate(lines, cache)
+        chunks = cache.misses
+        self.assertGreater(chunks, 10)
+        for number, line in [(5, "arr5(1)"), (1500, "arr1500(1, 2, 3, 4, 5, 6, 7, 8, 9)"), (2999, "")]:
+            with self.subTest(number=number):
+                changed = list(lines)
+                changed[number] = line
+                hits, misses = cache.hits, cache.misses
+                self.assertEqual(translate(changed, cache), translate(changed))
+                self.assertLessEqual(cache.misses - misses, 2)
+                self.assertGreaterEqual(cache.hits - hits, chunks - 2)
+
+    def test_saved_cache(self):
+        lines = make_config(600)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp)
+            translate(lines, cache)
+            cache.save()
+            loaded = ParseCache(tmp)
+            self.assertEqual(translate(lines, loaded), translate(lines))
+            self.assertEqual(loaded.misses, 0)
+
+    def test_error_matches_plain_translation(self):
+        # Синтаксическая ошибка дальше по куску не заслоняет раньше стоящую неизвестную константу
+        lines = ["x(|zz|)", "y(1, 2", "z(3)"]
+        self.assertEqual(self.outcome(lines, ParseCache()), ("Undefined constant 'zz'.", 1, 3))
+
+    def test_random_invalid_inputs_match(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            lines = [rng.choice(self.LINES) for _ in range(rng.randint(2, 200))]
+            index = rng.randrange(len(lines))
+            position = rng.randint(0, len(lines[index]))
+            lines[index] = lines[index][:position] + rng.choice(self.MUTATIONS) + lines[index][position:]
+            self.assertEqual(self.outcome(lines, ParseCache()), self.outcome(lines), lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
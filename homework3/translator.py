@@ -0,0 +1,679 @@
+import math
+import re
+import string
+from array import array
+from collections import namedtuple
+from decimal import Decimal
+from operator import itemgetter
+
+import instrument
+
+# Лексемы учебного языка. (?![\w.]) не даёт принять начало имени вида 1abc за число;
+# минус — отдельная лексема (знак числа или вычитание), пробелы findall пропускает сам
+TOKEN_PATTERN = re.compile(r'\d+(?:\.\d+)?(?![\w.])|\w+|"[^"\n]*"|\|\w+\||\$\[|!.*|\S')
+
+# Строка, целиком состоящая из массива чисел через запятую: имя(1, 2.5, 3). Такие строки
+# не режутся на лексемы — числа выдаются одной лексемой numbers со списком текстов
+FLAT_ARRAY_PATTERN = re.compile(r"[ \t]*(\w+)\( *(\d+(?:\.\d+)?(?: *, *\d+(?:\.\d+)?)*) *\)\s*")
+
+# Вид лексемы по первому символу; для не-ASCII букв вид определяется отдельно
+CHAR_KINDS = {"(": "(", ")": ")", ",": ",", ":": ":", "]": "]", "$": "$[", '"': "string", "|": "ref", "!": "comment",
+              "+": "+", "-": "-", "*": "*", "/": "/"}
+CHAR_KINDS.update(dict.fromkeys(string.ascii_letters + "_", "name"))
+CHAR_KINDS.update(dict.fromkeys(string.digits, "number"))
+# С какой длины числовые списки python_value хранит в array.array
+COMPACT_SIZE = 1024
+RARE_KINDS = {None, "comment"}  # Строки с такими лексемами проверяются отдельно
+BAD_TOKENS = {'"', "|", "$"}  # Незакрытая строка или ссылка, одиночный $
+
+# Узлы AST верхнего уровня
+Constant = namedtuple("Constant", "name value line column")  # (def имя значение)
+Value = namedtuple("Value", "value line")  # Число в отдельной строке -> value<номер строки>
+Name = namedtuple("Name", "name line")  # Имя в отдельной строке -> имя = ""
+Array = namedtuple("Array", "name items line")  # имя(элемент, ...)
+Dictionary = namedtuple("Dictionary", "entries line")  # $[ключ: значение, ...]
+
+# Узлы значений
+Number = namedtuple("Number", "text")
+String = namedtuple("String", "text")
+List = namedtuple("List", "items")
+# Числа массива, записанного в одной строке целиком числами через запятую: тексты
+# хранятся одним списком строк вместо узла Number на каждый элемент
+Numbers = namedtuple("Numbers", "texts")
+SCALARS = {Number, String}
+
+# Узлы выражений в объявлениях констант
+Reference = namedtuple("Reference", "name line column")  # |имя|
+# Неподставленная ссылка в значении при разборе без констант (Parser(resolve=False));
+# index — номер лексемы в строке, колонка вычисляется только при ошибке
+Placeholder = namedtuple("Placeholder", "name line index")
+Negate = namedtuple("Negate", "operand")  # -выражение
+BinaryOp = namedtuple("BinaryOp", "op left right line column")  # левое op правое
+
+
+class ConfigSyntaxError(Exception):
+    """Синтаксическая ошибка с позицией во входном тексте."""
+
+    def __init__(self, message, line, column):
+        super().__init__(f"Syntax error on line {line}, column {column}: {message}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+class Lexer:
+    """Разбивает строки на лексемы за один проход.
+
+    Строка целиком режется одним вызовом findall, виды лексем определяются по
+    первому символу. Для каждой строки выдаются два списка — виды и тексты,
+    оканчивающиеся лексемой newline; пустые строки и строки-комментарии
+    пропускаются целиком. Позиции лексем не хранятся: колонка
+    вычисляется повторным разбором строки только при ошибке.
+
+    Строка вида имя(1, 2, 3) выдаётся лексемами имя, (, numbers, ): разбор
+    таких массивов не создаёт ни лексемы, ни узла на элемент.
+    """
+
+    def __init__(self, lines, first=1):
+        self.lines = lines
+        self.first = first  # Номер первой строки: кусок текста можно разбирать с его местом в файле
+        self.line_number = first - 1
+        self.line = ""
+        self.numbers = 0  # Сколько чисел в лексеме numbers текущей строки
+
+    def tokens(self):
+        for self.line_number, self.line in enumerate(self.lines, self.first):
+            match = FLAT_ARRAY_PATTERN.fullmatch(self.line)
+            if match and not is_number(match.group(1)):
+                numbers = match.group(2).replace(" ", "").split(",")
+                self.numbers = len(numbers)
+                yield ["name", "(", "numbers", ")", "newline"], [match.group(1), "(", numbers, ")", ""]
+                self.numbers = 0
+                continue
+            texts = TOKEN_PATTERN.findall(self.line)
+            if not texts or texts[0][0] == "!":
+                continue  # Пустая строка и строка из одного комментария не дают даже newline
+            kinds = list(map(CHAR_KINDS.get, map(itemgetter(0), texts)))
+            if not RARE_KINDS.isdisjoint(kinds) or not BAD_TOKENS.isdisjoint(texts):
+                self.check(kinds, texts)
+            kinds.append("newline")
+            texts.append("")
+            yield kinds, texts
+        self.line_number += 1
+        self.line = ""
+        yield ["eof"], [""]
+
+    def check(self, kinds, texts):
+        # Редкие случаи: комментарий, не-ASCII имя, недопустимый символ
+        for index, kind in enumerate(kinds):
+            if kind == "comment":
+                del kinds[index:], texts[index:]
+                return
+            text = texts[index]
+            if text in BAD_TOKENS or kind is None and not (text[0].isalnum() or text[0] == "_"):
+                raise ConfigSyntaxError(f"Unexpected character '{text}'.", *self.position(index))
+            if kind is None:
+                kinds[index] = "name"
+
+    def position(self, index):
+        """Строка и колонка лексемы с номером index в текущей строке."""
+        if self.numbers and index > 2:
+            # Лексема numbers заменяет числа и запятые между ними
+            index += 2 * self.numbers - 2
+        return self.line_number, token_column(self.line, index)
+
+
+def token_column(line, index):
+    """Колонка лексемы с номером index в строке line (конец строки, если лексем меньше)."""
+    for i, match in enumerate(TOKEN_PATTERN.finditer(line)):
+        if i == index:
+            return match.start() + 1
+    return len(line.rstrip("\r\n")) + 1
+
+
+def is_number(text):
+    # Лексема вида number из цифр и букв (1abc) — это имя
+    return text.isdigit() or "." in text
+
+
+def to_python(number):
+    # Целое — только запись из цифр со знаком: всё остальное читает float
+    return int(number.text) if number.text.lstrip("-").isdigit() else float(number.text)
+
+
+def float_text(value):
+    """Запись конечного вещественного числа лексемой учебного языка: без экспоненты и всегда с точкой."""
+    text = repr(value)
+    if "e" in text:
+        text = format(Decimal(text), "f")
+    return text if "." in text else text + ".0"
+
+
+def from_python(value):
+    return Number(float_text(value) if isinstance(value, float) else str(value))
+
+
+class ConstantTable:
+    """Таблица констант: выражение вычисляется при первом использовании и запоминается.
+
+    Повторные использования стоят одного поиска в словаре. Циклические определения
+    обнаруживаются по стеку вычисляемых имён. При переопределении константы
+    сбрасываются запомненные значения её самой и всех зависящих от неё констант.
+    """
+
+    def __init__(self):
+        self.definitions = {}  # Имя -> (выражение, строка, колонка)
+        self.values = {}  # Имя -> вычисленное значение Number или String
+        self.dependents = {}  # Имя -> имена констант, при вычислении которых оно использовалось
+        self._stack = []  # Вычисляемые сейчас константы
+
+    def define(self, name, expression, line, column):
+        self.definitions[name] = (expression, line, column)
+        stale = [name]
+        while stale:
+            stale_name = stale.pop()
+            self.values.pop(stale_name, None)
+            stale.extend(self.dependents.pop(stale_name, ()))
+
+    def get(self, name):
+        """Значение константы или None, если она не объявлена."""
+        value = self.values.get(name)
+        if value is not None or name not in self.definitions:
+            return value
+        expression, line, column = self.definitions[name]
+        if name in self._stack:
+            cycle = self._stack[self._stack.index(name):] + [name]
+            raise ConfigSyntaxError(f"Cyclic constant definition: {' -> '.join(cycle)}.", line, column)
+        self._stack.append(name)
+        try:
+            value = self.evaluate(expression, line, column)
+        except RecursionError:
+            raise ConfigSyntaxError(f"Constant '{name}' is nested too deeply.", line, column)
+        finally:
+            self._stack.pop()
+        self.values[name] = value
+        return value
+
+    def evaluate(self, node, line, column):
+        kind = type(node)
+        if kind is Number or kind is String:
+            return node
+        if kind is Reference:
+            if self._stack:
+                self.dependents.setdefault(node.name, set()).add(self._stack[-1])
+            value = self.get(node.name)
+            if value is None:
+                raise ConfigSyntaxError(f"Undefined constant '{node.name}'.", node.line, node.column)
+            return value
+        if kind is Negate:
+            operand = self.evaluate(node.operand, line, column)
+            if type(operand) is not Number:
+                raise ConfigSyntaxError("Cannot negate a string.", line, column)
+            return from_python(-to_python(operand))
+        left = self.evaluate(node.left, line, column)
+        right = self.evaluate(node.right, line, column)
+        if type(left) is String and type(right) is String and node.op == "+":
+            return String(f'"{left.text[1:-1]}{right.text[1:-1]}"')
+        if type(left) is not Number or type(right) is not Number:
+            raise ConfigSyntaxError(f"Unsupported operand types for '{node.op}'.", node.line, node.column)
+        a, b = to_python(left), to_python(right)
+        if node.op == "/" and b == 0:
+            raise ConfigSyntaxError("Division by zero.", node.line, node.column)
+        try:
+            if node.op == "+":
+                result = a + b
+            elif node.op == "-":
+                result = a - b
+            elif node.op == "*":
+                result = a * b
+            else:
+                result = a / b
+        except OverflowError:
+            result = math.inf
+        if isinstance(result, float) and not math.isfinite(result):
+            raise ConfigSyntaxError(f"Result of '{node.op}' is not a finite number.", node.line, node.column)
+        return from_python(result)
+
+
+class Parser:
+    """Нисходящий рекурсивный разбор потока лексем в AST.
+
+    Ссылки на константы заменяются при разборе их вычисленными значениями,
+    поэтому вне объявлений констант в AST остаются только готовые значения. Ошибки сообщаются исключением ConfigSyntaxError.
+    Текущая лексема — kinds[pos] и texts[pos] текущей строки.
+    """
+
+    def __init__(self, lines, resolve=True, first=1, constants=None):
+        self.lexer = Lexer(lines, first)
+        self.lines = self.lexer.tokens()
+        # Общая таблица констант позволяет продолжить разбор текста, начатый другим парсером
+        self.constants = ConstantTable() if constants is None else constants
+        # resolve=False оставляет в значениях узлы Placeholder: так конструкцию можно
+        # разобрать отдельно от объявлений констант и сохранить в кэше
+        self.resolve = resolve
+        self.references = 0  # Сколько узлов Placeholder создано
+        self.next_line()
+
+    def next_line(self):
+        self.kinds, self.texts = next(self.lines)
+        self.pos = 0
+
+    def advance(self):
+        """Переходит к следующей лексеме и возвращает текст текущей."""
+        text = self.texts[self.pos]
+        if self.kinds[self.pos] == "newline":
+            self.next_line()
+        else:
+            self.pos += 1
+        return text
+
+    def error(self, message, pos=None):
+        # pos — номер лексемы в текущей строке, если ошибка относится к уже пройденной лексеме
+        return ConfigSyntaxError(message, *self.lexer.position(self.pos if pos is None else pos))
+
+    def expect(self, kind, message):
+        if self.kinds[self.pos] != kind:
+            raise self.error(message)
+        return self.advance()
+
+    def skip_newlines(self):
+        while self.kinds[self.pos] == "newline":
+            self.next_line()
+
+    def statements(self):
+        """Выдаёт узлы верхнего уровня по мере разбора."""
+        while True:
+            while self.kinds[self.pos] == "newline":
+                self.next_line()
+            kind = self.kinds[self.pos]
+            if kind == "eof":
+                return
+            statement = self.statement()
+            kind = self.kinds[self.pos]
+            if kind != "newline" and kind != "eof":
+                raise self.error(f"Unexpected '{self.texts[self.pos]}' after the end of the construct.")
+            yield statement
+
+    def statement(self):
+        kind = self.kinds[self.pos]
+        if kind == "(":
+            return self.constant()
+        if kind == "$[":
+            return self.dictionary()
+        line = self.lexer.line_number
+        text = self.texts[self.pos]
+        if kind == "name" or kind == "number" and not is_number(text):
+            # Имя не бывает последней лексемой строки: за ним всегда есть newline
+            self.pos += 1
+            if self.kinds[self.pos] == "(":
+                return Array(text, self.array_items(), line)
+            return Name(text, line)
+        if kind == "number" or kind == "ref" or kind == "-":
+            pos = self.pos
+            value = self.value()
+            if type(value) is not Number and type(value) is not Placeholder:
+                raise self.error("A standalone value must be a number.", pos)
+            return Value(value, line)
+        raise self.error("Unrecognized syntax.")
+
+    def constant(self):
+        line = self.lexer.line_number
+        self.advance()  # (
+        pos = self.pos
+        if self.expect("name", "Expected 'def' after '('.") != "def":
+            raise self.error("Expected 'def' after '('.", pos)
+        name = self.expect("name", "Expected constant name.")
+        line, column = self.lexer.position(self.pos)
+        expression = self.expression()
+        self.expect(")", "Expected ')' after constant value.")
+        # Выражение вычисляется при первом использовании константы
+        self.constants.define(name, expression, line, column)
+        return Constant(name, expression, line, column)
+
+    def expression(self):
+        """expression := term (('+' | '-') term)*"""
+        left = self.term()
+        while self.kinds[self.pos] == "+" or self.kinds[self.pos] == "-":
+            left = self.binary(left, self.term)
+        return left
+
+    def term(self):
+        """term := unary (('*' | '/') unary)*"""
+        left = self.unary()
+        while self.kinds[self.pos] == "*" or self.kinds[self.pos] == "/":
+            left = self.binary(left, self.unary)
+        return left
+
+    def binary(self, left, operand):
+        line, column = self.lexer.position(self.pos)
+        op = self.advance()
+        return BinaryOp(op, left, operand(), line, column)
+
+    def unary(self):
+        """unary := '-' unary | NUMBER | STRING | REF | '(' expression ')'"""
+        kind, text = self.kinds[self.pos], self.texts[self.pos]
+        if kind == "-":
+            self.pos += 1
+            operand = self.unary()
+            if type(operand) is Number and operand.text[0] != "-":
+                # Отрицательный литерал сохраняет исходную запись числа
+                return Number("-" + operand.text)
+            return Negate(operand)
+        if kind == "number" and is_number(text):
+            self.pos += 1
+            return Number(text)
+        if kind == "string":
+            self.pos += 1
+            return String(text)
+        if kind == "ref":
+            self.pos += 1
+            return Reference(text[1:-1], *self.lexer.position(self.pos - 1))
+        if kind == "(":
+            self.pos += 1
+            expression = self.expression()
+            self.expect(")", "Expected ')' in constant expression.")
+            return expression
+        raise self.error(f"Invalid constant value '{text or kind}'.")
+
+    def value(self):
+        kind, text = self.kinds[self.pos], self.texts[self.pos]
+        if kind == "number" and is_number(text):
+            self.pos += 1
+            return Number(text)
+        if kind == "string":
+            self.pos += 1
+            return String(text)
+        if kind == "ref":
+            name = text[1:-1]
+            if not self.resolve:
+                self.pos += 1
+                self.references += 1
+                return Placeholder(name, self.lexer.line_number, self.pos - 1)
+            value = self.constants.get(name)
+            if value is None:
+                raise self.error(f"Undefined constant '{name}'.")
+            self.pos += 1
+            return value
+        if kind == "-" and self.kinds[self.pos + 1] == "number" and is_number(self.texts[self.pos + 1]):
+            self.pos += 2
+            return Number("-" + self.texts[self.pos - 1])
+        if kind == "name" or kind == "number":
+            # Вложенный массив: имя перед скобкой (обычно array) не важно
+            if self.kinds[self.pos + 1] == "(":
+                self.pos += 1
+                return List(self.array_items())
+            raise self.error(f"Invalid value '{text}'.")
+        if kind == "$[":
+            raise self.error("Nested dictionaries are not allowed.")
+        raise self.error(f"Expected a value, got '{text or kind}'.")
+
+    def array_items(self):
+        """Элементы массива от '(' до парной ')'.
+
+        Вложенные массивы разбираются без рекурсии: незаконченные списки лежат
+        на стеке, поэтому глубина вложенности ограничена только памятью.
+        """
+        self.advance()  # (
+        items = []
+        stack = []  # Списки внешних массивов, в которые вернётся разбор после ')'
+        # Горячий цикл: лексемы текущей строки читаются из локальных переменных,
+        # состояние парсера обновляется только перед вызовом методов
+        kinds, texts, pos = self.kinds, self.texts, self.pos
+        while True:
+            kind, text = kinds[pos], texts[pos]
+            # Проверки идут по частоте: чаще всего элемент — число или строка
+            if kind == "number" and (text.isdigit() or "." in text):
+                items.append(Number(text))
+                pos += 1
+            elif kind == "string":
+                items.append(String(text))
+                pos += 1
+            elif kind == "numbers":
+                # Весь массив на этой строке — числа через запятую (Lexer)
+                items.append(Numbers(text))
+                pos += 1
+            elif kind == ")":
+                pos += 1
+                if not stack:
+                    self.pos = pos
+                    return items
+                nested = List(items)
+                items = stack.pop()
+                items.append(nested)
+            elif kind == "newline":
+                self.pos = pos
+                self.skip_newlines()
+                kinds, texts, pos = self.kinds, self.texts, self.pos
+                continue
+            elif (kind == "name" or kind == "number") and kinds[pos + 1] == "(":
+                # Вложенный массив: имя перед скобкой (обычно array) не важно
+                stack.append(items)
+                items = []
+                pos += 2
+                continue
+            else:
+                self.pos = pos
+                items.append(self.value())
+                kinds, texts, pos = self.kinds, self.texts, self.pos
+
+            kind = kinds[pos]
+            if kind == "newline":
+                self.pos = pos
+                self.skip_newlines()
+                kinds, texts, pos = self.kinds, self.texts, self.pos
+                kind = kinds[pos]
+            if kind == ",":
+                pos += 1
+            elif kind != ")":
+                self.pos = pos
+                raise self.error("Expected ',' or ')' in array.")
+
+    def dictionary(self):
+        line = self.lexer.line_number
+        entries = []
+        # Как в array_items: лексемы читаются из локальных переменных, состояние
+        # парсера обновляется перед переходом на новую строку и вызовом методов
+        kinds, texts, pos = self.kinds, self.texts, self.pos + 1  # После $[
+        while True:
+            while kinds[pos] == "newline":
+                self.next_line()
+                kinds, texts, pos = self.kinds, self.texts, 0
+            kind = kinds[pos]
+            if kind == "]":
+                self.pos = pos + 1
+                return Dictionary(entries, line)
+            self.pos = pos
+            if kind != "name" and kind != "number" and kind != "string":
+                raise self.error("Expected dictionary key.")
+            key = texts[pos]
+            pos += 1
+            while kinds[pos] == "newline":
+                self.next_line()
+                kinds, texts, pos = self.kinds, self.texts, 0
+            if kinds[pos] != ":":
+                self.pos = pos
+                raise self.error(f"Missing ':' in dictionary entry '{key}'.")
+            pos += 1
+            while kinds[pos] == "newline":
+                self.next_line()
+                kinds, texts, pos = self.kinds, self.texts, 0
+            kind, text = kinds[pos], texts[pos]
+            if kind == "number" and (text.isdigit() or "." in text):
+                entries.append((key, Number(text)))
+                pos += 1
+            elif kind == "string":
+                entries.append((key, String(text)))
+                pos += 1
+            else:
+                self.pos = pos
+                entries.append((key, self.value()))
+                kinds, texts, pos = self.kinds, self.texts, self.pos
+            while kinds[pos] == "newline":
+                self.next_line()
+                kinds, texts, pos = self.kinds, self.texts, 0
+            if kinds[pos] == ",":
+                pos += 1
+            elif kinds[pos] != "]":
+                self.pos = pos
+                raise self.error("Expected ',' or ']' in dictionary.")
+
+
+def iter_statements(lines):
+    """Потоково разбирает текст (строку или итератор строк) и выдаёт узлы верхнего уровня."""
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    return Parser(lines).statements()
+
+
+def parse(lines):
+    """Разбирает текст и возвращает список узлов верхнего уровня."""
+    return list(iter_statements(lines))
+
+
+def format_value(value):
+    """Текст значения в TOML; вложенные списки обходятся без рекурсии."""
+    if type(value) is not List:
+        return value.text
+    if SCALARS.issuperset(map(type, value.items)):
+        # Плоский список целиком: text — первое поле Number и String
+        return f"[{', '.join(map(itemgetter(0), value.items))}]"
+    parts = ["["]
+    stack = [iter(value.items)]
+    separator = False  # Нужна ли запятая перед следующим элементом
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            parts.append("]")
+            separator = True
+            continue
+        if separator:
+            parts.append(", ")
+        kind = type(item)
+        if kind is Numbers:
+            parts.append(", ".join(item.texts))
+            separator = True
+        elif kind is not List:
+            parts.append(item.text)
+            separator = True
+        elif not SCALARS.issuperset(map(type, item.items)):
+            parts.append("[")
+            stack.append(iter(item.items))
+            separator = False
+        else:
+            parts.append(f"[{', '.join(map(itemgetter(0), item.items))}]")
+            separator = True
+    return "".join(parts)
+
+
+def python_value(value, compact_size=COMPACT_SIZE):
+    """Значение AST в значениях Python: int, float, str и списки в исходном порядке.
+
+    Списки не короче compact_size из одних целых или одних вещественных чисел
+    хранятся компактно в array.array ('q' или 'd'). Вложенность обходится без рекурсии.
+    """
+    kind = type(value)
+    if kind is Number:
+        return to_python(value)
+    if kind is String:
+        return value.text[1:-1]
+    root = []
+    stack = [(iter(value.items), root, None, 0)]  # (элементы, результат, внешний список, номер в нём)
+    while stack:
+        items, result, parent, index = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            if len(result) >= compact_size:
+                result = compact(result)
+                if parent is not None:
+                    parent[index] = result
+                else:
+                    root = result
+            continue
+        kind = type(item)
+        if kind is Number:
+            result.append(float(item.text) if "." in item.text else int(item.text))
+        elif kind is Numbers:
+            texts = item.texts
+            if "." not in "".join(texts):
+                result.extend(map(int, texts))
+            else:
+                result.extend([float(text) if "." in text else int(text) for text in texts])
+        elif kind is String:
+            result.append(item.text[1:-1])
+        else:
+            nested = []
+            result.append(nested)
+            stack.append((iter(item.items), nested, result, len(result) - 1))
+    return root
+
+
+def compact(values):
+    """array.array для однородного числового списка, иначе сам список."""
+    types = set(map(type, values))
+    if types == {int}:
+        try:
+            return array("q", values)
+        except OverflowError:
+            return values  # Целые вне 64 бит остаются в списке
+    if types == {float}:
+        return array("d", values)
+    return values
+
+
+def parse_array(text, compact_size=COMPACT_SIZE):
+    """Разбирает текст с одним массивом имя(...) и возвращает его элементы значениями Python."""
+    statements = [statement for statement in parse(text) if type(statement) is not Constant]
+    if len(statements) != 1 or type(statements[0]) is not Array:
+        raise ConfigSyntaxError("Expected a single array.", 1, 1)
+    return python_value(List(statements[0].items), compact_size)
+
+
+def to_toml(statement):
+    """Строка TOML для узла верхнего уровня или None, если узел ничего не выводит."""
+    kind = type(statement)
+    if kind is Array:
+        return f"{statement.name} = {format_value(List(statement.items))}"
+    if kind is Dictionary:
+        return f"dictionary = {{{', '.join(f'{key} = {format_value(value)}' for key, value in statement.entries)}}}"
+    if kind is Value:
+        return f"value{statement.line} = {statement.value.text}"
+    if kind is Name:
+        return f'{statement.name} = ""'
+    return None
+
+
+def statement_span(statement):
+    return f"parse.{type(statement).__name__}"
+
+
+def iter_toml(lines, cache=None):
+    if cache is not None:
+        return cache.iter_toml(lines)
+    statements = iter_statements(lines)
+    if instrument.enabled():
+        # Время разбора каждой конструкции по её виду: parse.Array, parse.Dictionary...
+        statements = instrument.timed_iter(statements, statement_span)
+    return map(to_toml, statements)
+
+
+def translate(lines, cache=None):
+    """Переводит текст учебного языка в список строк TOML."""
+    return [line for line in iter_toml(lines, cache) if line is not None]
+
+
+def translate_stream(lines, output, cache=None):
+    """Переводит текст построчно и пишет каждую конструкцию в output, как только она разобрана.
+
+    Память ограничена размером самой большой конструкции, а не всего файла.
+    С кэшем ParseCache заново разбираются только изменившиеся конструкции.
+    Возвращает число записанных строк TOML.
+    """
+    count = 0
+    for line in iter_toml(lines, cache):
+        if line is not None:
+            # Разделитель перед строкой: вывод совпадает с "\n".join(translate(...))
+            output.write(line if not count else "\n" + line)
+            count += 1
+    return count